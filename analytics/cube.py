@@ -0,0 +1,548 @@
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from analytics.sketches import DEFAULT_COMPRESSION, TDigest
+from utils.schema import category_values, to_link, to_list_id
+
+# =====================================================
+# ROLLUP CUBE (district × ward × category, per city)
+#
+# Every cell is a price-per-m2 t-digest keyed by (district, ward,
+# category), with ALL marking a rolled-up dimension: (ALL, ALL, ALL) is
+# the whole city, (district, ALL, ALL) a district, and so on.
+# =====================================================
+ALL = "*"
+
+Key = Tuple[str, str, str]
+
+DIMS = ("district", "ward", "category")
+
+# Dimensions kept by each rollup level
+LEVELS = [
+    (),
+    ("category",),
+    ("district",),
+    ("district", "category"),
+    ("district", "ward"),
+    ("district", "ward", "category"),
+]
+
+# Each rolled-up level is rebuilt from the level one dimension finer:
+# dimension added, finer level
+FINER = {
+    (): ("category", ("category",)),
+    ("category",): ("district", ("district", "category")),
+    ("district",): ("category", ("district", "category")),
+    ("district", "category"): ("ward", ("district", "ward", "category")),
+    ("district", "ward"): ("category", ("district", "ward", "category")),
+}
+
+CUBE_COLUMN = "price_million_per_m2"
+
+# contributions  each listing's cell labels and price per m2, by list_id
+# cells          t-digest (JSON) of every non-empty cell
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contributions (
+    list_id  INTEGER PRIMARY KEY,
+    district TEXT,
+    ward     TEXT,
+    category TEXT,
+    value    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contributions_cell ON contributions (district, ward, category);
+CREATE INDEX IF NOT EXISTS contributions_category ON contributions (category, district);
+
+CREATE TABLE IF NOT EXISTS cells (
+    district TEXT NOT NULL,
+    ward     TEXT NOT NULL,
+    category TEXT NOT NULL,
+    digest   TEXT NOT NULL,
+    PRIMARY KEY (district, ward, category)
+) WITHOUT ROWID;
+"""
+
+# Batches of list_ids are joined through a temp table rather than bound
+# as one parameter each (SQLite caps bound parameters)
+_BATCH_IDS = "CREATE TEMP TABLE IF NOT EXISTS batch_ids (list_id INTEGER PRIMARY KEY)"
+
+
+def cell_keys(district: Optional[str], ward: Optional[str], category: Optional[str]) -> List[Key]:
+    """
+    Every cell a listing at (district, ward, category) counts in (a
+    level is skipped when one of its dimensions is missing).
+    """
+    labels = {"district": district, "ward": ward, "category": category}
+    keys = []
+    for dims in LEVELS:
+        if any(labels[d] is None for d in dims):
+            continue
+        keys.append(tuple(labels[d] if d in dims else ALL for d in DIMS))
+    return keys
+
+
+def _level(key: Key) -> Tuple[str, ...]:
+    return tuple(d for d, label in zip(DIMS, key) if label != ALL)
+
+
+def _parent(key: Key, dim: str) -> Key:
+    return tuple(ALL if d == dim else label for d, label in zip(DIMS, key))
+
+
+def _groups(batch: pd.DataFrame, dims: Tuple[str, ...]) -> Iterator[Tuple[Key, pd.Series]]:
+    """
+    Values of a batch per cell of one rollup level.
+    """
+    if not dims:
+        yield (ALL, ALL, ALL), batch["value"]
+        return
+
+    for labels, values in batch.groupby(list(dims))["value"]:
+        labels = dict(zip(dims, labels))
+        yield (
+            labels.get("district", ALL),
+            labels.get("ward", ALL),
+            labels.get("category", ALL),
+        ), values
+
+
+class RollupCube:
+    """
+    Precomputed city → district → ward (× category) price-per-m2 rollups.
+
+    Digests are updated incrementally per batch; count, median and
+    quartiles are materialized per cell (only dirty cells are refreshed)
+    so lookups are O(1) dictionary hits.
+
+    Each listing's contribution (cell and value) is kept by list_id in
+    a SQLite side store (`path`, in memory when None). A listing seen
+    again unchanged is not counted twice; a repriced or moved listing,
+    or one removed with remove(), marks its old cells stale, and stale
+    cells are rebuilt (t-digests cannot retract points) before the next
+    lookup. Contribution changes and the cells they touched are written
+    together by save().
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION, path: Optional[str] = None) -> None:
+        self.compression = compression
+        self.path = path
+        self.digests: Dict[Key, TDigest] = {}
+        self._cells: Dict[Key, Dict[str, float]] = {}
+        self._dirty: Set[Key] = set()
+        self._stale: Set[Key] = set()
+        self._changed: Set[Key] = set()  # cells to write on the next save
+
+        # One connection per cube: contribution changes stay in an open
+        # transaction until save(), so a crashed crawl leaves the stored
+        # contributions and cells consistent
+        self._db = sqlite3.connect(
+            path or ":memory:", timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.executescript(SCHEMA)
+        self._db.execute(_BATCH_IDS)
+        for district, ward, category, digest in self._db.execute("SELECT * FROM cells"):
+            key = (district, ward, category)
+            self.digests[key] = TDigest.from_dict(json.loads(digest))
+            self._dirty.add(key)
+
+    # ----------------------
+    # Ingest
+    # ----------------------
+    @staticmethod
+    def _batch(df: pd.DataFrame) -> pd.DataFrame:
+        list_id = df["list_id"] if "list_id" in df.columns else to_list_id(df["link"])
+        batch = pd.DataFrame({
+            "list_id": list_id.astype("Int64").to_numpy(),
+            "district": category_values(df["area_name"]).to_numpy(),
+            "ward": category_values(df["ward_name"]).to_numpy(),
+            "category": category_values(df["category"]).to_numpy(),
+            "value": pd.to_numeric(df[CUBE_COLUMN], errors="coerce").to_numpy(dtype=float),
+        }).dropna(subset=["value"])
+        # One missing marker (None) for labels, so contributions compare equal
+        for col in ("district", "ward", "category"):
+            batch[col] = batch[col].astype(object).where(batch[col].notna(), None)
+        return batch
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        Add one batch of listings (export or compact schema).
+        """
+        if df.empty:
+            return
+
+        batch = self._batch(df)
+        has_id = batch["list_id"].notna()
+        keyed = batch[has_id].drop_duplicates("list_id", keep="last")
+        ids = keyed["list_id"].astype("int64").tolist()
+        listings = zip(*(keyed[col].tolist() for col in ("district", "ward", "category", "value")))
+
+        self._begin()
+        previous = {row[0]: row[1:] for row in self._contributions(ids)}
+        fresh = np.ones(len(keyed), dtype=bool)
+        changed = []
+        for i, (list_id, listing) in enumerate(zip(ids, listings)):
+            old = previous.get(list_id)
+            if old == listing:
+                fresh[i] = False  # already counted
+                continue
+            if old is not None:
+                self._stale.update(cell_keys(*old[:3]))
+            changed.append((list_id, *listing))
+        self._db.executemany("INSERT OR REPLACE INTO contributions VALUES (?, ?, ?, ?, ?)", changed)
+        batch = pd.concat([batch[~has_id], keyed[fresh]])
+
+        for dims in LEVELS:
+            for key, values in _groups(batch, dims):
+                self._add(key, values)
+
+    def remove(self, list_ids: Iterable[int]) -> int:
+        """
+        Take listings out of the cube (e.g. gone since the last full
+        crawl). Returns how many were counted in it.
+        """
+        ids = [int(list_id) for list_id in list_ids if not pd.isna(list_id)]
+        if not ids:
+            return 0
+
+        self._begin()
+        previous = self._contributions(ids)
+        for row in previous:
+            self._stale.update(cell_keys(*row[1:4]))
+        self._db.execute("DELETE FROM contributions WHERE list_id IN (SELECT list_id FROM batch_ids)")
+        return len(previous)
+
+    def _begin(self) -> None:
+        if not self._db.in_transaction:
+            self._db.execute("BEGIN IMMEDIATE")
+
+    def _contributions(self, list_ids: List[int]) -> List[Tuple[Any, ...]]:
+        """
+        Stored contributions of some listings (list_id first); leaves
+        the ids in batch_ids.
+        """
+        self._db.execute("DELETE FROM batch_ids")
+        self._db.executemany("INSERT OR IGNORE INTO batch_ids VALUES (?)", ((i,) for i in list_ids))
+        return self._db.execute(
+            "SELECT c.* FROM contributions c JOIN batch_ids USING (list_id)"
+        ).fetchall()
+
+    def _values(self, key: Key, missing: Optional[str] = None) -> np.ndarray:
+        """
+        Stored values of one cell (only those without the `missing`
+        dimension, when given).
+        """
+        clauses = [f"{d} = ?" for d, label in zip(DIMS, key) if label != ALL]
+        params = [label for label in key if label != ALL]
+        if missing is not None:
+            clauses.append(f"{missing} IS NULL")
+        rows = self._db.execute(
+            f"SELECT value FROM contributions WHERE {' AND '.join(clauses)}", params
+        )
+        return np.fromiter((value for (value,) in rows), dtype=float)
+
+    def _add(self, key: Key, values: pd.Series) -> None:
+        if values.empty:
+            return
+        digest = self.digests.setdefault(key, TDigest(self.compression))
+        digest.update(values.to_numpy())
+        self._dirty.add(key)
+        self._changed.add(key)
+
+    def _rebuild(self) -> None:
+        """
+        Recompute the stale cells, finest level first. A rolled-up cell
+        merges its cells one dimension finer and reads only the stored
+        contributions missing that dimension, so no rebuild scans the
+        whole city.
+        """
+        if not self._stale:
+            return
+
+        for key in self._stale:
+            self.digests.pop(key, None)
+            self._cells.pop(key, None)
+        self._dirty -= self._stale
+        self._changed |= self._stale
+
+        for dims in reversed(LEVELS):
+            stale = [key for key in self._stale if _level(key) == dims]
+            if not stale:
+                continue
+
+            missing, finer = FINER.get(dims, (None, None))
+            children = defaultdict(list)
+            if finer is not None:
+                for key, digest in self.digests.items():
+                    if _level(key) == finer:
+                        children[_parent(key, missing)].append(digest)
+
+            for key in stale:
+                digest = TDigest(self.compression)
+                for child in children[key]:
+                    digest.merge(child)
+                digest.update(self._values(key, missing))
+                if len(digest.means):
+                    self.digests[key] = digest
+                    self._dirty.add(key)
+
+        self._stale.clear()
+
+    # ----------------------
+    # Lookups
+    # ----------------------
+    def _refresh(self) -> None:
+        self._rebuild()
+        for key in self._dirty:
+            digest = self.digests[key]
+            self._cells[key] = {
+                "listings": digest.count,
+                "q1": digest.quantile(0.25),
+                "median": digest.quantile(0.5),
+                "q3": digest.quantile(0.75),
+            }
+        self._dirty.clear()
+
+    @property
+    def cells(self) -> Dict[Key, Dict[str, float]]:
+        if self._dirty or self._stale:
+            self._refresh()
+        return self._cells
+
+    def lookup(
+        self,
+        district: str = ALL,
+        ward: str = ALL,
+        category: str = ALL,
+    ) -> Optional[Dict[str, float]]:
+        """
+        Count, median and quartiles of one cell (None if empty).
+        """
+        return self.cells.get((district, ward, category))
+
+    def baseline(
+        self,
+        district: Any = ALL,
+        ward: Any = ALL,
+        category: str = ALL,
+        min_samples: Optional[int] = None,
+    ) -> Tuple[Optional[str], Optional[Dict[str, float]]]:
+        """
+        First cell with at least min_samples listings, falling back from
+        ward to district to city. Returns (level, cell).
+        """
+        min_samples = config.DEAL_MIN_SAMPLES if min_samples is None else min_samples
+
+        for level, key in self._fallback_keys(district, ward, category):
+            cell = self.cells.get(key)
+            if cell is not None and cell["listings"] >= min_samples:
+                return level, cell
+        return None, None
+
+    @staticmethod
+    def _fallback_keys(district: Any, ward: Any, category: str) -> List[Tuple[str, Key]]:
+        keys = []
+        if isinstance(district, str) and district:
+            if isinstance(ward, str) and ward:
+                keys.append(("ward", (district, ward, category)))
+            keys.append(("district", (district, ALL, category)))
+        keys.append(("city", (ALL, ALL, category)))
+        return keys
+
+    def baselines(
+        self,
+        df: pd.DataFrame,
+        min_samples: Optional[int] = None,
+    ) -> pd.DataFrame:
+        """
+        Per-row baseline median and its level for a frame, one lookup per
+        distinct (district, ward) instead of per row.
+        """
+        district_codes, districts = pd.factorize(category_values(df["area_name"]))
+        ward_codes, wards = pd.factorize(category_values(df["ward_name"]))
+
+        # One code per (district, ward) pair; -1 (missing) shifts to 0
+        pairs = (district_codes + 1) * (len(wards) + 1) + (ward_codes + 1)
+        uniques, codes = np.unique(pairs, return_inverse=True)
+
+        medians = np.full(len(uniques), np.nan)
+        levels = np.full(len(uniques), None, dtype=object)
+        for i, pair in enumerate(uniques):
+            district_code, ward_code = divmod(int(pair), len(wards) + 1)
+            level, cell = self.baseline(
+                districts[district_code - 1] if district_code else None,
+                wards[ward_code - 1] if ward_code else None,
+                min_samples=min_samples,
+            )
+            if cell is not None:
+                medians[i] = cell["median"]
+                levels[i] = level
+
+        return pd.DataFrame({
+            "baseline_median": medians[codes],
+            "baseline_level": levels[codes],
+        }, index=df.index)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        All cells as a table (district / ward / category, ALL = rollup).
+        """
+        rows = [
+            {"district": d, "ward": w, "category": c, **cell}
+            for (d, w, c), cell in self.cells.items()
+        ]
+        columns = ["district", "ward", "category", "listings", "q1", "median", "q3"]
+        return pd.DataFrame(rows, columns=columns).sort_values(
+            ["district", "ward", "category"]
+        ).reset_index(drop=True)
+
+    def districts(self) -> List[str]:
+        return sorted(d for (d, w, c) in self.digests if d != ALL and w == ALL and c == ALL)
+
+    def wards(self, district: str, category: str = ALL) -> pd.DataFrame:
+        """
+        Drill-down: ward cells of one district.
+        """
+        cube = self.to_frame()
+        return cube[
+            (cube["district"] == district)
+            & (cube["ward"] != ALL)
+            & (cube["category"] == category)
+        ].reset_index(drop=True)
+
+    # ----------------------
+    # Persistence
+    # ----------------------
+    def save(self) -> None:
+        """
+        Write the cells changed since the last save and commit them with
+        the contribution changes.
+        """
+        self._rebuild()
+        self._begin()
+        try:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?)",
+                [
+                    (*key, json.dumps(self.digests[key].to_dict()))
+                    for key in self._changed if key in self.digests
+                ],
+            )
+            self._db.executemany(
+                "DELETE FROM cells WHERE district = ? AND ward = ? AND category = ?",
+                [key for key in self._changed if key not in self.digests],
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._changed.clear()
+
+    def close(self) -> None:
+        """
+        Close the side store, dropping changes not saved yet.
+        """
+        self._db.close()
+
+
+def cube_path(city_key: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"{city_key}_cube.db")
+
+
+def load_cube(city_key: str, output_dir: str) -> RollupCube:
+    """
+    Open the rollup cube of a city (empty if none yet).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    return RollupCube(path=cube_path(city_key, output_dir))
+
+
+def save_cube(cube: RollupCube, city_key: str, output_dir: str) -> str:
+    """
+    Persist the rollup cube of a city: the changes of a cube opened with
+    load_cube, or a whole copy of any other cube.
+    """
+    path = cube_path(city_key, output_dir)
+    cube.save()
+    if cube.path is None or os.path.abspath(cube.path) != os.path.abspath(path):
+        os.makedirs(output_dir, exist_ok=True)
+        target = sqlite3.connect(path)
+        try:
+            cube._db.backup(target)
+        finally:
+            target.close()
+
+    return path
+
+
+# =====================================================
+# STREAMING DEAL SCORER
+# =====================================================
+class StreamingDealScorer:
+    """
+    Score listings against the cube baseline with the same semantics as
+    analytics.deals.detect_deals (deal_score = price per m2 / median,
+    a deal when below threshold), falling back from ward to district to
+    city when a group has fewer than min_samples listings.
+    """
+
+    def __init__(
+        self,
+        cube: RollupCube,
+        threshold: float = 0.75,
+        min_samples: Optional[int] = None,
+    ) -> None:
+        self.cube = cube
+        self.threshold = threshold
+        self.min_samples = min_samples
+
+    def score(self, listing: Dict[str, Any]) -> Optional[float]:
+        """
+        Deal score of one listing (None without a baseline), O(1).
+        """
+        _, cell = self.cube.baseline(
+            listing.get("area_name"),
+            listing.get("ward_name"),
+            min_samples=self.min_samples,
+        )
+        try:
+            price_m2 = float(listing.get(CUBE_COLUMN))
+        except (TypeError, ValueError):
+            return None
+        if cell is None or not cell["median"] or np.isnan(price_m2):
+            return None
+        return price_m2 / cell["median"]
+
+    def deals(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Good deals of a batch, shaped like detect_deals output plus the
+        baseline level used.
+        """
+        baselines = self.cube.baselines(df, self.min_samples)
+        deal_score = (
+            pd.to_numeric(df[CUBE_COLUMN], errors="coerce")
+            / baselines["baseline_median"]
+        )
+        is_deal = deal_score < self.threshold
+
+        result = df.loc[
+            is_deal,
+            ["title", "area_name", "price", "price_million_per_m2", "area"],
+        ]
+        if "link" in df.columns:
+            link = df.loc[is_deal, "link"]
+        else:
+            link = to_link(df.loc[is_deal, "list_id"])
+
+        result = result.assign(
+            deal_score=deal_score[is_deal],
+            link=link,
+            baseline_level=baselines.loc[is_deal, "baseline_level"],
+        )
+
+        return result.sort_values("deal_score").reset_index(drop=True)
@@ -1,59 +1,54 @@
+from typing import Any, Dict, Optional
+
 import pandas as pd
 
+from analytics.cube import RollupCube
+from analytics.stats import district_baseline, district_stats
+from utils.schema import to_link
+
 
-def detect_deals(df: pd.DataFrame, threshold: float = 0.75) -> pd.DataFrame:
+def detect_deals(
+    df: pd.DataFrame,
+    threshold: float = 0.75,
+    stats: Optional[Dict[str, Any]] = None,
+    cube: Optional[RollupCube] = None,
+    min_samples: Optional[int] = None,
+) -> pd.DataFrame:
     """
     Detect good real-estate deals by comparing price per m2
     against district median (area_name).
+
+    Pass `stats` from analytics.stats.district_stats to reuse the
+    district medians already computed for the reports. Pass a rollup
+    `cube` instead to compare against the ward median, falling back to
+    district then city when a group has fewer than min_samples listings.
     """
-    working_df = df.copy()
+    if cube is not None:
+        baseline = cube.baselines(df, min_samples)["baseline_median"].to_numpy()
+    else:
+        stats = stats if stats is not None else district_stats(df)
+        baseline = district_baseline(stats, "median_price_m2")
 
     # ----------------------
-    # Filter valid rows
+    # Deal score
     # ----------------------
-    working_df = working_df.dropna(
-        subset=["area_name", "price_million_per_m2"]
-    )
+    price_m2 = pd.to_numeric(df["price_million_per_m2"], errors="coerce")
+    deal_score = price_m2 / baseline
 
     # ----------------------
-    # Median price per m2 by district
+    # Filter good deals (NaN scores never pass)
     # ----------------------
-    median_price_map = (
-        working_df
-        .groupby("area_name")["price_million_per_m2"]
-        .median()
-    )
+    is_deal = deal_score < threshold
 
-    # ----------------------
-    # Deal score
-    # ----------------------
-    working_df["deal_score"] = (
-        working_df["price_million_per_m2"]
-        / working_df["area_name"].map(median_price_map)
-    )
+    result = df.loc[
+        is_deal,
+        ["title", "area_name", "price", "price_million_per_m2", "area"],
+    ]
+    if "link" in df.columns:
+        link = df.loc[is_deal, "link"]
+    else:
+        link = to_link(df.loc[is_deal, "list_id"])
 
-    # Remove invalid scores (safety)
-    working_df = working_df.dropna(subset=["deal_score"])
+    result = result.assign(deal_score=deal_score[is_deal], link=link)
 
-    # ----------------------
-    # Filter good deals
-    # ----------------------
-    deals = working_df[working_df["deal_score"] < threshold]
-
-    result = (
-        deals[
-            [
-                "title",
-                "area_name",
-                "price",
-                "price_million_per_m2",
-                "area",
-                "deal_score",
-                "link",
-            ]
-        ]
-        .sort_values("deal_score")
-        .reset_index(drop=True)
-    )
-
-    return result
+    return result.sort_values("deal_score").reset_index(drop=True)
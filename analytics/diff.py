@@ -0,0 +1,208 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.instrument import stage
+from utils.load import load_previous_snapshot, load_snapshot, snapshot_path
+from utils.schema import FLOAT32_COLUMNS, table_to_frame, to_link, to_list_id
+
+# =====================================================
+# SNAPSHOT DIFF (two crawls of a city)
+#
+# The previous snapshot is indexed by list_id once (hash index), every
+# listing of the current snapshot is looked up in it in one vectorized
+# probe, and matched rows are compared by a per-row content hash, so
+# only the rows that actually changed are looked at column by column:
+#
+#   new       list_id only in the current snapshot
+#   removed   list_id only in the previous snapshot
+#   repriced  in both, price moved
+#
+# Every step is a hash or a gather over the rows: linear time.
+# =====================================================
+CONTENT_COLUMNS = ["title", "price", "area", "ward_name", "area_name"]
+
+NEW = "new"
+REMOVED = "removed"
+REPRICED = "repriced"
+
+CHANGE_COLUMNS = [
+    "change",
+    "title",
+    "area_name",
+    "ward_name",
+    "area",
+    "previous_price",
+    "price",
+    "price_change_pct",
+    "link",
+]
+
+
+def list_ids(df: pd.DataFrame) -> pd.Series:
+    """
+    Integer list_id of every row (compact or export schema).
+    """
+    ids = df["list_id"] if "list_id" in df.columns else to_list_id(df["link"])
+    return ids.astype("Int64")
+
+
+def content_hashes(previous: pd.DataFrame, current: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    64-bit hash per row of the listing content (CONTENT_COLUMNS) of two
+    snapshots, comparable between them.
+
+    Text columns are factorized jointly and their codes hashed (hashing
+    the strings themselves is several times slower); numbers are hashed
+    in their compact-schema dtype so CSV and Arrow snapshots compare equal.
+    """
+    hashed = ([], [])
+    for col in CONTENT_COLUMNS:
+        if col not in previous.columns or col not in current.columns:
+            continue
+        pair = (previous[col], current[col])
+        if col in ("price", "area"):
+            dtype = "float32" if col in FLOAT32_COLUMNS else "float64"
+            pair = [pd.to_numeric(v, errors="coerce").to_numpy(dtype=dtype) for v in pair]
+        elif isinstance(pair[0].dtype, pd.CategoricalDtype):
+            # Hashed by value: the two dictionaries may differ
+            pair = [pd.util.hash_pandas_object(v, index=False).to_numpy() for v in pair]
+        else:
+            codes, _ = pd.factorize(pd.concat(pair, ignore_index=True))
+            pair = [codes[:len(previous)], codes[len(previous):]]
+        for columns, values in zip(hashed, pair):
+            columns.append(pd.util.hash_array(values))
+
+    # Combine the column hashes row-wise
+    return tuple(
+        pd.util.hash_pandas_object(
+            pd.DataFrame(dict(enumerate(columns)), index=pd.RangeIndex(len(df))), index=False
+        ).to_numpy()
+        for columns, df in zip(hashed, (previous, current))
+    )
+
+
+def _keyed(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rows with a list_id, one per listing (last one wins), positional index.
+    """
+    df = df.assign(list_id=list_ids(df))
+    df = df[df["list_id"].notna()]
+    return df.drop_duplicates(subset="list_id", keep="last").reset_index(drop=True)
+
+
+def _prices(df: pd.DataFrame) -> np.ndarray:
+    return pd.to_numeric(df["price"], errors="coerce").to_numpy(dtype=float)
+
+
+@dataclass
+class SnapshotDiff:
+    new: pd.DataFrame
+    removed: pd.DataFrame
+    repriced: pd.DataFrame
+    edited: int      # in both, same price, other content changed
+    unchanged: int
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            NEW: len(self.new),
+            REMOVED: len(self.removed),
+            REPRICED: len(self.repriced),
+            "edited": self.edited,
+            "unchanged": self.unchanged,
+        }
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        One row per new, removed or repriced listing (the "changes since
+        the last crawl" report), repriced first by largest move.
+        """
+        repriced = self.repriced.sort_values(
+            "price_change_pct", key=np.abs, ascending=False, na_position="last"
+        )
+        parts = [
+            repriced.assign(change=REPRICED),
+            self.new.assign(change=NEW, previous_price=np.nan, price_change_pct=np.nan),
+            self.removed.assign(
+                change=REMOVED, previous_price=self.removed["price"], price=np.nan, price_change_pct=np.nan
+            ),
+        ]
+        parts = [
+            part.assign(link=to_link(part["list_id"])).reindex(columns=CHANGE_COLUMNS)
+            for part in parts
+            if not part.empty
+        ]
+        if not parts:
+            return pd.DataFrame(columns=CHANGE_COLUMNS)
+
+        # Categorical locations of the two snapshots have different
+        # dictionaries: concatenate them as strings
+        for part in parts:
+            for col in ("area_name", "ward_name"):
+                part[col] = part[col].astype("string")
+        return pd.concat(parts, ignore_index=True)
+
+
+def diff_snapshots(previous: pd.DataFrame, current: pd.DataFrame) -> SnapshotDiff:
+    """
+    New, removed and repriced listings between two snapshots of a city
+    (frames in the compact or export schema).
+    """
+    previous = _keyed(previous)
+    current = _keyed(current)
+
+    # ----------------------
+    # Hash index on list_id
+    # ----------------------
+    index = pd.Index(previous["list_id"].to_numpy(dtype="int64"))
+    position = index.get_indexer(current["list_id"].to_numpy(dtype="int64"))
+    matched = position >= 0
+
+    seen = np.zeros(len(previous), dtype=bool)
+    seen[position[matched]] = True
+
+    # ----------------------
+    # Content hash: only rows whose hash moved are compared further
+    # ----------------------
+    gather = np.where(matched, position, 0)
+    changed = matched.copy()
+    if len(previous):
+        previous_hash, current_hash = content_hashes(previous, current)
+        changed &= current_hash != previous_hash[gather]
+
+    price = _prices(current)
+    previous_price = _prices(previous)[gather] if len(previous) else np.full(len(current), np.nan)
+    price_moved = ~((price == previous_price) | (np.isnan(price) & np.isnan(previous_price)))
+    repriced = changed & price_moved
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = (price - previous_price) / previous_price * 100
+
+    return SnapshotDiff(
+        new=current[~matched].reset_index(drop=True),
+        removed=previous[~seen].reset_index(drop=True),
+        repriced=current[repriced].assign(
+            previous_price=previous_price[repriced],
+            price_change_pct=np.where(np.isfinite(change_pct), change_pct, np.nan)[repriced],
+        ).reset_index(drop=True),
+        edited=int((changed & ~price_moved).sum()),
+        unchanged=int((matched & ~changed).sum()),
+    )
+
+
+def snapshot_diff(city_key: str, output_dir: str) -> Optional[SnapshotDiff]:
+    """
+    Changes between the previous and the latest snapshot of a city
+    (None before the second full crawl).
+    """
+    previous = load_previous_snapshot(city_key, output_dir)
+    if previous is None or not os.path.exists(snapshot_path(city_key, output_dir)):
+        return None
+    with stage("snapshot_diff", city=city_key) as s:
+        current = table_to_frame(load_snapshot(snapshot_path(city_key, output_dir)))
+        diff = diff_snapshots(previous, current)
+        s.rows += len(previous) + len(current)
+    return diff
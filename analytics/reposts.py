@@ -0,0 +1,523 @@
+import json
+import os
+import re
+import unicodedata
+import uuid
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from utils.schema import category_values, to_list_id
+
+# =====================================================
+# NEAR-DUPLICATE REPOSTS (MinHash / LSH, per city)
+#
+# A repost is a listing under a new list_id whose folded title is
+# near-identical to an indexed listing of the same district with
+# price and area within tolerance. Signatures are banded into LSH
+# buckets keyed by district and price bucket, so a new listing is only
+# compared to the few indexed listings of its district and price range
+# sharing a band with it.
+#
+# Each (district, price bucket, band, band hash) is folded into one
+# 64-bit bucket key, stored per listing. The index is saved as shards
+# (output/<city>_reposts/part-*.npz, listed in <city>_reposts.json):
+# a crawl appends one shard with the listings it added, and loading
+# sorts the saved keys once instead of rebuilding buckets row by row.
+# =====================================================
+SHINGLE_SIZE = 3
+
+# Multiply-shift hash family over packed shingles: the high 32 bits of
+# (a·x + b) mod 2^64, with a odd (the uint64 arithmetic wraps on purpose)
+_SHIFT = np.uint64(32)
+
+_CHUNK_SHINGLES = 100_000  # shingles permuted at once when signing titles
+
+# splitmix64 finalizer constants (bucket key mixing)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def fold_title(title: Any) -> str:
+    """
+    Lower-case, diacritic-free, punctuation-free title.
+    """
+    if not isinstance(title, str):
+        return ""
+    text = unicodedata.normalize("NFD", title.lower().replace("đ", "d"))
+    text = text.encode("ascii", "ignore").decode()
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text).split())
+
+
+def shingles(title: str) -> np.ndarray:
+    """
+    Distinct character shingles of a folded (ASCII) title, each packed
+    into one integer (8 bits per character).
+    """
+    chars = np.frombuffer(title.encode("ascii"), dtype=np.uint8).astype(np.uint64)
+    if len(chars) < SHINGLE_SIZE:
+        chars = np.concatenate((chars, np.zeros(SHINGLE_SIZE - len(chars), np.uint64)))
+        if not title:
+            return np.zeros(0, dtype=np.uint64)
+
+    codes = np.zeros(len(chars) - SHINGLE_SIZE + 1, dtype=np.uint64)
+    for offset in range(SHINGLE_SIZE):
+        codes = (codes << np.uint64(8)) | chars[offset:len(codes) + offset]
+    return np.unique(codes)
+
+
+def price_buckets(prices: np.ndarray) -> np.ndarray:
+    """
+    Log-price buckets, wide enough that two prices within
+    REPOST_PRICE_TOLERANCE fall in the same or adjacent buckets
+    (-1 when the price is missing or not positive).
+    """
+    prices = np.asarray(prices, dtype=float)
+    valid = prices > 0
+    buckets = np.full(len(prices), -1, dtype=np.int64)
+    buckets[valid] = np.floor(
+        np.log(prices[valid]) / -np.log1p(-config.REPOST_PRICE_TOLERANCE)
+    ).astype(np.int64)
+    return buckets
+
+
+def price_bucket(price: float) -> int:
+    return int(price_buckets(np.array([price]))[0])
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    x = x ^ (x >> np.uint64(30))
+    x = x * _MIX_1
+    x = x ^ (x >> np.uint64(27))
+    x = x * _MIX_2
+    return x ^ (x >> np.uint64(31))
+
+
+def district_hashes(districts: List[str]) -> np.ndarray:
+    codes, uniques = pd.factorize(pd.Series(districts, dtype=object))
+    hashes = np.array([zlib.crc32(str(d).encode()) for d in uniques], dtype=np.uint64)
+    return hashes[codes]
+
+
+def bucket_keys(band_hashes: np.ndarray, districts: np.ndarray, buckets: np.ndarray) -> np.ndarray:
+    """
+    One 64-bit bucket key per (listing, band) from its band hashes,
+    district hash and price bucket (uint64 arithmetic wraps).
+    """
+    with np.errstate(over="ignore"):
+        salt = _mix(districts ^ (buckets.astype(np.int64).view(np.uint64) * _GOLDEN))
+        bands = np.arange(band_hashes.shape[1], dtype=np.uint64)
+        return _mix(band_hashes ^ _mix(salt[:, None] + bands * _GOLDEN))
+
+
+def _within(values: np.ndarray, value: float, tolerance: float) -> np.ndarray:
+    # Both missing is a match, one missing is not
+    if np.isnan(value):
+        return np.isnan(values)
+    return np.abs(values - value) <= tolerance * np.maximum(np.abs(values), abs(value))
+
+
+class RepostIndex:
+    """
+    Incremental MinHash / LSH index of the listings of one city.
+
+    `reposts` maps the list_id of every detected repost to the list_id
+    of the original listing.
+    """
+
+    def __init__(
+        self,
+        num_perm: Optional[int] = None,
+        bands: Optional[int] = None,
+        seed: int = 1,
+    ) -> None:
+        self.num_perm = num_perm or config.REPOST_NUM_PERM
+        self.bands = bands or config.REPOST_BANDS
+        self.rows = self.num_perm // self.bands
+        self.seed = seed
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(0, 1 << 64, self.num_perm, dtype=np.uint64, endpoint=False) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 64, self.num_perm, dtype=np.uint64, endpoint=False)
+        self._mix = rng.integers(0, 1 << 64, self.rows, dtype=np.uint64, endpoint=False) | np.uint64(1)
+
+        self.list_ids: List[int] = []
+        self.districts: List[str] = []
+
+        # Row-aligned arrays with spare capacity, for vectorized matching
+        self._signatures = np.zeros((0, self.num_perm), dtype=np.uint32)
+        self._keys = np.zeros((0, self.bands), dtype=np.uint64)
+        self._prices = np.zeros(0)
+        self._areas = np.zeros(0)
+
+        self.positions: Dict[int, int] = {}
+        self.reposts: Dict[int, int] = {}
+
+        # Buckets of loaded listings: keys sorted, with their positions;
+        # listings added since then go to a dict
+        self._sorted_keys = np.zeros(0, dtype=np.uint64)
+        self._sorted_positions = np.zeros(0, dtype=np.int64)
+        self.buckets: Dict[int, List[int]] = defaultdict(list)
+
+        # Listings / reposts already in saved shards
+        self.saved = 0
+        self.saved_reposts = 0
+        self.shards: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.list_ids)
+
+    @property
+    def signatures(self) -> np.ndarray:
+        return self._signatures[:len(self)]
+
+    @property
+    def keys(self) -> np.ndarray:
+        return self._keys[:len(self)]
+
+    @property
+    def prices(self) -> np.ndarray:
+        return self._prices[:len(self)]
+
+    @property
+    def areas(self) -> np.ndarray:
+        return self._areas[:len(self)]
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._prices)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        n = len(self)
+        for name, shape in (
+            ("_signatures", (capacity, self.num_perm)),
+            ("_keys", (capacity, self.bands)),
+            ("_prices", (capacity,)),
+            ("_areas", (capacity,)),
+        ):
+            grown = np.zeros(shape, dtype=getattr(self, name).dtype)
+            grown[:n] = getattr(self, name)[:n]
+            setattr(self, name, grown)
+
+    # ----------------------
+    # MinHash / LSH
+    # ----------------------
+    def sign(self, titles: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        MinHash signatures of titles, and a mask of the titles that have
+        any shingles (the others get no signature).
+        """
+        grams = [shingles(fold_title(title)) for title in titles]
+        lengths = np.array([len(g) for g in grams], dtype=np.int64)
+        valid = lengths > 0
+
+        signatures = np.zeros((len(titles), self.num_perm), dtype=np.uint32)
+        rows = np.flatnonzero(valid)
+
+        # Bounded chunks: the permuted matrix is shingles × num_perm
+        chunk, size = [], 0
+        for i, row in enumerate(rows):
+            chunk.append(row)
+            size += lengths[row]
+            if size >= _CHUNK_SHINGLES or i == len(rows) - 1:
+                hashes = np.concatenate([grams[r] for r in chunk])
+                permuted = (np.outer(hashes, self._a) + self._b) >> _SHIFT
+                starts = np.concatenate(([0], np.cumsum(lengths[chunk])[:-1]))
+                signatures[chunk] = np.minimum.reduceat(permuted, starts, axis=0)
+                chunk, size = [], 0
+
+        return signatures, valid
+
+    def signature(self, title: Any) -> Optional[np.ndarray]:
+        """
+        MinHash signature of one title (None when it has no shingles).
+        """
+        signatures, valid = self.sign([title])
+        return signatures[0] if valid[0] else None
+
+    def band_hashes(self, signatures: np.ndarray) -> np.ndarray:
+        """
+        One LSH key per band of each signature (uint64 products wrap).
+        """
+        bands = signatures.reshape(len(signatures), self.bands, self.rows)
+        return (bands.astype(np.uint64) * self._mix).sum(axis=2, dtype=np.uint64)
+
+    def _insert(self, list_id, signature, keys, district, price, area) -> None:
+        position = len(self.list_ids)
+        self._reserve(position + 1)
+        self._signatures[position] = signature
+        self._keys[position] = keys
+        self._prices[position] = price
+        self._areas[position] = area
+        self.list_ids.append(list_id)
+        self.districts.append(district)
+
+        self.positions[list_id] = position
+        for key in keys.tolist():
+            self.buckets[key].append(position)
+
+    # ----------------------
+    # Lookups
+    # ----------------------
+    def _candidates(self, keys: np.ndarray) -> np.ndarray:
+        lo = np.searchsorted(self._sorted_keys, keys, side="left")
+        hi = np.searchsorted(self._sorted_keys, keys, side="right")
+        found = [self._sorted_positions[l:h] for l, h in zip(lo.tolist(), hi.tolist()) if h > l]
+        if self.buckets:
+            found += [
+                np.array(self.buckets[key], dtype=np.int64)
+                for key in keys.tolist()
+                if key in self.buckets
+            ]
+        if not found:
+            return np.zeros(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def probe_keys(self, band_hashes: np.ndarray, districts: List[str], prices: np.ndarray) -> np.ndarray:
+        """
+        Bucket keys to look listings up under: their own price bucket and
+        both neighbours (n × 3·bands).
+        """
+        buckets = price_buckets(prices)
+        # Missing prices (bucket -1) have no neighbours: probed thrice
+        neighbours = np.where(buckets[:, None] < 0, buckets[:, None], buckets[:, None] + np.arange(-1, 2))
+        keys = bucket_keys(
+            np.repeat(band_hashes, 3, axis=0),
+            np.repeat(district_hashes(districts), 3),
+            neighbours.reshape(-1),
+        )
+        return keys.reshape(len(buckets), -1)
+
+    def match(self, signature: np.ndarray, probe: np.ndarray, price: float, area: float) -> Optional[int]:
+        """
+        list_id of the most similar indexed listing sharing a probe key
+        and passing the price and area blocking (None if no
+        near-duplicate).
+        """
+        candidates = self._candidates(probe)
+        if not len(candidates):
+            return None
+
+        similarity = (self._signatures[candidates] == signature).mean(axis=1)
+        similarity[
+            ~_within(self._prices[candidates], price, config.REPOST_PRICE_TOLERANCE)
+            | ~_within(self._areas[candidates], area, config.REPOST_AREA_TOLERANCE)
+        ] = 0
+
+        best = int(np.argmax(similarity))
+        if similarity[best] < config.REPOST_SIMILARITY:
+            return None
+        return self.list_ids[candidates[best]]
+
+    def add(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Check a batch of listings (export or compact schema) against the
+        index, then index them. Returns the original list_id of each
+        repost (<NA> for other rows); rows already indexed keep their
+        earlier verdict.
+        """
+        list_ids = _list_ids(df).astype("float64").to_numpy(na_value=np.nan)
+        titles = df["title"].tolist()
+        districts = category_values(df["area_name"]).fillna("").tolist()
+        prices = pd.to_numeric(df["price"], errors="coerce").astype(float).tolist()
+        areas = pd.to_numeric(df["area"], errors="coerce").astype(float).tolist()
+
+        # Signatures and band keys for every unseen listing at once
+        unseen = [
+            i for i, list_id in enumerate(list_ids)
+            if not np.isnan(list_id) and int(list_id) not in self.positions
+        ]
+        signatures, valid = self.sign([titles[i] for i in unseen])
+        band_hashes = self.band_hashes(signatures)
+        unseen_districts = [districts[i] for i in unseen]
+        unseen_prices = np.array([prices[i] for i in unseen], dtype=float)
+        keys = bucket_keys(
+            band_hashes, district_hashes(unseen_districts), price_buckets(unseen_prices)
+        )
+        probes = self.probe_keys(band_hashes, unseen_districts, unseen_prices)
+
+        for j, i in enumerate(unseen):
+            list_id = int(list_ids[i])
+            if not valid[j] or list_id in self.positions:
+                continue
+
+            original = self.match(signatures[j], probes[j], prices[i], areas[i])
+            if original is not None:
+                # Chains of reposts point at the first listing
+                self.reposts[list_id] = self.reposts.get(original, original)
+            self._insert(
+                list_id, signatures[j], keys[j], districts[i], prices[i], areas[i]
+            )
+
+        originals = np.full(len(df), np.nan)
+        if self.reposts:
+            for i, list_id in enumerate(list_ids):
+                if not np.isnan(list_id) and int(list_id) in self.reposts:
+                    originals[i] = self.reposts[int(list_id)]
+
+        return pd.Series(originals, index=df.index).astype("Int64")
+
+    def is_repost(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Boolean mask of the rows that are known reposts.
+        """
+        reposts = pd.Series(list(self.reposts), dtype="Int64")
+        return _list_ids(df).isin(reposts).fillna(False).astype(bool)
+
+    # ----------------------
+    # Persistence
+    # ----------------------
+    def to_arrays(self, start: int = 0, reposts_start: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Listings from position start and reposts from reposts_start
+        (everything by default), as arrays.
+        """
+        reposts = list(self.reposts.items())[reposts_start:]
+        return {
+            "params": np.array([self.num_perm, self.bands, self.seed], dtype=np.int64),
+            "list_ids": np.array(self.list_ids[start:], dtype=np.int64),
+            "signatures": self.signatures[start:],
+            "keys": self.keys[start:],
+            "districts": np.array(self.districts[start:], dtype=str),
+            "prices": self.prices[start:],
+            "areas": self.areas[start:],
+            "repost_ids": np.array([r for r, _ in reposts], dtype=np.int64),
+            "original_ids": np.array([o for _, o in reposts], dtype=np.int64),
+        }
+
+    @classmethod
+    def from_arrays(cls, data: Dict[str, np.ndarray]) -> "RepostIndex":
+        num_perm, bands, seed = (int(v) for v in data["params"])
+        index = cls(num_perm, bands, seed)
+        n = len(data["list_ids"])
+        index._reserve(n)
+
+        index.list_ids = data["list_ids"].tolist()
+        index.districts = data["districts"].tolist()
+        index._signatures[:n] = data["signatures"]
+        index._prices[:n] = data["prices"]
+        index._areas[:n] = data["areas"]
+        keys = data["keys"]
+        index._keys[:n] = keys
+        index.positions = dict(zip(index.list_ids, range(n)))
+
+        # Buckets: every (key, position) pair sorted by key, vectorized
+        flat = keys.reshape(-1)
+        order = np.argsort(flat, kind="stable")
+        index._sorted_keys = flat[order]
+        index._sorted_positions = (order // bands).astype(np.int64)
+
+        index.reposts = dict(zip(
+            data["repost_ids"].tolist(),
+            data["original_ids"].tolist(),
+        ))
+        return index
+
+
+def _list_ids(df: pd.DataFrame) -> pd.Series:
+    if "list_id" in df.columns:
+        return df["list_id"].astype("Int64")
+    return to_list_id(df["link"])
+
+
+def drop_reposts(df: pd.DataFrame, index: RepostIndex) -> pd.DataFrame:
+    """
+    Listings without known reposts, for supply counts and medians.
+    """
+    if not index.reposts:
+        return df
+    return df[~index.is_repost(df).to_numpy()]
+
+
+def reposts_path(city_key: str, output_dir: str) -> str:
+    """
+    Manifest of a city's repost index (parameters and shard files).
+    """
+    return os.path.join(output_dir, f"{city_key}_reposts.json")
+
+
+def shards_dir(city_key: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"{city_key}_reposts")
+
+
+def _read_shard(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path, allow_pickle=False) as data:
+        return dict(data)
+
+
+def _concat_shards(shards: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    merged = {"params": shards[0]["params"]}
+    for name in shards[0]:
+        if name != "params":
+            merged[name] = np.concatenate([shard[name] for shard in shards])
+    return merged
+
+
+def load_repost_index(city_key: str, output_dir: str) -> RepostIndex:
+    """
+    Load the repost index of a city (empty if none yet).
+    """
+    path = reposts_path(city_key, output_dir)
+    if not os.path.exists(path):
+        return RepostIndex()
+
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    directory = shards_dir(city_key, output_dir)
+    shards = [_read_shard(os.path.join(directory, name)) for name in manifest["shards"]]
+    if not shards:
+        return RepostIndex(*manifest["params"])
+    index = RepostIndex.from_arrays(_concat_shards(shards))
+    index.shards = list(manifest["shards"])
+    index.saved = len(index)
+    index.saved_reposts = len(index.reposts)
+    return index
+
+
+def _write_shard(arrays: Dict[str, np.ndarray], directory: str) -> str:
+    name = f"part-{uuid.uuid4().hex[:12]}.npz"
+    tmp_path = os.path.join(directory, f"_{name}")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, os.path.join(directory, name))
+    return name
+
+
+def save_repost_index(index: RepostIndex, city_key: str, output_dir: str) -> str:
+    """
+    Persist what a crawl added to the repost index of a city as one new
+    shard, then publish the manifest atomically. Past
+    config.REPOST_MAX_SHARDS shards the index is rewritten as one.
+    """
+    path = reposts_path(city_key, output_dir)
+    directory = shards_dir(city_key, output_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    shards = list(index.shards)
+    if len(index) > index.saved or len(index.reposts) > index.saved_reposts:
+        shards.append(_write_shard(index.to_arrays(index.saved, index.saved_reposts), directory))
+    elif os.path.exists(path):
+        return path
+
+    replaced = []
+    if len(shards) > config.REPOST_MAX_SHARDS:
+        replaced, shards = shards, [_write_shard(index.to_arrays(), directory)]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"params": [index.num_perm, index.bands, index.seed], "shards": shards}, f)
+    os.replace(tmp_path, path)
+
+    index.shards = shards
+    index.saved = len(index)
+    index.saved_reposts = len(index.reposts)
+
+    for name in replaced:
+        os.remove(os.path.join(directory, name))
+
+    return path
@@ -0,0 +1,176 @@
+import os
+from typing import Iterable, List
+
+import pandas as pd
+
+from analytics.cube import ALL
+from fetch_data.history import read_history
+from utils.schema import category_values
+
+# =====================================================
+# MATERIALIZED DAILY ROLLUPS (per city)
+#
+# One row per (date, district) with district ALL for the whole city:
+#   new_listings     listings first seen that day (every crawl mode)
+#   active_listings  distinct listings crawled that day
+#   median_price_m2  median price per m2 of those listings
+#   full_crawl       a full-range crawl ran that day
+#
+# Incremental crawls only store new or repriced listings, and
+# single-page or plan crawls see part of the market, so active
+# listings and medians are only computed for days with a full-range
+# crawl (full_crawl); other days leave them missing.
+# =====================================================
+ROLLUP_COLUMNS = [
+    "date",
+    "district",
+    "new_listings",
+    "active_listings",
+    "median_price_m2",
+    "full_crawl",
+]
+
+
+def rollups_path(city_key: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"{city_key}_daily.parquet")
+
+
+def load_rollups(city_key: str, output_dir: str) -> pd.DataFrame:
+    """
+    Daily rollups of a city (empty if none yet).
+    """
+    path = rollups_path(city_key, output_dir)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    rollups = pd.read_parquet(path)
+    missing = [c for c in ROLLUP_COLUMNS if c not in rollups.columns]
+    if missing:
+        raise ValueError(f"Missing rollup columns in {path}: {', '.join(missing)}")
+    return rollups
+
+
+def _with_city_total(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat([df, df.assign(district=ALL)], ignore_index=True)
+
+
+# =====================================================
+# INGEST
+# =====================================================
+def count_new_listings(batch: pd.DataFrame) -> pd.DataFrame:
+    """
+    New listings of an ingest batch per (date, district), incl. ALL.
+    """
+    counts = _with_city_total(pd.DataFrame({
+        "date": pd.to_datetime(batch["crawl_time"], errors="coerce").dt.normalize(),
+        "district": category_values(batch["area_name"]),
+    }))
+    return (
+        counts.dropna()
+        .groupby(["date", "district"])
+        .size()
+        .rename("new_listings")
+        .reset_index()
+    )
+
+
+def _day_rollup(day: pd.DataFrame, date: pd.Timestamp) -> pd.DataFrame:
+    """
+    Active listings and median price per m2 of one day, per district.
+    """
+    # A listing crawled several times that day counts once (latest row)
+    day = day.drop_duplicates(subset=["list_id"], keep="last")
+    day = _with_city_total(pd.DataFrame({
+        "district": category_values(day["area_name"]),
+        "list_id": day["list_id"],
+        "price_million_per_m2": pd.to_numeric(day["price_million_per_m2"], errors="coerce"),
+    }))
+
+    return (
+        day.dropna(subset=["district"])
+        .groupby("district")
+        .agg(
+            active_listings=("list_id", "nunique"),
+            median_price_m2=("price_million_per_m2", "median"),
+        )
+        .reset_index()
+        .assign(date=date)
+    )
+
+
+def update_daily_rollups(
+    city_key: str,
+    output_dir: str,
+    new_counts: List[pd.DataFrame],
+    dates: Iterable[str],
+    full: bool = True,
+) -> pd.DataFrame:
+    """
+    Refresh the rollup rows of the dates touched by a crawl.
+
+    New-listing counts accumulate the increments observed at ingest
+    (new_counts from count_new_listings). full=True marks a full-range
+    crawl: active listings and medians of its dates are recomputed from
+    their history partitions, and so are those of dates marked by an
+    earlier full crawl (later crawls that day only add listings).
+    """
+    rollups = load_rollups(city_key, output_dir)
+    dates = sorted({pd.Timestamp(d).normalize() for d in dates})
+    if not dates:
+        return rollups
+
+    marked = set(rollups.loc[rollups["full_crawl"].astype(bool), "date"])
+    covered = [date for date in dates if full or date in marked]
+
+    days = [
+        _day_rollup(
+            read_history(
+                output_dir,
+                city_key=city_key,
+                start=date.strftime("%Y-%m-%d"),
+                end=date.strftime("%Y-%m-%d"),
+                columns=["area_name", "list_id", "price_million_per_m2"],
+            ),
+            date,
+        )
+        for date in covered
+    ]
+    fresh = (
+        pd.concat(days, ignore_index=True)
+        if days else pd.DataFrame(columns=["date", "district", "active_listings", "median_price_m2"])
+    ).set_index(["date", "district"])
+
+    touched = rollups["date"].isin(dates)
+    previous = rollups[touched].set_index(["date", "district"])
+    previous_new = previous["new_listings"]
+
+    # Days without a full crawl keep what was known (or stay missing)
+    kept = previous[~previous.index.get_level_values("date").isin(covered)]
+    fresh = pd.concat([fresh, kept[["active_listings", "median_price_m2"]]])
+
+    increments = (
+        pd.concat(new_counts, ignore_index=True)
+        .groupby(["date", "district"])["new_listings"]
+        .sum()
+        if new_counts else pd.Series(dtype="int64")
+    )
+
+    fresh = fresh.join(
+        previous_new.add(increments, fill_value=0).rename("new_listings"),
+        how="outer",
+    )
+    fresh["new_listings"] = fresh["new_listings"].fillna(0).astype("int64")
+    fresh["active_listings"] = fresh["active_listings"].astype("Int64")
+    fresh["full_crawl"] = fresh.index.get_level_values("date").isin(covered)
+
+    rollups = pd.concat(
+        [rollups[~touched], fresh.reset_index()[ROLLUP_COLUMNS]],
+        ignore_index=True,
+    ).sort_values(["date", "district"]).reset_index(drop=True)
+
+    path = rollups_path(city_key, output_dir)
+    tmp_path = f"{path}.tmp"
+    rollups.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+    return rollups
+
@@ -0,0 +1,95 @@
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+# =====================================================
+# T-DIGEST (merging variant, k1 scale)
+# =====================================================
+DEFAULT_COMPRESSION = 200
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch of a stream of values.
+
+    Centroids are kept sorted; each update merges the new points in and
+    re-compresses with the k1 scale function, which keeps centroids
+    small in the tails and bounds their number to ~compression / 2.
+    Quantiles are interpolated between centroids, so they are
+    approximate even for small groups (the k1 buckets can merge
+    neighbouring points at any size); min and max are exact.
+    """
+
+    def __init__(self, compression: int = DEFAULT_COMPRESSION) -> None:
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: Iterable[float]) -> None:
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._merge(values, np.ones(len(values)))
+
+    def merge(self, other: "TDigest") -> None:
+        if not len(other.means):
+            return
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._merge(other.means, other.weights)
+
+    def _merge(self, means: np.ndarray, weights: np.ndarray) -> None:
+        means = np.concatenate((self.means, means))
+        weights = np.concatenate((self.weights, weights))
+
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+
+        # Bucket centroids by unit steps of k(q) = δ/2π · asin(2q - 1)
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        bucket = np.floor(k)
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float) -> float:
+        if not len(self.means):
+            return np.nan
+
+        cumulative = np.cumsum(self.weights)
+        centers = cumulative - self.weights / 2
+        x = np.concatenate(([0.0], centers, [cumulative[-1]]))
+        y = np.concatenate(([self.min], self.means, [self.max]))
+        return float(np.interp(q * cumulative[-1], x, y))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": self.min if np.isfinite(self.min) else None,
+            "max": self.max if np.isfinite(self.max) else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        digest = cls(data.get("compression", DEFAULT_COMPRESSION))
+        digest.means = np.asarray(data["means"], dtype=float)
+        digest.weights = np.asarray(data["weights"], dtype=float)
+        digest.min = np.inf if data["min"] is None else data["min"]
+        digest.max = -np.inf if data["max"] is None else data["max"]
+        return digest
@@ -0,0 +1,178 @@
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.schema import key_column
+
+
+# =====================================================
+# GROUPED KERNEL
+# =====================================================
+def _numeric(df: pd.DataFrame, col: str) -> np.ndarray:
+    return pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+
+def _factorize(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Codes and lexically sorted labels of the values present (-1: missing).
+
+    Works the same for plain strings and categoricals, whose category
+    order (e.g. from an Arrow dictionary) is insertion order.
+    """
+    codes, uniques = pd.factorize(series)
+    labels = np.asarray(uniques, dtype=object)
+
+    order = np.argsort(labels)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    codes = np.where(codes >= 0, rank[np.maximum(codes, 0)], -1)
+    return codes, labels[order]
+
+
+def _segment_counts(flags: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """
+    Number of True flags in each segment [bounds[i], bounds[i + 1]).
+    """
+    cumulative = np.concatenate(([0], np.cumsum(flags, dtype=np.int64)))
+    return cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+
+
+def _segment_stats(
+    values: np.ndarray,
+    bounds: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mean and median of the non-NaN values of each segment
+    [bounds[i], bounds[i + 1]) of an array already sorted by group.
+    """
+    n_groups = len(bounds) - 1
+    means = np.full(n_groups, np.nan)
+    medians = np.full(n_groups, np.nan)
+
+    for i in np.flatnonzero(np.diff(bounds)):
+        segment = values[bounds[i]:bounds[i + 1]]
+        segment = segment[~np.isnan(segment)]
+        if len(segment):
+            means[i] = segment.mean()
+            medians[i] = np.median(segment)
+
+    return means, medians
+
+
+# =====================================================
+# DISTRICT STATS
+# =====================================================
+def district_stats(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Compute every district-level aggregate in one pass over the frame.
+
+    Districts (area_name) and categories are factorized once and rows are
+    sorted once by (district, category); counts, means and medians of all
+    columns are then reduced over contiguous groups, instead of one
+    groupby (and one frame copy) per report.
+
+    Returns a dict with:
+        by_district           listings / avg & median price and price per m2
+        by_district_category  listings / avg & median price per m2
+        supply                listing count pivot (district × category + TOTAL)
+        district_codes        row → row of by_district (-1: no district)
+    """
+    district_codes, districts = _factorize(df["area_name"])
+    category_codes, categories = _factorize(df["category"])
+    n_districts = len(districts)
+    n_categories = len(categories)
+
+    # ----------------------
+    # Group keys: slot 0 of each district holds rows without a category,
+    # slots 1.. hold the (district, category) pairs
+    # ----------------------
+    slots = n_categories + 1
+    n_keys = n_districts * slots
+    keys = np.where(
+        district_codes >= 0,
+        district_codes * slots + category_codes + 1,
+        n_keys,
+    )
+
+    # Single (stable, integer) grouping sort shared by every column
+    order = np.argsort(keys, kind="stable")
+    key_rows = np.bincount(keys, minlength=n_keys + 1)[:n_keys]
+    key_bounds = np.concatenate(([0], np.cumsum(key_rows)))
+    district_bounds = key_bounds[::slots]
+
+    has_key = df[key_column(df)].notna().to_numpy()[order]
+    price = _numeric(df, "price")[order]
+    price_m2 = _numeric(df, "price_million_per_m2")[order]
+
+    # ----------------------
+    # District
+    # ----------------------
+    avg_price, median_price = _segment_stats(price, district_bounds)
+    avg_price_m2, median_price_m2 = _segment_stats(price_m2, district_bounds)
+
+    by_district = pd.DataFrame({
+        "district": districts,
+        "listings": _segment_counts(has_key, district_bounds),
+        "avg_price": avg_price,
+        "median_price": median_price,
+        "avg_price_m2": avg_price_m2,
+        "median_price_m2": median_price_m2,
+    })
+
+    # ----------------------
+    # District × category (pairs = key slots 1..)
+    # ----------------------
+    priced = ~np.isnan(price_m2)
+    pair_slots = (np.arange(n_keys) % slots) > 0
+    pair_district = np.arange(n_keys)[pair_slots] // slots
+    pair_category = np.arange(n_keys)[pair_slots] % slots - 1
+
+    pair_priced = _segment_counts(priced, key_bounds)[pair_slots]
+    pair_listings = _segment_counts(priced & has_key, key_bounds)[pair_slots]
+    pair_avg, pair_median = _segment_stats(price_m2, key_bounds)
+    present = pair_priced > 0
+
+    by_district_category = pd.DataFrame({
+        "district": districts[pair_district[present]],
+        "category": categories[pair_category[present]],
+        "listings": pair_listings[present],
+        "avg_price_m2": pair_avg[pair_slots][present],
+        "median_price_m2": pair_median[pair_slots][present],
+    })
+
+    # ----------------------
+    # Supply pivot (district × category)
+    # ----------------------
+    pair_rows = key_rows[pair_slots].reshape(n_districts, n_categories)
+    pair_counts = _segment_counts(has_key, key_bounds)[pair_slots].reshape(
+        n_districts, n_categories
+    )
+
+    row_mask = (pair_rows > 0).any(axis=1)
+    col_mask = (pair_rows > 0).any(axis=0)
+    counts = pair_counts[np.ix_(row_mask, col_mask)]
+
+    supply = pd.DataFrame(
+        counts,
+        columns=pd.Index(categories[col_mask], name="category"),
+    )
+    supply.insert(0, "district", districts[row_mask])
+    supply["TOTAL"] = counts.sum(axis=1)
+
+    return {
+        "by_district": by_district,
+        "by_district_category": by_district_category,
+        "supply": supply,
+        "district_codes": district_codes,
+    }
+
+
+def district_baseline(stats: Dict[str, Any], column: str = "median_price_m2") -> np.ndarray:
+    """
+    Per-row district value of a by_district column (NaN without district),
+    aligned with the frame the stats were computed from.
+    """
+    values = np.append(stats["by_district"][column].to_numpy(dtype=float), np.nan)
+    return values[stats["district_codes"]]
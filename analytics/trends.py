@@ -1,35 +1,37 @@
 import pandas as pd
 
+from analytics.cube import ALL
+from analytics.rollups import ROLLUP_COLUMNS
+
+TREND_WINDOWS = [7, 30, 90]
+
+
 def trend_7_days(df: pd.DataFrame):
     if df.empty or "crawl_time" not in df.columns:
         return pd.DataFrame()
 
-    df = df.copy()
-
-    # ✅ FORCE datetime
-    df["crawl_time"] = pd.to_datetime(
+    # ✅ FORCE datetime (only the column, not a copy of the frame)
+    crawl_time = pd.to_datetime(
         df["crawl_time"],
         errors="coerce"
     )
 
-    # Drop invalid rows
-    df = df.dropna(subset=["crawl_time"])
-
-    # Extract date
-    df["date"] = df["crawl_time"].dt.date
+    # Drop invalid rows & extract date
+    date = crawl_time.dropna().dt.date.rename("date")
 
     # Keep last 7 days
-    max_date = df["date"].max()
-    if max_date is None:
+    max_date = date.max()
+    if pd.isna(max_date):
         return pd.DataFrame()
 
     start_date = max_date - pd.Timedelta(days=6)
 
-    df_7d = df[df["date"] >= start_date]
+    date_7d = date[date >= start_date]
 
     # Count listings per day
     trend = (
-        df_7d
+        date_7d
+        .to_frame()
         .groupby("date")
         .size()
         .reset_index(name="listing_count")
@@ -37,3 +39,44 @@ def trend_7_days(df: pd.DataFrame):
     )
 
     return trend
+
+
+def rollup_trend(
+    rollups: pd.DataFrame,
+    days: int = 7,
+    district: str = ALL,
+) -> pd.DataFrame:
+    """
+    Daily trend of the trailing `days`-day window (ending at the latest
+    rollup date) for one district or the whole city (ALL), read from the
+    materialized daily rollups, with 7-day rolling new listings and
+    median price per m2.
+    """
+    series = rollups[rollups["district"] == district]
+    if series.empty:
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+    series = series.set_index("date").sort_index()
+    end = series.index.max()
+
+    # 6 extra days so the first rolling values of the window are full
+    calendar = pd.date_range(end - pd.Timedelta(days=days + 5), end, freq="D")
+
+    series = series.reindex(calendar)
+    series["new_listings"] = series["new_listings"].fillna(0).astype("int64")
+    # Active listings are only known on full-crawl days: carry them over
+    series["active_listings"] = series["active_listings"].ffill().fillna(0).astype("int64")
+    series["district"] = district
+
+    series["new_listings_7d"] = (
+        series["new_listings"].rolling(7, min_periods=1).sum().astype("int64")
+    )
+    series["median_price_m2_7d"] = (
+        series["median_price_m2"].rolling(7, min_periods=1).mean()
+    )
+
+    return (
+        series.iloc[-days:]
+        .rename_axis("date")
+        .reset_index()
+    )
@@ -0,0 +1,115 @@
+import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+import argparse
+import json
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.mock_gateway import MockGateway, add_settings_arguments, settings_from_args
+from fetch_data import fetch_data as fd
+from fetch_data.client import ApiClient
+from utils.instrument import flush
+import config
+
+# =====================================================
+# CRAWL LOAD TEST (against benchmarks/mock_gateway.py)
+#
+#   python benchmarks/load_test.py --workers 1 4 8 16 --pages 50 \
+#       --latency 0.05 --jitter 0.05 --error-rate 0.01 --rate 100
+#
+# Starts a mock gateway in-process and walks one city's pages through
+# the real crawl path (iter_pages, ApiClient with its token bucket and
+# retries, normalize_ads) once per worker count. Reports pages/s,
+# listings/s and the p50 / p99 of the per-page fetch latency (retries
+# and rate-limit waits included), plus what the gateway answered.
+#
+# The client's own rate limit applies unless --client-rate raises it;
+# the disk cache is off so every page reaches the gateway.
+# =====================================================
+
+
+def run_once(gateway: MockGateway, city_config: Dict[str, Any], pages: int, workers: int, args: argparse.Namespace) -> Dict[str, Any]:
+    fd._CLIENT = ApiClient(
+        pool_size=workers,
+        rate=args.client_rate or config.API_RATE_PER_SECOND,
+        burst=max(workers, config.API_BURST),
+        cache_ttl=0,
+        headers=fd.HEADERS,
+    )
+    gateway.reset_stats()
+
+    page_count, listings = 0, 0
+    start = time.perf_counter()
+    # One page past the last: the crawl stops on the first empty page
+    for _, rows in fd.iter_pages(city_config, max_pages=pages + 1, workers=workers):
+        page_count += 1
+        listings += len(rows)
+    seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        records = flush(tmp)
+    latencies = np.array([r.seconds for r in records if r.stage == "http_fetch"])
+    p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (np.nan, np.nan)
+
+    result = {
+        "workers": workers,
+        "pages": page_count,
+        "listings": listings,
+        "seconds": round(seconds, 4),
+        "pages_per_second": round(page_count / seconds, 2),
+        "listings_per_second": round(listings / seconds, 1),
+        "p50_ms": round(float(p50) * 1000, 2),
+        "p99_ms": round(float(p99) * 1000, 2),
+        "gateway": dict(gateway.stats),
+    }
+    print(
+        f"⏱️ {workers:>3} workers  {result['pages_per_second']:8.2f} pages/s  "
+        f"{result['listings_per_second']:10.1f} listings/s  "
+        f"p50 {result['p50_ms']:8.2f} ms  p99 {result['p99_ms']:8.2f} ms  "
+        f"429 {gateway.stats['throttled']:>4}  5xx {gateway.stats['errors']:>4}"
+    )
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the crawler against a mock gateway")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--city", default="hanoi", choices=list(config.CITIES))
+    parser.add_argument("--limit", type=int, help="listings per page (default: the city's)")
+    parser.add_argument("--client-rate", type=float, help="client requests/s (default: config)")
+    parser.add_argument("--output", help="write the results as JSON")
+    add_settings_arguments(parser)
+    args = parser.parse_args(argv)
+
+    settings = settings_from_args(args)
+    city_config = dict(config.CITIES[args.city])
+    if args.limit:
+        city_config["limit"] = args.limit
+
+    api_url, client = config.CHO_TOT_PUBLIC_API_URL, fd._CLIENT
+    with MockGateway(settings) as gateway:
+        config.CHO_TOT_PUBLIC_API_URL = gateway.url
+        print(f"🧪 Mock gateway on {gateway.url} ({settings.pages} pages)")
+        try:
+            results = [run_once(gateway, city_config, settings.pages, w, args) for w in args.workers]
+        finally:
+            config.CHO_TOT_PUBLIC_API_URL, fd._CLIENT = api_url, client
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"settings": vars(settings), "results": results}, f, indent=2)
+        print(f"📄 Load test saved: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
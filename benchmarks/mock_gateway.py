@@ -0,0 +1,297 @@
+import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from benchmarks.synthetic import make_ads
+
+# =====================================================
+# MOCK AD-LISTING GATEWAY
+#
+#   python benchmarks/mock_gateway.py --port 8765 --latency 0.05 \
+#       --error-rate 0.02 --rate 50
+#   NHA_DAT_API_URL=http://127.0.0.1:8765/v1/public/ad-listing \
+#       python fetch_data/fetch_data.py --full
+#
+# Answers GET /v1/public/ad-listing like the real gateway ({"ads": [...],
+# "total": n} for region_v2 / cg / st / page / limit), with synthetic
+# ads that are deterministic per query and run out after --pages pages.
+#
+# Failure injection: latency (+ uniform jitter), --error-rate 500/503
+# answers, a server-side rate limit (--rate requests/s, --burst) and
+# random --throttle-rate answered with 429 + Retry-After.
+#
+# --record DIR --upstream URL proxies every query to a real gateway and
+# saves the responses; --replay DIR serves saved responses instead of
+# synthetic ones (404 for queries never recorded).
+# =====================================================
+API_PATH = "/v1/public/ad-listing"
+PAYLOAD_CACHE_ENTRIES = 1024
+
+
+@dataclass
+class GatewaySettings:
+    pages: int = 50            # non-empty pages per (region, category, deal type)
+    latency: float = 0.0       # seconds added to every answer
+    jitter: float = 0.0        # + uniform(0, jitter) seconds
+    error_rate: float = 0.0    # share of 500 / 503 answers
+    throttle_rate: float = 0.0 # share of random 429 answers
+    rate: float = 0.0          # server-side requests / s (0: unlimited)
+    burst: int = 10            # server-side bucket capacity
+    retry_after: float = 1.0   # Retry-After of 429 answers (seconds)
+    seed: int = 0
+    record_dir: Optional[str] = None
+    upstream: Optional[str] = None
+    replay_dir: Optional[str] = None
+
+
+def query_key(params: Dict[str, str]) -> str:
+    encoded = json.dumps(sorted(params.items())).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+class MockGateway:
+    """
+    Local stand-in for the ad-listing gateway, served from a thread.
+    """
+
+    def __init__(self, settings: Optional[GatewaySettings] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.settings = settings or GatewaySettings()
+        self.random = random.Random(self.settings.seed)
+        self._lock = threading.Lock()
+        self._tokens = float(self.settings.burst)
+        self._refilled = time.monotonic()
+        self._payloads: "OrderedDict[str, bytes]" = OrderedDict()
+        self.reset_stats()
+
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                status, headers, body = gateway.answer(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}{API_PATH}"
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "bytes": 0}
+
+    def _count(self, name: str, nbytes: int = 0) -> None:
+        with self._lock:
+            self.stats[name] += 1
+            self.stats["bytes"] += nbytes
+
+    # ----------------------
+    # Failure injection
+    # ----------------------
+    def _admit(self) -> bool:
+        """
+        Server-side token bucket (always admits when rate is 0).
+        """
+        if not self.settings.rate:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.settings.burst,
+                self._tokens + (now - self._refilled) * self.settings.rate,
+            )
+            self._refilled = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def _roll(self, probability: float) -> bool:
+        with self._lock:
+            return self.random.random() < probability
+
+    # ----------------------
+    # Payloads
+    # ----------------------
+    def synthetic(self, params: Dict[str, str]) -> bytes:
+        """
+        Ads of one query, identical on every call (list_ids unique per
+        region / category / deal type / position).
+        """
+        key = query_key(params)
+        with self._lock:
+            if key in self._payloads:
+                self._payloads.move_to_end(key)
+                return self._payloads[key]
+
+        page = int(params.get("page", 1))
+        limit = int(params.get("limit", 20))
+        ad_type = params.get("st", "s")[0]
+        series = f"{params.get('region_v2')}:{params.get('cg')}:{ad_type}"
+
+        ads = []
+        if 1 <= page <= self.settings.pages:
+            base = zlib.crc32(series.encode()) % 10_000 * 100_000_000
+            ads = make_ads(limit, seed=zlib.crc32(f"{series}:{page}".encode()) + self.settings.seed)
+            for i, ad in enumerate(ads):
+                ad["list_id"] = base + (page - 1) * limit + i
+                ad["type"] = ad_type
+
+        body = json.dumps(
+            {"ads": ads, "total": self.settings.pages * limit},
+            ensure_ascii=False,
+        ).encode()
+
+        with self._lock:
+            self._payloads[key] = body
+            if len(self._payloads) > PAYLOAD_CACHE_ENTRIES:
+                self._payloads.popitem(last=False)
+        return body
+
+    def _record_path(self, directory: str, params: Dict[str, str]) -> str:
+        return os.path.join(directory, f"{query_key(params)}.json")
+
+    def recorded(self, params: Dict[str, str]) -> Optional[bytes]:
+        try:
+            with open(self._record_path(self.settings.replay_dir, params), encoding="utf-8") as f:
+                return json.dumps(json.load(f)["body"], ensure_ascii=False).encode()
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def proxy(self, params: Dict[str, str]) -> Tuple[int, bytes]:
+        """
+        Forward a query upstream and save a successful answer.
+        """
+        import requests
+
+        response = requests.get(self.settings.upstream, params=params, timeout=30)
+        if response.status_code == 200:
+            os.makedirs(self.settings.record_dir, exist_ok=True)
+            path = self._record_path(self.settings.record_dir, params)
+            with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({"params": params, "body": response.json()}, f, ensure_ascii=False)
+            os.replace(f"{path}.tmp", path)
+        return response.status_code, response.content
+
+    # ----------------------
+    # Request
+    # ----------------------
+    def answer(self, path: str) -> Tuple[int, Dict[str, str], bytes]:
+        self._count("requests")
+        url = urlsplit(path)
+        if url.path != API_PATH:
+            return 404, {}, b'{"error": "not found"}'
+        params = dict(parse_qsl(url.query))
+
+        settings = self.settings
+        if settings.latency or settings.jitter:
+            time.sleep(settings.latency + self.random.uniform(0, settings.jitter))
+
+        if not self._admit() or self._roll(settings.throttle_rate):
+            self._count("throttled")
+            return 429, {"Retry-After": f"{settings.retry_after:g}"}, b'{"error": "too many requests"}'
+        if self._roll(settings.error_rate):
+            self._count("errors")
+            return self.random.choice([500, 503]), {}, b'{"error": "server error"}'
+
+        if settings.upstream and settings.record_dir:
+            status, body = self.proxy(params)
+        elif settings.replay_dir:
+            body = self.recorded(params)
+            status = 200 if body is not None else 404
+            body = body if body is not None else b'{"error": "not recorded"}'
+        else:
+            status, body = 200, self.synthetic(params)
+
+        self._count("ok" if status == 200 else "errors", len(body))
+        return status, {}, body
+
+    # ----------------------
+    # Lifecycle
+    # ----------------------
+    def start(self) -> "MockGateway":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "MockGateway":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--pages", type=int, default=50, help="non-empty pages per series")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.0, help="server-side requests/s (0: unlimited)")
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--record", dest="record_dir", help="save proxied responses here")
+    parser.add_argument("--upstream", help="real gateway URL to proxy when recording")
+    parser.add_argument("--replay", dest="replay_dir", help="serve responses recorded here")
+
+
+def settings_from_args(args: argparse.Namespace) -> GatewaySettings:
+    return GatewaySettings(**{
+        name: getattr(args, name) for name in GatewaySettings.__dataclass_fields__
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a mock ad-listing gateway")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+
+    if args.record_dir and not args.upstream:
+        parser.error("--record needs --upstream")
+
+    gateway = MockGateway(settings_from_args(args), args.host, args.port)
+    print(f"🧪 Mock gateway on {gateway.url}")
+    try:
+        gateway.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.server.server_close()
+        print(f"📊 {gateway.stats}")
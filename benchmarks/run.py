@@ -0,0 +1,268 @@
+import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+import argparse
+import json
+import platform
+import tempfile
+import time
+from datetime import datetime, UTC
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from analytics.cube import RollupCube, StreamingDealScorer
+from analytics.deals import detect_deals
+from analytics.metrics import (
+    price_by_district,
+    price_m2_by_district_category,
+    supply_by_district,
+)
+from analytics.reposts import RepostIndex
+from analytics.rollups import count_new_listings, update_daily_rollups
+from analytics.sketches import TDigest
+from analytics.stats import district_stats
+from analytics.trends import rollup_trend, trend_7_days
+from benchmarks.synthetic import iter_rows, make_ads, make_listings
+from fetch_data.fetch_data import normalize_ads
+from fetch_data.storage import save_city_data
+from reports.export_docx import export_docx
+from reports.export_excel import export_excel
+from utils.load import load_data
+import config
+
+# =====================================================
+# PIPELINE BENCHMARKS (synthetic listings)
+#
+#   python benchmarks/run.py --rows 1000 10000 100000 \
+#       --output output/benchmark.json \
+#       --baseline benchmarks/baseline.json --tolerance 1.25
+#
+# Every stage is timed at every size; with --baseline, a stage slower
+# than tolerance × its baseline time is a regression and the run exits
+# with status 1.
+# =====================================================
+DEFAULT_ROWS = [1_000, 10_000, 100_000]
+DEFAULT_TOLERANCE = 1.25
+
+EXCEL_MAX_ROWS = 1_048_575  # sheet limit, minus the header row
+ADS_CHUNK_ROWS = 100_000    # raw payloads generated / normalized per chunk
+
+CITY_KEY = "bench"
+CITY_CONFIG = config.CITIES["hanoi"]
+
+
+def timed(fn: Callable[[], Any], repeat: int = 1) -> Tuple[float, Any]:
+    """
+    Best wall time of `repeat` calls, and the result of the last one.
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+class Suite:
+    """
+    Collects one result per (stage, rows).
+    """
+
+    def __init__(self, repeat: int = 1) -> None:
+        self.repeat = repeat
+        self.results: List[Dict[str, Any]] = []
+
+    def run(self, name: str, rows: int, fn: Callable[[], Any], repeat: Optional[int] = None) -> Any:
+        seconds, result = timed(fn, repeat or self.repeat)
+        self.results.append({
+            "name": name,
+            "rows": rows,
+            "seconds": round(seconds, 6),
+            "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        })
+        print(f"⏱️ {name:<32} {rows:>10,} rows  {seconds:9.3f} s")
+        return result
+
+
+# =====================================================
+# STAGES
+# =====================================================
+def bench_normalize(suite: Suite, n: int) -> None:
+    seconds = 0.0
+    for start in range(0, n, ADS_CHUNK_ROWS):
+        ads = make_ads(min(ADS_CHUNK_ROWS, n - start), seed=start)
+        chunk_seconds, _ = timed(
+            lambda: normalize_ads(ads, CITY_CONFIG, "2024-01-01 00:00:00")
+        )
+        seconds += chunk_seconds
+
+    suite.results.append({
+        "name": "normalize_ads",
+        "rows": n,
+        "seconds": round(seconds, 6),
+        "rows_per_second": round(n / seconds, 1) if seconds else None,
+    })
+    print(f"⏱️ {'normalize_ads':<32} {n:>10,} rows  {seconds:9.3f} s")
+
+
+def bench_size(suite: Suite, n: int, workdir: str, seed: int = 0) -> None:
+    """
+    Time the whole pipeline on n synthetic listings.
+    """
+    bench_normalize(suite, n)
+
+    df = make_listings(n, seed=seed)
+    output_dir = os.path.join(workdir, str(n))
+
+    # Excel cannot hold more rows than a sheet: every other output only
+    with_excel = n <= EXCEL_MAX_ROWS
+    _, _, path_csv = suite.run(
+        "save_city_data" if with_excel else "save_city_data[csv]",
+        n,
+        lambda: save_city_data(
+            iter_rows(df), CITY_KEY, output_dir, excel=with_excel,
+        ),
+        repeat=1,
+    )
+
+    suite.run("load_data[csv]", n, lambda: load_data(path_csv))
+    suite.run(
+        "load_data[history]",
+        n,
+        lambda: load_data(city_key=CITY_KEY, output_dir=output_dir),
+    )
+    frame = load_data(path_csv)
+
+    # ----------------------
+    # analytics
+    # ----------------------
+    stats = suite.run("district_stats", n, lambda: district_stats(frame))
+    suite.run("price_by_district", n, lambda: price_by_district(frame))
+    suite.run("price_m2_by_district_category", n, lambda: price_m2_by_district_category(frame))
+    suite.run("supply_by_district", n, lambda: supply_by_district(frame))
+    suite.run("trend_7_days", n, lambda: trend_7_days(frame))
+    deals = suite.run("detect_deals", n, lambda: detect_deals(frame, stats=stats))
+
+    suite.run(
+        "TDigest.update",
+        n,
+        lambda: TDigest().update(frame["price_million_per_m2"].to_numpy()),
+    )
+
+    def build_cube():
+        cube = RollupCube()
+        cube.update(frame)
+        return cube
+
+    cube = suite.run("RollupCube.update", n, build_cube)
+    suite.run("RollupCube.baselines", n, lambda: cube.baselines(frame))
+    suite.run("StreamingDealScorer.deals", n, lambda: StreamingDealScorer(cube).deals(frame))
+
+    suite.run("RepostIndex.add", n, lambda: RepostIndex().add(frame), repeat=1)
+
+    new_counts = suite.run("count_new_listings", n, lambda: count_new_listings(frame))
+    dates = frame["crawl_time"].dt.normalize().unique()
+    rollups = suite.run(
+        "update_daily_rollups",
+        n,
+        lambda: update_daily_rollups(CITY_KEY, output_dir, [new_counts], dates),
+        repeat=1,
+    )
+    suite.run("rollup_trend[90]", n, lambda: rollup_trend(rollups, 90))
+
+    # ----------------------
+    # reports
+    # ----------------------
+    reports = {
+        "Giá trung bình & median theo quận": price_by_district(frame, stats),
+        "Giá/m² theo quận + loại": price_m2_by_district_category(frame, stats),
+        "Nguồn cung theo quận": supply_by_district(frame, stats),
+        "Xu hướng 7 ngày": trend_7_days(frame),
+        "Tin giá tốt": deals,
+    }
+    if len(deals) <= EXCEL_MAX_ROWS:
+        suite.run(
+            "export_excel",
+            n,
+            lambda: export_excel(reports, os.path.join(output_dir, "report.xlsx")),
+        )
+    suite.run(
+        "export_docx",
+        n,
+        lambda: export_docx(frame, deals, os.path.join(output_dir, "deals.docx")),
+    )
+
+
+# =====================================================
+# REGRESSIONS
+# =====================================================
+def compare(
+    results: List[Dict[str, Any]],
+    baseline: Dict[str, Any],
+    tolerance: float,
+) -> int:
+    """
+    Annotate results with their baseline time; returns the number of
+    stages slower than tolerance × baseline.
+    """
+    reference = {(r["name"], r["rows"]): r["seconds"] for r in baseline["results"]}
+
+    regressions = 0
+    for result in results:
+        seconds = reference.get((result["name"], result["rows"]))
+        result["baseline_seconds"] = seconds
+        result["regressed"] = seconds is not None and result["seconds"] > seconds * tolerance
+        regressions += result["regressed"]
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the listing pipeline")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--repeat", type=int, default=1, help="best of N for in-memory stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=os.path.join(config.OUTPUT_DIR, "benchmark.json"))
+    parser.add_argument("--baseline", help="earlier benchmark JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    suite = Suite(repeat=args.repeat)
+    with tempfile.TemporaryDirectory(prefix="nha_dat_bench_") as workdir:
+        for n in args.rows:
+            bench_size(suite, n, workdir, seed=args.seed)
+
+    regressions = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(suite.results, json.load(f), args.tolerance)
+
+    report = {
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "rows": args.rows,
+        "tolerance": args.tolerance if args.baseline else None,
+        "regressions": regressions,
+        "results": suite.results,
+    }
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"📄 Benchmark saved: {args.output}")
+
+    for result in suite.results:
+        if result.get("regressed"):
+            print(
+                f"❌ {result['name']} @ {result['rows']:,} rows: "
+                f"{result['seconds']:.3f} s vs {result['baseline_seconds']:.3f} s"
+            )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
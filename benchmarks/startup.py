@@ -0,0 +1,132 @@
+import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+import argparse
+import ast
+import importlib.util
+import json
+import subprocess
+from typing import Any, Dict, List, Optional
+
+# =====================================================
+# STARTUP BENCHMARK (cold imports of the entry points)
+#
+#   python benchmarks/startup.py --repeat 5 --budget 1.5
+#
+# Every entry point is imported in a fresh interpreter (best of
+# --repeat). An entry point over its time budget, or one that loads a
+# module meant to stay lazy, fails the run (exit status 1).
+#
+# The dashboard is measured through the import statements at the top
+# of dashboard/app.py (the script itself needs a Streamlit server), so
+# the benchmark follows the app as its imports change.
+# =====================================================
+DASHBOARD = os.path.join(PROJECT_ROOT, "dashboard", "app.py")
+
+DEFAULT_BUDGET = 1.5  # seconds per entry point, cold
+
+# Feature-only dependencies: loaded when a crawl / export runs, never
+# at startup
+LAZY_MODULES = ["requests", "docx", "openpyxl", "fetch_data.fetch_data", "reports.export_excel"]
+
+# Child interpreter: time the imports, report what they loaded
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+{imports}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "modules": sorted(sys.modules)}}))
+"""
+
+
+def top_level_imports(path: str) -> List[str]:
+    """
+    Module-level import statements of a script, as source lines.
+    Modules that are not installed here (e.g. streamlit) are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    lines = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            names = [node.module]
+        else:
+            continue
+        if all(importlib.util.find_spec(name.split(".")[0]) for name in names):
+            lines.append(ast.unparse(node))
+    return lines
+
+
+def entry_points() -> Dict[str, str]:
+    return {
+        "dashboard": "\n".join(top_level_imports(DASHBOARD)),
+        "streamlit_app": "import streamlit_app",
+        "worker": "import jobs.worker",
+    }
+
+
+def probe(imports: str) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=PROJECT_ROOT, imports=imports)],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(name: str, imports: str, repeat: int, budget: float) -> Dict[str, Any]:
+    runs = [probe(imports) for _ in range(repeat)]
+    seconds = min(run["seconds"] for run in runs)
+    eager = [m for m in LAZY_MODULES if m in runs[-1]["modules"]]
+
+    result = {
+        "name": name,
+        "seconds": round(seconds, 4),
+        "budget": budget,
+        "modules": len(runs[-1]["modules"]),
+        "eager": eager,
+        "failed": seconds > budget or bool(eager),
+    }
+    print(f"⏱️ {name:<16} {seconds:7.3f} s  {result['modules']:>5} modules")
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark entry point startup time")
+    parser.add_argument("--repeat", type=int, default=3, help="best of N cold starts")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="seconds per entry point")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = [
+        measure(name, imports, args.repeat, args.budget)
+        for name, imports in entry_points().items()
+    ]
+
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"budget": args.budget, "results": results}, f, indent=2)
+        print(f"📄 Startup benchmark saved: {args.output}")
+
+    for result in results:
+        if result["seconds"] > result["budget"]:
+            print(f"❌ {result['name']}: {result['seconds']:.3f} s over the {result['budget']:.2f} s budget")
+        if result["eager"]:
+            print(f"❌ {result['name']} loads {', '.join(result['eager'])} at startup")
+
+    return 1 if any(result["failed"] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
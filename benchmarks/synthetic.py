@@ -0,0 +1,141 @@
+from datetime import datetime, UTC
+from typing import Any, Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from fetch_data.storage import COLUMN_ORDER
+from utils.schema import LINK_PREFIX
+
+# =====================================================
+# SYNTHETIC LISTINGS
+#
+# Realistic-looking ad-listing payloads (fetch_page raw shape) and
+# listing frames (COLUMN_ORDER schema) for benchmarks.
+# =====================================================
+DISTRICTS = [
+    "Quận Ba Đình", "Quận Hoàn Kiếm", "Quận Tây Hồ", "Quận Long Biên",
+    "Quận Cầu Giấy", "Quận Đống Đa", "Quận Hai Bà Trưng", "Quận Hoàng Mai",
+    "Quận Thanh Xuân", "Quận Hà Đông", "Quận Nam Từ Liêm", "Quận Bắc Từ Liêm",
+    "Huyện Gia Lâm", "Huyện Đông Anh", "Huyện Thanh Trì",
+]
+WARDS_PER_DISTRICT = 12
+
+TITLE_WORDS = [
+    "Bán", "nhà", "mặt", "phố", "ngõ", "ô tô", "đỗ cửa", "chính chủ",
+    "sổ đỏ", "lô góc", "kinh doanh", "gần chợ", "tầng", "mới xây",
+    "thang máy", "giá rẻ", "full nội thất", "view hồ", "trung tâm",
+]
+
+STREETS = [
+    "Kim Mã", "Đội Cấn", "Hàng Bông", "Lạc Long Quân", "Nguyễn Chí Thanh",
+    "Ngọc Lâm", "Xuân Thủy", "Trần Duy Hưng", "Tây Sơn", "Khâm Thiên",
+    "Bạch Mai", "Minh Khai", "Giải Phóng", "Khương Đình", "Nguyễn Trãi",
+    "Quang Trung", "Mỹ Đình", "Phạm Văn Đồng", "Ngô Xuân Quảng", "Cổ Loa",
+    "Ngọc Hồi", "Láng", "Thái Hà", "Hoàng Cầu", "Văn Cao",
+]
+
+FIRST_LIST_ID = 100_000_000
+
+
+def _price_string(price: float) -> str:
+    return f"{price / 1e9:.2f} tỷ".replace(".", ",")
+
+
+def _columns(n: int, seed: int, days: int) -> Dict[str, np.ndarray]:
+    """
+    Column arrays shared by the payload and frame generators.
+    """
+    rng = np.random.default_rng(seed)
+
+    district = rng.integers(0, len(DISTRICTS), n)
+    ward = rng.integers(0, WARDS_PER_DISTRICT, n)
+
+    # District price levels 60–250 M/m2, log-normal spread around them
+    levels = np.linspace(60, 250, len(DISTRICTS))[::-1]
+    price_m2 = levels[district] * rng.lognormal(0, 0.35, n)
+    area = np.round(rng.lognormal(np.log(55), 0.45, n), 1)
+    price = np.round(price_m2 * area, -1) * 1e6
+
+    words = rng.integers(0, len(TITLE_WORDS), (n, 6))
+    street = rng.integers(0, len(STREETS), n)
+    floors = rng.integers(2, 9, n)
+    now = datetime.now(UTC).replace(microsecond=0, tzinfo=None)
+    offsets = rng.integers(0, days * 86400, n)
+
+    return {
+        "district": district,
+        "ward": ward,
+        "price_m2": np.round(price_m2, 2),
+        "area": area,
+        "price": price,
+        "words": words,
+        "street": street,
+        "floors": floors,
+        "crawl_time": pd.Timestamp(now) - pd.to_timedelta(offsets, unit="s"),
+        "list_id": FIRST_LIST_ID + np.arange(n),
+    }
+
+
+def _title(cols: Dict[str, np.ndarray], i: int) -> str:
+    phrase = " ".join(TITLE_WORDS[w] for w in cols["words"][i])
+    return (
+        f"{phrase} phố {STREETS[cols['street'][i]]} {cols['floors'][i]} tầng "
+        f"{cols['area'][i]:g}m2 phường {cols['ward'][i] + 1} {DISTRICTS[cols['district'][i]]}"
+    )
+
+
+def make_ads(n: int, seed: int = 0, days: int = 30) -> List[Dict[str, Any]]:
+    """
+    n raw ads as returned by the ad-listing API (see fetch_page).
+    """
+    cols = _columns(n, seed, days)
+    return [
+        {
+            "list_id": int(cols["list_id"][i]),
+            "type": "s",
+            "subject": _title(cols, i),
+            "price": float(cols["price"][i]),
+            "price_string": _price_string(cols["price"][i]),
+            "price_million_per_m2": float(cols["price_m2"][i]),
+            "area": float(cols["area"][i]),
+            "ward_name_v3": f"Phường {cols['ward'][i] + 1}",
+            "area_name": DISTRICTS[cols["district"][i]],
+            "region_name_v3": "Hà Nội",
+        }
+        for i in range(n)
+    ]
+
+
+def make_listings(n: int, seed: int = 0, days: int = 30) -> pd.DataFrame:
+    """
+    n normalized listings in the storage schema (COLUMN_ORDER).
+    """
+    cols = _columns(n, seed, days)
+
+    districts = np.array(DISTRICTS, dtype=object)[cols["district"]]
+    titles = pd.Series([_title(cols, i) for i in range(n)])
+
+    df = pd.DataFrame({
+        "city": "Hà Nội",
+        "category": "Bán nhà",
+        "category_code": "1020",
+        "title": titles,
+        "price_string": pd.Series(cols["price"] / 1e9).map("{:.2f} tỷ".format).str.replace(".", ","),
+        "price": cols["price"],
+        "price_million_per_m2": cols["price_m2"],
+        "area": cols["area"],
+        "ward_name": "Phường " + pd.Series(cols["ward"] + 1).astype(str),
+        "area_name": districts,
+        "crawl_time": pd.Series(cols["crawl_time"]).dt.strftime("%Y-%m-%d %H:%M:%S"),
+        "link": LINK_PREFIX + pd.Series(cols["list_id"]).astype(str),
+    })
+    return df[COLUMN_ORDER]
+
+
+def iter_rows(df: pd.DataFrame, chunk_size: int = 50_000) -> Iterator[Dict[str, Any]]:
+    """
+    Stream a listing frame as row dicts, like the crawler does.
+    """
+    for start in range(0, len(df), chunk_size):
+        yield from df.iloc[start:start + chunk_size].to_dict("records")
@@ -1,7 +1,13 @@
 # fetch_data/config.py
+import os
+
 OUTPUT_DIR = "output"
+REPORTS_DIR = "output_reports"
 
-CHO_TOT_PUBLIC_API_URL = "https://gateway.chotot.com/v1/public/ad-listing"
+# NHA_DAT_API_URL points the crawler elsewhere, e.g. benchmarks/mock_gateway.py
+CHO_TOT_PUBLIC_API_URL = os.environ.get(
+    "NHA_DAT_API_URL", "https://gateway.chotot.com/v1/public/ad-listing"
+)
 
 CITIES = {
     "hanoi": {
@@ -21,3 +27,91 @@ CITIES = {
         "page": 5,
     },
 }
+
+# =====================================================
+# FULL CRAWL (crawl_city(..., full=True))
+# =====================================================
+CRAWL_MAX_PAGES = 500        # upper bound on pages walked per city
+CRAWL_PAGE_WORKERS = 8       # concurrent page requests per city
+CRAWL_CITY_PROCESSES = 0     # city crawl processes (0: one per city)
+CRAWL_INCREMENTAL_WORKERS = 2  # small window: incremental runs stop early
+
+# =====================================================
+# CRAWL PLAN (fetch_data.planner: region × category × deal type × page)
+# =====================================================
+PLAN_CATEGORIES = {          # category_code → label
+    "1010": "Căn hộ/Chung cư",
+    "1020": "Nhà ở",
+    "1040": "Đất",
+}
+PLAN_DEAL_TYPES = {          # st: API filter, ad_type: ad "type" kept
+    "sale": {"label": "Bán", "st": "s,k", "ad_type": "s"},
+    "rent": {"label": "Cho thuê", "st": "u,h", "ad_type": "u"},
+}
+PLAN_PAGES = 20              # pages per (region, category, deal type)
+PLAN_WORKERS = 8             # concurrent page downloads
+
+# =====================================================
+# API CLIENT (rate limit, retries, response cache)
+# =====================================================
+API_TIMEOUT = 15               # seconds per request
+API_RATE_PER_SECOND = 8.0      # token-bucket refill rate (max requests / s)
+API_BURST = 8                  # token-bucket capacity
+API_MIN_RATE_PER_SECOND = 0.5  # floor when the gateway answers 429
+API_MAX_RETRIES = 5            # retries on 429 / 5xx / connection errors
+API_BACKOFF_BASE = 0.5         # seconds, doubled on every retry
+API_BACKOFF_MAX = 30.0         # cap on a single backoff sleep
+API_CACHE_TTL = 300            # seconds a cached page is served as-is
+API_CACHE_MAX_BYTES = 256 * 1024 ** 2  # on-disk responses, LRU-evicted
+
+# =====================================================
+# HISTORY (Parquet, partitioned by city and crawl date)
+# =====================================================
+HISTORY_COMPACT_MIN_FILES = 8  # compact a partition once it has this many files
+
+# =====================================================
+# STORAGE
+# =====================================================
+STORAGE_BATCH_SIZE = 5000  # rows buffered before each flush to disk
+
+# =====================================================
+# DEALS
+# =====================================================
+DEAL_MIN_SAMPLES = 10  # listings a ward/district needs to serve as baseline
+
+# =====================================================
+# REPOSTS (near-duplicate listings, MinHash / LSH)
+# =====================================================
+REPOST_NUM_PERM = 64           # MinHash signature length
+REPOST_BANDS = 16              # LSH bands (REPOST_NUM_PERM / bands rows each)
+REPOST_SIMILARITY = 0.7        # estimated title Jaccard to call a repost
+REPOST_PRICE_TOLERANCE = 0.05  # max relative price gap between reposts
+REPOST_AREA_TOLERANCE = 0.05   # max relative area gap between reposts
+REPOST_MAX_SHARDS = 16         # saved shards merged into one above this
+
+# =====================================================
+# INSTRUMENTATION (utils.instrument)
+# =====================================================
+INSTRUMENT_TRACE_MEMORY = False  # per-stage peaks via tracemalloc (slow)
+INSTRUMENT_LOG_MAX_BYTES = 32 * 1024 ** 2  # stages.jsonl rotated past this size
+
+# =====================================================
+# REPORT CACHE (reports.cache)
+# =====================================================
+REPORT_CACHE_VERSION = 3                   # bump when report logic changes
+REPORT_CACHE_MAX_BYTES = 512 * 1024 ** 2   # on-disk artifacts, LRU-evicted
+REPORT_CACHE_MEMORY_ENTRIES = 8            # report sets kept in memory
+
+# =====================================================
+# DOCX REPORTS (reports.export_docx)
+# =====================================================
+REPORT_TOP_DEALS = 5       # deals listed per DOCX report
+REPORT_DOCX_WORKERS = 4    # processes for batch DOCX generation
+
+# =====================================================
+# BACKGROUND JOBS (jobs.store / jobs.worker)
+# =====================================================
+JOB_WORKERS = 2            # worker processes started by the dashboard
+JOB_POLL_SECONDS = 1.0     # idle worker polling interval
+JOB_STALE_SECONDS = 120    # running job without heartbeat → requeued
+JOB_HEARTBEAT_SECONDS = 15  # running job heartbeat interval (< JOB_STALE_SECONDS)
@@ -10,27 +10,80 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 # Import from your working main.py & config
-from fetch_data.fetch_data import crawl_city, get_data
-from config import CITIES
+from config import CITIES, JOB_POLL_SECONDS, REPORTS_DIR
 
 # Your original modules for reports
-from analytics.metrics import (
-    price_by_district,
-    price_m2_by_district_category,
-    supply_by_district
-)
-from analytics.trends import trend_7_days
-from analytics.deals import detect_deals
-from reports.export_excel import export_excel
-from reports.export_docx import export_docx
+# (crawl / export modules only load inside background jobs: keep these
+# imports light, benchmarks/startup.py fails when they are not)
+from analytics.trends import TREND_WINDOWS, rollup_trend
+from analytics.cube import ALL, cube_path, load_cube
+from analytics.rollups import load_rollups, rollups_path
+from jobs.store import DONE, FAILED, JobStore
+from jobs.worker import ensure_workers
+from reports.build import city_report_key, report_files
+from reports.cache import ReportCache
+from utils.frame_index import Filters, FrameIndex
+from utils.instrument import load_runs, stage_breakdown
+from utils.load import load_snapshot, snapshot_version
+from utils.schema import table_to_frame, to_link
 
 # Constants
 OUTPUT_DIR = "output"
-REPORTS_DIR = "output_reports"
+JOB_POLL_INTERVAL = max(JOB_POLL_SECONDS, 2.0)
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
+
+@st.cache_resource
+def get_job_store() -> JobStore:
+    """
+    Background job queue shared with the worker processes.
+    """
+    return JobStore()
+
+
+@st.cache_resource
+def get_report_cache() -> ReportCache:
+    """
+    One report cache shared by every session.
+    """
+    return ReportCache(os.path.join(REPORTS_DIR, "cache"))
+
+
+@st.cache_resource(max_entries=4)
+def load_city_frame(path: str, version: str) -> pd.DataFrame:
+    """
+    Memory-mapped snapshot → DataFrame, reused across reruns until the
+    snapshot version (mtime/size) changes, i.e. a new crawl lands.
+    """
+    return table_to_frame(load_snapshot(path))
+
+
+@st.cache_resource(max_entries=4)
+def load_city_index(path: str, version: str) -> FrameIndex:
+    """
+    Sort orders and column indexes of a snapshot, shared by every rerun
+    and session until the snapshot changes.
+    """
+    return FrameIndex(load_city_frame(path, version))
+
+
+@st.cache_resource(max_entries=4)
+def load_city_cube(city_key: str, version: str):
+    """
+    Rollup cube of a city, reloaded only when a crawl updates it.
+    """
+    return load_cube(city_key, OUTPUT_DIR)
+
+
+@st.cache_resource(max_entries=4)
+def load_city_rollups(city_key: str, version: str) -> pd.DataFrame:
+    """
+    Daily rollups of a city, reloaded only when a crawl updates them.
+    """
+    return load_rollups(city_key, OUTPUT_DIR)
+
 # ────────────────────────────────────────────────────────────────
 # STREAMLIT INTERFACE
 # ────────────────────────────────────────────────────────────────
@@ -44,66 +97,219 @@ city_key = st.sidebar.selectbox(
     format_func=lambda x: CITIES[x]["name"]
 )
 
-#mode = st.sidebar.radio(
-#    "Chế độ chạy",
-#    ["Chỉ thành phố được chọn", "Toàn bộ thành phố"]
-#)
-
-mode = "Chỉ thành phố được chọn"
+mode = st.sidebar.radio(
+    "Chế độ chạy",
+    ["Chỉ thành phố được chọn", "Toàn bộ thành phố"]
+)
 
 if st.sidebar.button("🧹 Clear session & retry"):
     st.session_state.clear()
     st.rerun()
 
-# Main button
-if st.sidebar.button("🚀 Tìm kiếm"):
-    with st.spinner("Đang thu thập dữ liệu... Vui lòng chờ"):
-        try:
-            if mode == "Toàn bộ các thành phố":
-                #st.info("Chạy toàn bộ quy trình ...")
-                get_data()
-                st.success("Hoàn tất thu thập tất cả thành phố!")
-                st.info(f"Kết quả lưu tại: **{os.path.abspath(OUTPUT_DIR)}**")
-                st.info("Các file ví dụ: hanoi.xlsx, hanoi.csv, ...")
-
-            else:
-                # Reuse crawl_city from main.py
-                city_config = CITIES[city_key]
-                st.info(f"Thu thập dữ liệu chỉ cho: **{city_config['name']}**")
-
-                crawl_city(city_key, city_config)
-
-                st.success(f"Thu thập xong cho {city_config['name']}")
-                #st.info(f"Kết quả lưu tại:")
-                #st.info(f"• **{os.path.abspath(os.path.join(OUTPUT_DIR, f'{city_key}.xlsx'))}**")
-                #st.info(f"• **{os.path.abspath(os.path.join(OUTPUT_DIR, f'{city_key}.csv'))}**")
-
-            # ── Try to load latest data for display (optional) ──
-            latest_file = os.path.join(OUTPUT_DIR, f"{city_key}.xlsx")
-            if os.path.exists(latest_file) and mode != "Toàn bộ các thành phố":
-                try:
-                    df = pd.read_excel(latest_file)
-                    st.session_state.df = df
-                    st.session_state.data_excel = latest_file
-                    st.session_state.data_csv = latest_file.replace(".xlsx", ".csv")
-                except:
-                    st.warning("Không đọc được file kết quả để hiển thị")
-
-        except Exception as e:
-            st.error("Có lỗi xảy ra khi chạy scraper")
+def show_snapshot(city_key: str) -> None:
+    """
+    Point the data view at the latest snapshot of a city, if any.
+    """
+    latest_file = os.path.join(OUTPUT_DIR, f"{city_key}.xlsx")
+    snapshot_file = latest_file.replace(".xlsx", ".arrow")
+    if os.path.exists(snapshot_file):
+        st.session_state.snapshot = snapshot_file
+        st.session_state.data_excel = latest_file
+        st.session_state.data_csv = latest_file.replace(".xlsx", ".csv")
+
+
+def render_jobs(jobs) -> None:
+    for job in jobs:
+        scope = CITIES[job.params["city_key"]]["name"] if "city_key" in job.params else "Toàn bộ thành phố"
+        label = f"{job.kind} · {scope}: {job.message or job.status}"
+        if job.status == FAILED:
+            st.error(label)
             with st.expander("Chi tiết lỗi"):
-                pass
-                st.code(str(e))
-                st.code(traceback.format_exc())
+                st.code(job.error)
+        elif job.status == DONE:
+            st.success(label)
+        else:
+            st.progress(job.progress or 0.0, text=label)
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def poll_jobs(state_key: str) -> None:
+    """
+    Live status of this session's background jobs; the rest of the page
+    stays interactive. Once they have all finished, the page reruns.
+    """
+    job_ids = st.session_state.get(state_key) or []
+    jobs = [job for job in map(get_job_store().get, job_ids) if job is not None]
+    render_jobs(jobs)
+
+    if all(job.finished for job in jobs):
+        st.session_state.pop(state_key, None)
+        st.session_state.finished_jobs = [job.id for job in jobs]
+        if state_key == "crawl_jobs" and any(job.status == DONE for job in jobs):
+            show_snapshot(city_key)
+        st.rerun()
+
+
+SORT_COLUMNS = {
+    "crawl_time": "Thời gian thu thập",
+    "price": "Giá",
+    "area": "Diện tích",
+    "price_million_per_m2": "Giá/m²",
+    "area_name": "Quận / huyện",
+    "ward_name": "Phường / xã",
+}
+
+
+def range_filter(container, index: FrameIndex, column: str, label: str, scale: float = 1.0):
+    """
+    Slider over a numeric column; (None, None) while it spans the whole
+    range, so an untouched slider filters nothing.
+    """
+    low, high = index.bounds(column)
+    if pd.isna(low) or low == high:
+        return None, None
+    low, high = low / scale, high / scale
+    selected = container.slider(label, low, high, (low, high), key=f"view_{column}")
+    return (
+        None if selected[0] <= low else selected[0] * scale,
+        None if selected[1] >= high else selected[1] * scale,
+    )
+
+
+def data_view(index: FrameIndex) -> None:
+    """
+    Server-side paged, sorted and filtered table: only the current page
+    of rows is sent to the browser.
+    """
+    with st.expander("🔍 Lọc & sắp xếp", expanded=True):
+        left, middle, right = st.columns(3)
+
+        district = left.selectbox(
+            "Quận / huyện",
+            [None, *index.values("area_name")],
+            format_func=lambda d: "Tất cả" if d is None else d,
+            key="view_district",
+        )
+        wards = index.values_where("ward_name", "area_name", district) if district else []
+        ward = left.selectbox(
+            "Phường / xã",
+            [None, *wards],
+            format_func=lambda w: "Tất cả" if w is None else w,
+            key="view_ward",
+            disabled=not district,
+        )
+
+        filters = Filters(
+            equals={"area_name": district, "ward_name": ward},
+            ranges={
+                "price": range_filter(middle, index, "price", "Giá (tỷ)", 1_000_000_000),
+                "area": range_filter(middle, index, "area", "Diện tích (m²)"),
+                "price_million_per_m2": range_filter(right, index, "price_million_per_m2", "Giá/m² (triệu)"),
+            },
+        )
+
+        sort_by = right.selectbox(
+            "Sắp xếp theo",
+            [None, *SORT_COLUMNS],
+            format_func=lambda c: "Mặc định" if c is None else SORT_COLUMNS[c],
+            key="view_sort",
+        )
+        ascending = right.radio(
+            "Thứ tự", ["Tăng dần", "Giảm dần"], horizontal=True, key="view_order"
+        ) == "Tăng dần"
+
+    # Back to the first page whenever the filters, sort or page size change
+    page_size = st.session_state.get("view_page_size", 50)
+    signature = repr((filters, sort_by, ascending, page_size))
+    if st.session_state.get("view_signature") != signature:
+        st.session_state.view_signature = signature
+        st.session_state.view_page = 1
+
+    page, total = index.query(
+        filters,
+        sort_by,
+        ascending,
+        page=st.session_state.view_page - 1,
+        page_size=page_size,
+    )
+    # The compact snapshot keys listings by list_id: show the link instead
+    if "list_id" in page.columns:
+        position = page.columns.get_loc("list_id")
+        link = to_link(page.pop("list_id"))
+        page.insert(position, "link", link)
+    st.dataframe(
+        page,
+        use_container_width=True,
+        hide_index=True,
+        column_config={"link": st.column_config.LinkColumn("link")},
+    )
+
+    pages = max(1, -(-total // page_size))
+    left, middle, right = st.columns([1, 1, 3])
+    left.number_input("Trang", 1, pages, key="view_page")
+    middle.selectbox("Số dòng / trang", [25, 50, 100, 200], index=1, key="view_page_size")
+    first = (st.session_state.view_page - 1) * page_size
+    right.caption(f"Dòng {min(first + 1, total)}–{min(first + page_size, total)} / {total} ({pages} trang)")
+
+
+# Main button: queue the crawl, workers run it in the background
+if st.sidebar.button("🚀 Tìm kiếm"):
+    try:
+        store = get_job_store()
+        if mode == "Toàn bộ thành phố":
+            # One job: cities crawl and analyse in parallel processes,
+            # then merge into the comparison workbook
+            jobs = [store.enqueue("compare")]
+        else:
+            jobs = [store.enqueue("crawl", city_key=city_key)]
+        ensure_workers()
+        st.session_state.crawl_jobs = [job.id for job in jobs]
+
+    except Exception as e:
+        st.error("Có lỗi xảy ra khi chạy scraper")
+        with st.expander("Chi tiết lỗi"):
+            st.code(str(e))
+            st.code(traceback.format_exc())
+
+if st.session_state.get("crawl_jobs"):
+    st.info("Đang thu thập dữ liệu ở chế độ nền, bạn vẫn có thể dùng trang này.")
+    poll_jobs("crawl_jobs")
+
+finished_jobs = [
+    job
+    for job in map(get_job_store().get, st.session_state.get("finished_jobs", []))
+    if job is not None
+]
+render_jobs(finished_jobs)
+
+# Cross-city comparison of the last all-cities run
+for job in finished_jobs:
+    if job.kind == "compare" and job.status == DONE:
+        st.subheader("🌏 So sánh các thành phố")
+        st.dataframe(pd.DataFrame(job.result["summary"]), use_container_width=True)
+        with open(job.result["excel"], "rb") as f:
+            st.download_button(
+                "Download Excel So sánh thành phố",
+                f.read(),
+                file_name=os.path.basename(job.result["excel"]),
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
 
 # ────────────────────────────────────────────────────────────────
 # DATA VIEW & REPORTS (your original logic)
 # ────────────────────────────────────────────────────────────────
-if "df" in st.session_state:
-    df = st.session_state.df
+df = None
+if "snapshot" in st.session_state:
+    snapshot_file = st.session_state.snapshot
+    try:
+        df = load_city_frame(snapshot_file, snapshot_version(snapshot_file))
+    except Exception:
+        st.warning("Không đọc được file kết quả để hiển thị")
+
+if df is not None:
 
     st.subheader("📋 Dữ liệu đã thu thập")
-    st.dataframe(df, use_container_width=True)
+    data_view(load_city_index(snapshot_file, snapshot_version(snapshot_file)))
 
     st.subheader("⬇️ Tải xuống dữ liệu")
     if "data_excel" in st.session_state:
@@ -118,30 +324,60 @@ if "df" in st.session_state:
     # Reports section
     st.subheader("📊 Báo cáo")
 
-    with st.spinner("Đang tạo báo cáo..."):
-        try:
-            reports = {
-                "Giá trung bình & median theo quận": price_by_district(df),
-                "Giá/m² theo quận + loại": price_m2_by_district_category(df),
-                "Nguồn cung theo quận": supply_by_district(df),
-                "Xu hướng 7 ngày": trend_7_days(df),
-                "Tin giá tốt": detect_deals(df)
-            }
-
-            excel_report = os.path.join(REPORTS_DIR, f"{city_key}_report.xlsx")
-            docx_report = os.path.join(REPORTS_DIR, f"{city_key}_deals.docx")
+    try:
+        # Same snapshot + repost index + parameters → same reports:
+        # reruns reuse the cached frames and files, misses are built by
+        # a background report job
+        artifacts = get_report_cache().get(city_report_key(city_key, OUTPUT_DIR))
 
-            
-            export_excel(reports, excel_report)
-            export_docx(df, reports["Tin giá tốt"], docx_report)
+        report_failed = any(
+            job.kind == "report" and job.status == FAILED for job in finished_jobs
+        )
 
+        if artifacts is None and report_failed:
+            st.warning("Không tạo được báo cáo, hãy thử lại sau lần thu thập tiếp theo.")
+        elif artifacts is None:
+            if not st.session_state.get("report_jobs"):
+                job = get_job_store().enqueue("report", city_key=city_key, threshold=0.75)
+                ensure_workers()
+                st.session_state.report_jobs = [job.id]
+            st.info("Đang tạo báo cáo ở chế độ nền...")
+            poll_jobs("report_jobs")
+        else:
+            excel_report, docx_report = report_files(city_key, artifacts.directory)
             st.session_state.report_excel = excel_report
             st.session_state.report_docx = docx_report
             st.success("✅ Báo cáo đã được tạo!")
 
-        except Exception as report_error:
-            st.error("Lỗi khi tạo báo cáo")
-            st.code(str(report_error))
+    except Exception as report_error:
+        st.error("Lỗi khi tạo báo cáo")
+        st.code(str(report_error))
+
+    # Ward drill-down straight from the precomputed rollup cube
+    cube_file = cube_path(city_key, OUTPUT_DIR)
+    if os.path.exists(cube_file):
+        cube = load_city_cube(city_key, snapshot_version(cube_file))
+        with st.expander("🔎 Chi tiết giá/m² theo phường"):
+            district = st.selectbox("Quận / huyện", cube.districts())
+            if district:
+                st.dataframe(cube.wards(district), use_container_width=True)
+
+    # Trends straight from the materialized daily rollups
+    rollups_file = rollups_path(city_key, OUTPUT_DIR)
+    if os.path.exists(rollups_file):
+        rollups = load_city_rollups(city_key, snapshot_version(rollups_file))
+        with st.expander("📈 Xu hướng theo ngày"):
+            days = st.radio("Số ngày", TREND_WINDOWS, horizontal=True)
+            districts = sorted(d for d in rollups["district"].unique() if d != ALL)
+            district = st.selectbox(
+                "Khu vực",
+                [ALL, *districts],
+                format_func=lambda d: "Toàn thành phố" if d == ALL else d,
+                key="trend_district",
+            )
+            trend = rollup_trend(rollups, days, district).set_index("date")
+            st.line_chart(trend[["new_listings", "active_listings"]])
+            st.line_chart(trend[["median_price_m2", "median_price_m2_7d"]])
 
     if "report_excel" in st.session_state:
         st.subheader("⬇️ Download Báo cáo")
@@ -164,4 +400,20 @@ if "df" in st.session_state:
 
 else:
     st.info("👈 Chọn thành phố và nhấn **Tìm kiếm**")
-    #st.caption("Dữ liệu sẽ được lấy trực tiếp từ logic của main.py")
\ No newline at end of file
+    #st.caption("Dữ liệu sẽ được lấy trực tiếp từ logic của main.py")
+
+# ────────────────────────────────────────────────────────────────
+# PER-RUN TIMING BREAKDOWN
+# ────────────────────────────────────────────────────────────────
+runs = load_runs(OUTPUT_DIR)
+if not runs.empty:
+    with st.expander("⏱️ Thời gian xử lý theo giai đoạn"):
+        started = runs.groupby("run_id", sort=False)["started_at"].min()
+        run_id = st.selectbox(
+            "Lần chạy",
+            list(started.index),
+            format_func=lambda r: f"{started[r][:19].replace('T', ' ')} ({r})",
+        )
+        breakdown = stage_breakdown(runs[runs["run_id"] == run_id])
+        st.bar_chart(breakdown.groupby("stage", sort=False)["seconds"].sum())
+        st.dataframe(breakdown, use_container_width=True)
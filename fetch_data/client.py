@@ -0,0 +1,291 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from utils.instrument import add_bytes
+
+# =====================================================
+# RESILIENT API CLIENT
+#
+# - keep-alive pooled session
+# - token-bucket rate limiter, halved on 429 and slowly restored
+#   (AIMD), so throughput settles at what the gateway tolerates
+# - exponential backoff with full jitter on 429 / 5xx / network errors,
+#   honoring Retry-After
+# - on-disk response cache: served as-is within its TTL, revalidated
+#   with If-None-Match / If-Modified-Since after that, least recently
+#   used responses evicted beyond its size bound
+# =====================================================
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with an adaptive refill rate.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        min_rate: Optional[float] = None,
+    ) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate or rate, rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        """
+        Block until a request may be sent.
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self) -> None:
+        """
+        Gateway pushed back (429): halve the rate.
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def recover(self) -> None:
+        """
+        Successful request: creep back towards the configured rate.
+        """
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class ResponseCache:
+    """
+    JSON responses on disk, one file per (url, params), with the
+    validators needed for conditional requests. Size-bounded: the least
+    recently used responses are evicted.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float, max_bytes: Optional[int] = None) -> None:
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes or config.API_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._bytes = sum(size for _, size, _ in self._entries())
+
+    def path(self, url: str, params: Dict[str, Any]) -> str:
+        key = json.dumps([url, sorted(params.items())], default=str)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, url: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        path = self.path(url, params)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def is_fresh(self, entry: Dict[str, Any]) -> bool:
+        return time.time() - entry["stored_at"] < self.ttl
+
+    def put(
+        self,
+        url: str,
+        params: Dict[str, Any],
+        body: Any,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        path = self.path(url, params)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "stored_at": time.time(),
+                "etag": etag,
+                "last_modified": last_modified,
+                "body": body,
+            }, f, ensure_ascii=False)
+        size = os.path.getsize(tmp_path)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._bytes += size - replaced
+            over = self._bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue  # evicted concurrently
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def evict(self) -> None:
+        """
+        Drop least recently used responses down to 3/4 of the bound, so
+        the next puts do not rescan the directory one by one.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes * 3 // 4:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            total -= size
+
+        with self._lock:
+            self._bytes = total
+
+
+class ApiClient:
+    """
+    GET JSON from the ad-listing gateway through the rate limiter,
+    retry policy and response cache.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        rate: Optional[float] = None,
+        burst: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cache_dir: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.bucket = TokenBucket(
+            rate or config.API_RATE_PER_SECOND,
+            burst or config.API_BURST,
+            config.API_MIN_RATE_PER_SECOND,
+        )
+        self.max_retries = config.API_MAX_RETRIES if max_retries is None else max_retries
+        self.timeout = timeout or config.API_TIMEOUT
+
+        cache_ttl = config.API_CACHE_TTL if cache_ttl is None else cache_ttl
+        self.cache = (
+            ResponseCache(cache_dir or os.path.join(config.OUTPUT_DIR, "http_cache"), cache_ttl)
+            if cache_ttl > 0 else None
+        )
+
+    @staticmethod
+    def _backoff(attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), config.API_BACKOFF_MAX)
+            except ValueError:
+                pass
+        ceiling = min(config.API_BACKOFF_MAX, config.API_BACKOFF_BASE * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        GET a JSON document, from cache when fresh.
+
+        Raises requests.HTTPError / ConnectionError once retries are
+        exhausted.
+        """
+        params = params or {}
+
+        entry = self.cache.get(url, params) if self.cache else None
+        if entry is not None and self.cache.is_fresh(entry):
+            return entry["body"]
+
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            response = None
+            try:
+                response = self.session.get(
+                    url,
+                    params=params,
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code == 429:
+                    self.bucket.throttle()
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+
+            time.sleep(self._backoff(attempt, response))
+
+        self.bucket.recover()
+
+        if response.status_code == 304 and entry is not None:
+            body = entry["body"]
+        else:
+            response.raise_for_status()
+            body = response.json()
+            add_bytes(len(response.content))
+
+        if self.cache:
+            previous = entry or {}
+            self.cache.put(
+                url,
+                params,
+                body,
+                etag=response.headers.get("ETag") or previous.get("etag"),
+                last_modified=(
+                    response.headers.get("Last-Modified") or previous.get("last_modified")
+                ),
+            )
+        return body
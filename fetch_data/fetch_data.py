@@ -6,19 +6,30 @@ if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
 
-import requests
+import numpy as np
+import pandas as pd
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, UTC
-from typing import List, Dict, Any
-
+from itertools import islice
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple
+
+from analytics.cube import StreamingDealScorer, load_cube, save_cube
+from analytics.diff import snapshot_diff
+from analytics.reposts import load_repost_index, save_repost_index
+from analytics.rollups import count_new_listings, update_daily_rollups
+from fetch_data.client import ApiClient
+from fetch_data.history import crawl_lock
+from fetch_data.index import is_changed, is_new, load_index, save_index, update_index
 from fetch_data.storage import save_city_data
+from utils.instrument import flush, stage
+from utils.schema import LINK_PREFIX
 import config 
 
 
 # =====================================================
 # API CONFIG
 # =====================================================
-URL = config.CHO_TOT_PUBLIC_API_URL
-
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
@@ -28,6 +39,22 @@ HEADERS = {
     "Accept": "application/json",
 }
 
+_CLIENT: Optional[ApiClient] = None
+
+
+def get_client() -> ApiClient:
+    """
+    Shared API client of this process (keep-alive pool sized for the
+    concurrent page workers, one rate limit for the whole gateway).
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = ApiClient(
+            pool_size=config.CRAWL_PAGE_WORKERS,
+            headers=HEADERS,
+        )
+    return _CLIENT
+
 
 # =====================================================
 # HELPERS
@@ -39,41 +66,57 @@ def get_str(value: Any) -> str:
     return value if isinstance(value, str) else ""
 
 
+def city_label(city_config: Dict[str, Any]) -> str:
+    """
+    Key of a configured city (its name otherwise), for stage labels.
+    """
+    for city_key, configured in config.CITIES.items():
+        if configured is city_config:
+            return city_key
+    return city_config["name"]
+
+
 # =====================================================
 # FETCH
 # =====================================================
-def fetch_ads(
-    city_key: str,
+def fetch_page(
     city_config: Dict[str, Any],
+    page: int,
+    client: Optional[ApiClient] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Fetch real estate ads from NhaTot API and normalize to storage schema.
+    Fetch one page of raw ads from NhaTot API (rate-limited, retried
+    and cached by the client).
     """
     params = {
         "region_v2": city_config["region_v2"],
         "cg": city_config["category_code"],
         "limit": city_config.get("limit", 200),
-        "page": city_config.get("page", 2),
+        "page": page,
     }
+    if "st" in city_config:
+        params["st"] = city_config["st"]
 
-    response = requests.get(
-        URL,
-        params=params,
-        headers=HEADERS,
-        timeout=15,
-    )
-    response.raise_for_status()
-
-    payload = response.json()
-    ads = payload.get("ads", [])
+    with stage("http_fetch", city=city_label(city_config)) as s:
+        payload = (client or get_client()).get_json(config.CHO_TOT_PUBLIC_API_URL, params=params)
+        ads = payload.get("ads", [])
+        s.rows += len(ads)
+    return ads
 
-    crawl_time = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S")
 
+def normalize_ads(
+    ads: List[Dict[str, Any]],
+    city_config: Dict[str, Any],
+    crawl_time: str,
+) -> List[Dict[str, Any]]:
+    """
+    Normalize raw ads to storage schema.
+    """
     results: List[Dict[str, Any]] = []
 
     for ad in ads:
         type_sell_or_rent = ad.get("type")
-        if type_sell_or_rent != "s":
+        if type_sell_or_rent != city_config.get("ad_type", "s"):
             continue
 
         area = ad.get("area") or ad.get("land_area")
@@ -118,7 +161,7 @@ def fetch_ads(
             # ======================
             # key
             # ======================
-            "link": f"https://www.nhatot.com/{ad.get('list_id')}",
+            "link": f"{LINK_PREFIX}{ad.get('list_id')}",
         }
 
         results.append(item)
@@ -126,41 +169,326 @@ def fetch_ads(
     return results
 
 
+def fetch_ads(
+    city_key: str,
+    city_config: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Fetch real estate ads from NhaTot API and normalize to storage schema.
+    """
+    ads = fetch_page(city_config, city_config.get("page", 2))
+
+    crawl_time = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S")
+
+    with stage("normalize", city=city_label(city_config)) as s:
+        rows = normalize_ads(ads, city_config, crawl_time)
+        s.rows += len(rows)
+    return rows
+
+
+def iter_pages(
+    city_config: Dict[str, Any],
+    max_pages: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Walk the page range with a sliding window of concurrent requests.
+
+    Yields (page, normalized rows) in page order and stops at the
+    first empty page.
+    """
+    max_pages = max_pages or city_config.get("max_pages", config.CRAWL_MAX_PAGES)
+    workers = workers or config.CRAWL_PAGE_WORKERS
+    client = get_client()
+
+    crawl_time = datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S")
+    pages = iter(range(1, max_pages + 1))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque(
+            (page, pool.submit(fetch_page, city_config, page, client))
+            for page in islice(pages, workers)
+        )
+
+        try:
+            while in_flight:
+                page, future = in_flight.popleft()
+                ads = future.result()
+
+                if not ads:
+                    break
+
+                with stage("normalize", city=city_label(city_config)) as s:
+                    rows = normalize_ads(ads, city_config, crawl_time)
+                    s.rows += len(rows)
+                yield page, rows
+
+                for next_page in islice(pages, 1):
+                    in_flight.append(
+                        (next_page, pool.submit(fetch_page, city_config, next_page, client))
+                    )
+        finally:
+            # Consumer stopped early (last page or incremental cut-off)
+            for _, pending in in_flight:
+                pending.cancel()
+
+
+def fetch_all_ads(
+    city_key: str,
+    city_config: Dict[str, Any],
+) -> List[Dict[str, Any]]:
+    """
+    Fetch every page of a city concurrently and normalize to storage schema.
+    """
+    results: List[Dict[str, Any]] = []
+
+    for _, rows in iter_pages(city_config):
+        results.extend(rows)
+
+    return results
+
+
+def iter_changed_ads(
+    city_config: Dict[str, Any],
+    index: Dict[str, Any],
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream only new or repriced ads, paging until a page holds only
+    listings already in the seen-listing index at the same price.
+    """
+    pages = iter_pages(city_config, workers=config.CRAWL_INCREMENTAL_WORKERS)
+    for _, rows in pages:
+        changed = [row for row in rows if is_changed(index, row)]
+        if not changed:
+            pages.close()
+            break
+        yield from changed
+
+
+def iter_ads(
+    city_key: str,
+    city_config: Dict[str, Any],
+    full: bool = False,
+    index: Optional[Dict[str, Any]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream normalized rows page by page, without materializing the crawl.
+    """
+    if index is not None:
+        yield from iter_changed_ads(city_config, index)
+    elif full:
+        for _, rows in iter_pages(city_config):
+            yield from rows
+    else:
+        yield from fetch_ads(city_key, city_config)
+
+
 # =====================================================
 # CRAWL CITY
 # =====================================================
-def crawl_city(city_key: str, city_config: Dict[str, Any]) -> None:
+def crawl_city(
+    city_key: str,
+    city_config: Dict[str, Any],
+    full: bool = False,
+    incremental: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+    rows: Optional[Iterable[Dict[str, Any]]] = None,
+    resume: bool = False,
+) -> Dict[str, Any]:
     """
     Fetch and persist data for one city.
+
+    full=True walks the whole page range instead of the single
+    configured page. incremental=True stops paging at already-known,
+    unchanged listings and appends only new or repriced rows.
+    progress, if given, is called with the number of listings stored
+    so far after every batch. rows, if given, replaces fetching with
+    already-normalized rows (e.g. pages of a checkpointed crawl plan);
+    resume=True when they may be partly stored by an interrupted run
+    (see save_city_data).
+
+    Crawls of the same city wait for each other (crawl_lock): they load,
+    update and save the same state files and snapshots.
+
+    Returns a summary of the crawl (counts and output paths).
     """
-    print(f"🚀 Crawling {city_config['name']}")
+    with crawl_lock(config.OUTPUT_DIR, city_key):
+        return _crawl_city(city_key, city_config, full, incremental, progress, rows, resume)
 
-    data = fetch_ads(city_key, city_config)
 
-    df, path_xlsx, path_csv = save_city_data(
-        data=data,
-        city_key=city_key,
-        output_dir=config.OUTPUT_DIR,
-    )
+def _crawl_city(
+    city_key: str,
+    city_config: Dict[str, Any],
+    full: bool = False,
+    incremental: bool = False,
+    progress: Optional[Callable[[int], None]] = None,
+    rows: Optional[Iterable[Dict[str, Any]]] = None,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    print(f"🚀 Crawling {city_config['name']}")
 
-    print(f"✅ {city_config['name']}: {len(df)} listings")
+    index = load_index(city_key, config.OUTPUT_DIR)
+    cube = load_cube(city_key, config.OUTPUT_DIR)
+    reposts = load_repost_index(city_key, config.OUTPUT_DIR)
+    scorer = StreamingDealScorer(cube)
+    fresh_deals = 0
+    repost_count = 0
+    stored = 0
+    new_counts = []
+    crawl_dates = set()
+
+    def on_batch(batch):
+        """
+        Ingest-time updates: only new or repriced listings feed the
+        rollup cube (which also retracts a repriced listing's old price,
+        so re-crawled listings are never counted twice), and
+        reposts of a known listing are left out of the cube and of the
+        new-listing counts.
+        """
+        nonlocal fresh_deals, repost_count, stored
+
+        rows = batch[["link", "price"]].to_dict("records")
+        changed = np.array([is_changed(index, row) for row in rows], dtype=bool)
+        new = np.array([is_new(index, row) for row in rows], dtype=bool)
+        update_index(index, rows)
+
+        repost_count += int(reposts.add(batch[new]).notna().sum())
+        genuine = ~reposts.is_repost(batch).to_numpy()
+
+        cube.update(batch[changed & genuine])
+        fresh_deals += len(scorer.deals(batch[changed & genuine]))
+
+        new_counts.append(count_new_listings(batch[new & genuine]))
+        crawl_time = pd.to_datetime(batch["crawl_time"], errors="coerce")
+        crawl_dates.update(crawl_time.dropna().dt.normalize())
+
+        stored += len(batch)
+        if progress is not None:
+            progress(stored)
+
+    with stage("crawl", city=city_key) as s:
+        row_count, path_xlsx, path_csv = save_city_data(
+            data=rows if rows is not None else iter_ads(
+                city_key,
+                city_config,
+                full=full,
+                index=index if incremental else None,
+            ),
+            city_key=city_key,
+            output_dir=config.OUTPUT_DIR,
+            append=incremental,
+            on_batch=on_batch,
+            resume=resume,
+        )
+        s.rows += row_count
+
+    # Full snapshots only: incremental crawls do not replace the snapshot
+    diff = snapshot_diff(city_key, config.OUTPUT_DIR) if path_xlsx else None
+    changes = diff.counts() if diff is not None else None
+
+    # Listings gone since the last full-range crawl leave the baselines
+    # (a single-page crawl does not see the whole market)
+    if diff is not None and full:
+        cube.remove(diff.removed["list_id"])
+
+    with stage("state_save", city=city_key):
+        save_index(index, city_key, config.OUTPUT_DIR)
+        save_cube(cube, city_key, config.OUTPUT_DIR)
+        save_repost_index(reposts, city_key, config.OUTPUT_DIR)
+
+    with stage("daily_rollups", city=city_key):
+        update_daily_rollups(
+            city_key,
+            config.OUTPUT_DIR,
+            new_counts,
+            crawl_dates,
+            full=full and not incremental and rows is None,
+        )
+
+    print(
+        f"✅ {city_config['name']}: {row_count} listings, "
+        f"{fresh_deals} new deals, {repost_count} reposts"
+    )
 
+    if changes is not None:
+        print(
+            f"🔁 Since last crawl: {changes['new']} new, "
+            f"{changes['removed']} removed, {changes['repriced']} repriced"
+        )
     if path_xlsx:
         print(f"📊 Excel saved: {path_xlsx}")
     if path_csv:
         print(f"📄 CSV saved: {path_csv}")
 
+    return {
+        "listings": row_count,
+        "deals": fresh_deals,
+        "reposts": repost_count,
+        "excel": path_xlsx,
+        "csv": path_csv,
+        "changes": changes,
+    }
+
 
 # =====================================================
 # MAIN
 # =====================================================
-def get_data() -> None:
+def _share_rate_limit(processes: int) -> None:
+    """
+    Pool initializer: city processes split the gateway rate limit, so
+    together they stay within API_RATE_PER_SECOND.
+
+    A client inherited through fork still holds the parent's rate limit
+    and pooled connections: dropped, so get_client() builds a fresh one.
+    """
+    global _CLIENT
+    _CLIENT = None
+    config.API_RATE_PER_SECOND /= processes
+    config.API_BURST = max(1, config.API_BURST // processes)
+
+
+def city_pool(city_count: int) -> ProcessPoolExecutor:
+    """
+    Process pool for per-city work: one process per city, up to
+    CRAWL_CITY_PROCESSES when set.
     """
-    Crawl all configured cities.
+    processes = max(1, min(config.CRAWL_CITY_PROCESSES or city_count, city_count))
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        initializer=_share_rate_limit,
+        initargs=(processes,),
+    )
+
+
+def crawl_city_process(
+    city_key: str,
+    full: bool = False,
+    incremental: bool = False,
+) -> Dict[str, Any]:
+    """
+    crawl_city in a pool process (its stage records are flushed there).
     """
-    for city_key, city_config in config.CITIES.items():
-        crawl_city(city_key, city_config)
+    try:
+        return crawl_city(city_key, config.CITIES[city_key], full, incremental)
+    finally:
+        flush(config.OUTPUT_DIR)
+
+
+def get_data(full: bool = False, incremental: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Crawl all configured cities, each in its own process. Returns the
+    crawl summary of every city.
+    """
+    with city_pool(len(config.CITIES)) as pool:
+        futures = {
+            city_key: pool.submit(crawl_city_process, city_key, full, incremental)
+            for city_key in config.CITIES
+        }
+        return {city_key: future.result() for city_key, future in futures.items()}
 
 
 if __name__ == "__main__":
-    get_data()
+    get_data(
+        full="--full" in sys.argv,
+        incremental="--incremental" in sys.argv,
+    )
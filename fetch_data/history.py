@@ -0,0 +1,394 @@
+import fcntl
+import json
+import os
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import config
+from utils.schema import COMPACT_SCHEMA, DictionaryEncoder, table_to_frame, to_compact_table
+
+# =====================================================
+# APPEND-ONLY HISTORY (PARQUET, HIVE PARTITIONED)
+#
+#   <output_dir>/history/city_key=<key>/crawl_date=<YYYY-MM-DD>/part-*.parquet
+#
+# Compaction and reads of a city are serialized across processes (job
+# workers, per-city crawl processes, the dashboard) by an flock on
+# history/_locks/<key>.lock: readers share it, a compaction holds it
+# exclusively. A compaction records the parts it replaces in a
+# _compaction.json manifest before publishing the merged file, so a
+# crash between publishing and deleting the parts never duplicates
+# rows: readers skip the listed parts and the next compaction deletes
+# them.
+# =====================================================
+HISTORY_SCHEMA = COMPACT_SCHEMA
+
+PARTITIONING = ds.partitioning(
+    pa.schema([("city_key", pa.string()), ("crawl_date", pa.string())]),
+    flavor="hive",
+)
+
+MANIFEST = "_compaction.json"
+
+
+def history_dir(output_dir: str) -> str:
+    return os.path.join(output_dir, "history")
+
+
+def locks_dir(output_dir: str) -> str:
+    # "_"-prefixed: ignored by dataset discovery
+    return os.path.join(history_dir(output_dir), "_locks")
+
+
+@contextmanager
+def _flock(path: str, exclusive: bool, blocking: bool) -> Iterator[bool]:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # One open file per acquisition: flock then also excludes other
+    # threads of this process
+    with open(path, "a") as f:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.flock(f, flags if blocking else flags | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@contextmanager
+def city_lock(
+    output_dir: str,
+    city_key: str,
+    exclusive: bool = False,
+    blocking: bool = True,
+) -> Iterator[bool]:
+    """
+    Cross-process lock of a city's history (shared for reads, exclusive
+    for compaction). Yields False when a non-blocking attempt failed.
+    """
+    path = os.path.join(locks_dir(output_dir), f"{city_key}.lock")
+    with _flock(path, exclusive, blocking) as locked:
+        yield locked
+
+
+@contextmanager
+def crawl_lock(output_dir: str, city_key: str) -> Iterator[bool]:
+    """
+    Exclusive cross-process lock of a city's crawl state (seen-listing
+    index, cube, repost index, snapshots): crawls of one city from job
+    workers, the CLI and crawl plans run one at a time.
+    """
+    path = os.path.join(locks_dir(output_dir), f"{city_key}.crawl.lock")
+    with _flock(path, exclusive=True, blocking=True) as locked:
+        yield locked
+
+
+def partition_dir(output_dir: str, city_key: str, crawl_date: str) -> str:
+    return os.path.join(
+        history_dir(output_dir),
+        f"city_key={city_key}",
+        f"crawl_date={crawl_date}",
+    )
+
+
+def to_history_table(
+    df: pd.DataFrame,
+    encoders: Optional[Dict[str, DictionaryEncoder]] = None,
+) -> pa.Table:
+    """
+    Coerce a listing frame to the history (compact) schema.
+    """
+    return to_compact_table(df, encoders)
+
+
+# =====================================================
+# WRITE
+# =====================================================
+def _write_atomic(table: pa.Table, path: str) -> None:
+    """
+    Write via an "_"-prefixed temp file, which dataset discovery ignores.
+    """
+    tmp_path = os.path.join(os.path.dirname(path), f"_{os.path.basename(path)}")
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def append_history(
+    df: pd.DataFrame,
+    city_key: str,
+    output_dir: str,
+    table: Optional[pa.Table] = None,
+) -> List[str]:
+    """
+    Append one crawl to the history dataset, one file per crawl date.
+
+    table is df already converted by to_history_table, if available.
+    """
+    if df.empty:
+        return []
+
+    if table is None:
+        table = to_history_table(df)
+    crawl_dates = (
+        pd.to_datetime(df["crawl_time"], errors="coerce")
+        .dt.strftime("%Y-%m-%d")
+        .fillna("unknown")
+        .to_numpy()
+    )
+
+    paths = []
+    for crawl_date in pd.unique(crawl_dates):
+        target_dir = partition_dir(output_dir, city_key, crawl_date)
+        os.makedirs(target_dir, exist_ok=True)
+
+        stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(target_dir, f"part-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+
+        _write_atomic(table.filter(pa.array(crawl_dates == crawl_date)), path)
+        paths.append(path)
+
+    return paths
+
+
+def stored_mask(table: pa.Table, city_key: str, output_dir: str) -> np.ndarray:
+    """
+    Rows of a history table already in the history of a city (same
+    list_id and crawl_time), e.g. replayed by a resumed ingest.
+    """
+    def keys(frame: pd.DataFrame) -> pd.MultiIndex:
+        return pd.MultiIndex.from_arrays([
+            frame["list_id"].astype("Int64").fillna(-1).to_numpy(dtype="int64"),
+            pd.to_datetime(frame["crawl_time"]).to_numpy(dtype="datetime64[s]"),
+        ])
+
+    batch = table_to_frame(table.select(["list_id", "crawl_time"]))
+    dates = pd.to_datetime(batch["crawl_time"]).dropna()
+    if dates.empty:
+        return np.zeros(len(batch), dtype=bool)
+
+    stored = read_history(
+        output_dir,
+        city_key,
+        start=dates.min().strftime("%Y-%m-%d"),
+        end=dates.max().strftime("%Y-%m-%d"),
+        columns=["list_id", "crawl_time"],
+    )
+    return keys(batch).isin(keys(stored))
+
+
+# =====================================================
+# COMPACTION
+# =====================================================
+def _manifest_path(path: str) -> str:
+    return os.path.join(path, MANIFEST)
+
+
+def _read_manifest(path: str) -> Optional[Dict[str, List[str]]]:
+    try:
+        with open(_manifest_path(path), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def replaced_parts(path: str) -> List[str]:
+    """
+    Parts of a partition already merged into a published compacted file
+    but not deleted yet (a compaction crashed in between).
+    """
+    manifest = _read_manifest(path)
+    if manifest is None or not os.path.exists(os.path.join(path, manifest["target"])):
+        return []
+    return [os.path.join(path, name) for name in manifest["parts"]]
+
+
+def recover_partition(path: str) -> None:
+    """
+    Finish or roll back a compaction that crashed (exclusive lock held).
+    """
+    manifest = _read_manifest(path)
+    if manifest is None:
+        if os.path.exists(_manifest_path(path)):
+            os.remove(_manifest_path(path))  # torn manifest: nothing published
+        return
+
+    if os.path.exists(os.path.join(path, manifest["target"])):
+        for name in manifest["parts"]:
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+    else:
+        tmp_path = os.path.join(path, f"_{manifest['target']}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    os.remove(_manifest_path(path))
+
+
+def compact_partition(path: str, min_files: Optional[int] = None) -> Optional[str]:
+    """
+    Merge the small part files of one partition into a single file.
+    Call with the city's exclusive lock held (compact_city).
+
+    Only files present when compaction starts are merged, so concurrent
+    appends are never lost.
+    """
+    min_files = min_files or config.HISTORY_COMPACT_MIN_FILES
+    recover_partition(path)
+
+    parts = sorted(
+        os.path.join(path, name)
+        for name in os.listdir(path)
+        if name.endswith(".parquet") and not name.startswith("_")
+    )
+    if len(parts) < min_files:
+        return None
+
+    table = pa.concat_tables(
+        pq.read_table(part, schema=HISTORY_SCHEMA) for part in parts
+    )
+
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    target = os.path.join(path, f"compacted-{stamp}-{uuid.uuid4().hex[:8]}.parquet")
+
+    manifest = {
+        "target": os.path.basename(target),
+        "parts": [os.path.basename(part) for part in parts],
+    }
+    tmp_manifest = os.path.join(path, f"_{MANIFEST}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_manifest, _manifest_path(path))
+
+    _write_atomic(table, target)
+    for part in parts:
+        os.remove(part)
+    os.remove(_manifest_path(path))
+
+    return target
+
+
+def compact_city(city_key: str, output_dir: str) -> List[str]:
+    """
+    Compact every partition of a city (one compaction per city at a time
+    across processes, skipped while the city's history is being read).
+    """
+    with city_lock(output_dir, city_key, exclusive=True, blocking=False) as acquired:
+        if not acquired:
+            return []
+
+        city_dir = os.path.join(history_dir(output_dir), f"city_key={city_key}")
+        if not os.path.isdir(city_dir):
+            return []
+
+        compacted = []
+        for name in sorted(os.listdir(city_dir)):
+            target = compact_partition(os.path.join(city_dir, name))
+            if target:
+                compacted.append(target)
+        return compacted
+
+
+def compact_city_async(city_key: str, output_dir: str) -> threading.Thread:
+    """
+    Run compact_city in a background thread.
+    """
+    thread = threading.Thread(
+        target=compact_city,
+        args=(city_key, output_dir),
+        name=f"compact-{city_key}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+# =====================================================
+# READ
+# =====================================================
+def read_history(
+    output_dir: str,
+    city_key: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Read a date range of history, pruning partitions by city and
+    crawl date (inclusive, "YYYY-MM-DD") and projecting columns.
+
+    Reads hold the shared history lock of every city they cover, so
+    they never see part files being merged.
+    """
+    root = history_dir(output_dir)
+    if not os.path.isdir(root):
+        return pd.DataFrame(columns=columns or HISTORY_SCHEMA.names)
+
+    if city_key is not None:
+        city_keys = [city_key]
+    else:
+        city_keys = sorted(
+            name.split("=", 1)[1] for name in os.listdir(root) if name.startswith("city_key=")
+        )
+
+    with ExitStack() as stack:
+        for key in city_keys:
+            stack.enter_context(city_lock(output_dir, key))
+        return table_to_frame(_read_table(root, city_key, start, end, columns))
+
+
+def _read_table(
+    root: str,
+    city_key: Optional[str],
+    start: Optional[str],
+    end: Optional[str],
+    columns: Optional[List[str]],
+) -> pa.Table:
+    schema = pa.unify_schemas([HISTORY_SCHEMA, PARTITIONING.schema])
+    dataset = ds.dataset(root, format="parquet", partitioning=PARTITIONING, schema=schema)
+
+    # Leftovers of a crashed compaction: the merged file already has them
+    stale = set()
+    for city_dir in os.listdir(root):
+        if not city_dir.startswith("city_key="):
+            continue
+        for date_dir in os.listdir(os.path.join(root, city_dir)):
+            stale.update(
+                os.path.normpath(part)
+                for part in replaced_parts(os.path.join(root, city_dir, date_dir))
+            )
+    if stale:
+        files = [f for f in dataset.files if os.path.normpath(f) not in stale]
+        dataset = ds.dataset(
+            files,
+            format="parquet",
+            partitioning=PARTITIONING,
+            partition_base_dir=root,
+            schema=schema,
+        )
+
+    expr = None
+    conditions = []
+    if city_key is not None:
+        conditions.append(ds.field("city_key") == city_key)
+    if start is not None:
+        conditions.append(ds.field("crawl_date") >= str(start)[:10])
+    if end is not None:
+        conditions.append(ds.field("crawl_date") <= str(end)[:10])
+    for condition in conditions:
+        expr = condition if expr is None else expr & condition
+
+    return dataset.to_table(columns=columns, filter=expr)
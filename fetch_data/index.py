@@ -0,0 +1,88 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Optional
+
+from utils.schema import LINK_PREFIX
+
+
+# =====================================================
+# SEEN-LISTING INDEX (list_id -> last seen price)
+# =====================================================
+def extract_list_id(link: Any) -> Optional[str]:
+    """
+    Extract list_id from a listing link.
+    """
+    if not isinstance(link, str) or not link.startswith(LINK_PREFIX):
+        return None
+    list_id = link[len(LINK_PREFIX):]
+    return list_id or None
+
+
+def index_path(city_key: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"{city_key}_index.json")
+
+
+def load_index(city_key: str, output_dir: str) -> Dict[str, Any]:
+    """
+    Load the seen-listing index of a city (empty if none yet).
+    """
+    path = index_path(city_key, output_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_index(index: Dict[str, Any], city_key: str, output_dir: str) -> str:
+    """
+    Atomically persist the seen-listing index of a city.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = index_path(city_key, output_dir)
+    tmp_path = f"{path}.tmp"
+
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+
+    return path
+
+
+def _price(value: Any) -> Any:
+    """
+    Comparable price: None and NaN (from a DataFrame) are both missing.
+    """
+    if value is None or value != value:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def is_new(index: Dict[str, Any], row: Dict[str, Any]) -> bool:
+    """
+    True if the row is a listing never seen before.
+    """
+    list_id = extract_list_id(row.get("link"))
+    return list_id is None or list_id not in index
+
+
+def is_changed(index: Dict[str, Any], row: Dict[str, Any]) -> bool:
+    """
+    True if the row is a new listing or its price moved since last seen.
+    """
+    list_id = extract_list_id(row.get("link"))
+    if list_id is None:
+        return True
+    return list_id not in index or index[list_id] != _price(row.get("price"))
+
+
+def update_index(index: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Record the latest price of every row in the index.
+    """
+    for row in rows:
+        list_id = extract_list_id(row.get("link"))
+        if list_id is not None:
+            index[list_id] = _price(row.get("price"))
@@ -0,0 +1,303 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+import config
+from utils.schema import compact_frame, to_list_id
+
+# =====================================================
+# LISTING STORE (SQLite, all cities)
+#
+# listings       latest state of every listing, keyed by list_id
+# price_history  one row per observed price of a listing (first sighting
+#                included), so repricings can be queried by date
+#
+# Ingest upserts whole batches inside one transaction (WAL: readers
+# never block the crawl). Indexes serve point lookups by list_id and
+# "district / ward X since date Y" queries.
+# =====================================================
+LISTING_COLUMNS = [
+    "city",
+    "category",
+    "category_code",
+    "title",
+    "price_string",
+    "price",
+    "price_million_per_m2",
+    "area",
+    "ward_name",
+    "area_name",
+    "crawl_time",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS listings (
+    list_id              INTEGER PRIMARY KEY,
+    city_key             TEXT NOT NULL,
+    city                 TEXT,
+    category             TEXT,
+    category_code        TEXT,
+    title                TEXT,
+    price_string         TEXT,
+    price                REAL,
+    price_million_per_m2 REAL,
+    area                 REAL,
+    ward_name            TEXT,
+    area_name            TEXT,
+    first_seen           TEXT NOT NULL,
+    crawl_time           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_area ON listings (area_name, crawl_time);
+CREATE INDEX IF NOT EXISTS listings_ward ON listings (ward_name, crawl_time);
+CREATE INDEX IF NOT EXISTS listings_crawl_time ON listings (crawl_time);
+
+CREATE TABLE IF NOT EXISTS price_history (
+    list_id              INTEGER NOT NULL,
+    crawl_time           TEXT NOT NULL,
+    price                REAL,
+    price_million_per_m2 REAL,
+    PRIMARY KEY (list_id, crawl_time)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS price_history_crawl_time ON price_history (crawl_time);
+"""
+
+STAGE_COLUMNS = ["list_id", "city_key", *LISTING_COLUMNS]
+
+# Columns query() may select (interpolated into the SQL: whitelisted)
+QUERY_COLUMNS = [*LISTING_COLUMNS, "list_id"]
+
+# list_id filters of any length are joined through a temp table rather
+# than bound as one parameter each (SQLite caps bound parameters)
+_WANTED = "CREATE TEMP TABLE IF NOT EXISTS wanted (list_id INTEGER PRIMARY KEY)"
+
+# Each batch lands in a temp table first; prices and upserts are then
+# applied set-wise instead of one statement per row
+_STAGE = f"""
+CREATE TEMP TABLE IF NOT EXISTS stage (
+    list_id INTEGER PRIMARY KEY, {", ".join(STAGE_COLUMNS[1:])}
+)
+"""
+
+# Record a price only when the listing is new or its price moved
+# (compared with the stored row, before the upsert overwrites it)
+_INSERT_PRICES = """
+INSERT OR IGNORE INTO price_history (list_id, crawl_time, price, price_million_per_m2)
+SELECT s.list_id, s.crawl_time, s.price, s.price_million_per_m2
+FROM stage s LEFT JOIN listings l ON l.list_id = s.list_id
+WHERE l.list_id IS NULL OR l.price IS NOT s.price
+"""
+
+_UPSERT = f"""
+INSERT INTO listings ({", ".join(STAGE_COLUMNS)}, first_seen)
+SELECT {", ".join(STAGE_COLUMNS)}, crawl_time FROM stage WHERE true
+ON CONFLICT (list_id) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in STAGE_COLUMNS[1:])}
+"""
+
+
+def listings_db_path(output_dir: str) -> str:
+    return os.path.join(output_dir, "listings.db")
+
+
+def _day_after(end: str) -> str:
+    return (pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+class ListingStore:
+    """
+    Indexed listing table with upsert by list_id and price history.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or listings_db_path(config.OUTPUT_DIR)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            yield db
+        finally:
+            db.close()
+
+    # ----------------------
+    # Ingest
+    # ----------------------
+    def upsert(self, df: pd.DataFrame, city_key: str) -> int:
+        """
+        Insert or update a batch of listings (export or compact schema)
+        in one transaction. Returns the number of listings whose price
+        was recorded (new or repriced). Listings without a list_id or a
+        crawl_time are skipped.
+        """
+        list_id = df["list_id"] if "list_id" in df.columns else to_list_id(df["link"])
+        batch = df.reindex(columns=LISTING_COLUMNS).assign(list_id=list_id, city_key=city_key)
+        crawl_time = pd.to_datetime(batch["crawl_time"], errors="coerce")
+        keep = batch["list_id"].notna() & crawl_time.notna()
+        batch = batch[keep]
+        if batch.empty:
+            return 0
+
+        batch["list_id"] = batch["list_id"].astype("int64")
+        batch["crawl_time"] = crawl_time[keep].dt.strftime("%Y-%m-%d %H:%M:%S")
+        for col in ["price", "price_million_per_m2", "area"]:
+            batch[col] = pd.to_numeric(batch[col], errors="coerce")
+        batch = batch[STAGE_COLUMNS].astype(object)
+        rows = zip(*(batch[col].where(batch[col].notna(), None).tolist() for col in STAGE_COLUMNS))
+
+        with self._connect() as db:
+            db.execute(_STAGE)
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute("DELETE FROM stage")
+                db.executemany(
+                    f"INSERT OR REPLACE INTO stage VALUES ({', '.join('?' * len(STAGE_COLUMNS))})",
+                    rows,
+                )
+                priced = db.execute(_INSERT_PRICES).rowcount
+                db.execute(_UPSERT)
+                db.execute("DELETE FROM stage")
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        return priced
+
+    # ----------------------
+    # Queries
+    # ----------------------
+    def get(self, list_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Latest state of one listing (None if unknown).
+        """
+        with self._connect() as db:
+            db.row_factory = sqlite3.Row
+            row = db.execute("SELECT * FROM listings WHERE list_id = ?", (int(list_id),)).fetchone()
+        return dict(row) if row else None
+
+    def query(
+        self,
+        city_key: Optional[str] = None,
+        area_name: Optional[str] = None,
+        ward_name: Optional[str] = None,
+        list_ids: Optional[Iterable[int]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        columns: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Latest state of the listings matching every given filter (last
+        crawled within inclusive start/end dates), compact schema.
+
+        columns are taken from QUERY_COLUMNS ("link" is derived from
+        list_id and skipped); any other name raises ValueError.
+        """
+        selected = [c for c in (columns or QUERY_COLUMNS) if c != "link"]
+        unknown = sorted(set(selected) - set(QUERY_COLUMNS))
+        if unknown:
+            raise ValueError(f"Unknown listing columns: {', '.join(unknown)}")
+
+        where, params = [], []
+        for column, value in (
+            ("city_key", city_key),
+            ("area_name", area_name),
+            ("ward_name", ward_name),
+        ):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if start is not None:
+            where.append("crawl_time >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("crawl_time < ?")
+            params.append(_day_after(end))
+        if list_ids is not None:
+            where.append("list_id IN (SELECT list_id FROM wanted)")
+
+        sql = f"SELECT {', '.join(selected)} FROM listings"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        with self._connect() as db:
+            if list_ids is not None:
+                db.execute(_WANTED)
+                db.execute("BEGIN")
+                db.execute("DELETE FROM wanted")
+                db.executemany(
+                    "INSERT OR IGNORE INTO wanted VALUES (?)",
+                    ((int(i),) for i in list_ids),
+                )
+                db.execute("COMMIT")
+            df = pd.read_sql_query(sql, db, params=params)
+
+        if "list_id" in df.columns:
+            df["list_id"] = df["list_id"].astype("Int64")
+        return compact_frame(df)
+
+    def price_history(self, list_id: int) -> pd.DataFrame:
+        """
+        Every recorded price of one listing, oldest first.
+        """
+        with self._connect() as db:
+            return pd.read_sql_query(
+                "SELECT crawl_time, price, price_million_per_m2 FROM price_history "
+                "WHERE list_id = ? ORDER BY crawl_time",
+                db,
+                params=(int(list_id),),
+            )
+
+    def changes(
+        self,
+        since: str,
+        city_key: Optional[str] = None,
+        area_name: Optional[str] = None,
+        ward_name: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """
+        Listings first seen or repriced at or after `since`, with their
+        previous price (NaN for new listings).
+        """
+        where, params = ["h.crawl_time >= ?"], [since]
+        for column, value in (
+            ("city_key", city_key),
+            ("area_name", area_name),
+            ("ward_name", ward_name),
+        ):
+            if value is not None:
+                where.append(f"l.{column} = ?")
+                params.append(value)
+
+        sql = f"""
+            WITH changed AS (
+                SELECT DISTINCT h.list_id
+                FROM price_history h JOIN listings l ON l.list_id = h.list_id
+                WHERE {" AND ".join(where)}
+            ),
+            prices AS (
+                SELECT
+                    h.list_id, h.crawl_time, h.price,
+                    LAG(h.price) OVER (PARTITION BY h.list_id ORDER BY h.crawl_time) AS previous_price
+                FROM price_history h
+                WHERE h.list_id IN (SELECT list_id FROM changed)
+            )
+            SELECT
+                p.list_id, l.title, l.area_name, l.ward_name,
+                p.crawl_time, p.previous_price, p.price
+            FROM prices p JOIN listings l ON l.list_id = p.list_id
+            WHERE p.crawl_time >= ?
+            ORDER BY p.crawl_time, p.list_id
+        """
+
+        with self._connect() as db:
+            df = pd.read_sql_query(sql, db, params=[*params, since])
+        df["list_id"] = df["list_id"].astype("Int64")
+        return df
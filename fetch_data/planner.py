@@ -0,0 +1,346 @@
+import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+import argparse
+import json
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from fetch_data.fetch_data import crawl_city, fetch_page, get_client, normalize_ads
+from utils.instrument import flush
+import config
+
+# =====================================================
+# CHECKPOINTED CRAWL PLAN
+#
+# A plan expands regions × categories × deal types (sale / rent) ×
+# pages into work units. Each run lives in output/crawl_plans/<run>/:
+#
+#   pages/<unit>.json   raw ads of a downloaded page (written atomically)
+#   journal.jsonl       append-only checkpoint, one event per line:
+#                         fetched   page downloaded (rows on it)
+#                         empty     page was empty: later pages of the
+#                                   series are skipped
+#                         ingesting series being stored through crawl_city
+#                         ingested  series stored through crawl_city
+#
+# Re-running the same run (default: today's date) resumes where it
+# stopped: downloaded pages are never fetched again, even when the
+# matrix grows; a torn last journal line is ignored. A series left
+# "ingesting" by a crash is ingested again with resume=True, which
+# skips the history rows it already stored.
+# =====================================================
+FETCHED = "fetched"
+EMPTY = "empty"
+INGESTING = "ingesting"
+INGESTED = "ingested"
+
+
+@dataclass(frozen=True)
+class WorkUnit:
+    region: str
+    deal_type: str
+    category_code: str
+    page: int
+
+    @property
+    def series(self) -> Tuple[str, str, str]:
+        return self.region, self.deal_type, self.category_code
+
+    @property
+    def key(self) -> str:
+        return f"{self.region}_{self.deal_type}_{self.category_code}_{self.page:04d}"
+
+
+def series_key(region: str, deal_type: str, category_code: str) -> str:
+    """
+    City key a series is stored under: the region itself for the crawl
+    configured in config.CITIES (sale of its category), otherwise
+    <region>_<deal type>_<category>.
+    """
+    city = config.CITIES[region]
+    if deal_type == "sale" and category_code == city["category_code"]:
+        return region
+    return f"{region}_{deal_type}_{category_code}"
+
+
+def series_config(region: str, deal_type: str, category_code: str) -> Dict[str, Any]:
+    """
+    City config (fetch_page / normalize_ads) of one series.
+    """
+    city = config.CITIES[region]
+    deal = config.PLAN_DEAL_TYPES[deal_type]
+    category = (
+        city["category"]
+        if series_key(region, deal_type, category_code) == region
+        else f"{deal['label']} {config.PLAN_CATEGORIES.get(category_code, category_code)}"
+    )
+    return {
+        **city,
+        "category": category,
+        "category_code": category_code,
+        "st": deal["st"],
+        "ad_type": deal["ad_type"],
+    }
+
+
+def plans_dir(output_dir: str) -> str:
+    return os.path.join(output_dir, "crawl_plans")
+
+
+class CrawlPlan:
+    """
+    Resumable crawl over a region × category × deal type × page matrix.
+    """
+
+    def __init__(
+        self,
+        regions: Optional[List[str]] = None,
+        categories: Optional[List[str]] = None,
+        deal_types: Optional[List[str]] = None,
+        pages: Optional[int] = None,
+        run_id: Optional[str] = None,
+        output_dir: Optional[str] = None,
+    ) -> None:
+        self.regions = regions or list(config.CITIES)
+        self.categories = categories or list(config.PLAN_CATEGORIES)
+        self.deal_types = deal_types or list(config.PLAN_DEAL_TYPES)
+        self.pages = pages or config.PLAN_PAGES
+        self.run_id = run_id or datetime.now(UTC).strftime("%Y-%m-%d")
+
+        self.directory = os.path.join(plans_dir(output_dir or config.OUTPUT_DIR), self.run_id)
+        self.pages_dir = os.path.join(self.directory, "pages")
+        self.journal_path = os.path.join(self.directory, "journal.jsonl")
+        os.makedirs(self.pages_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.fetched: Dict[str, int] = {}
+        self.empty: Dict[Tuple[str, str, str], int] = {}
+        self.ingesting: Set[str] = set()
+        self.ingested: Dict[str, Dict[str, Any]] = {}
+        self._replay()
+
+    # ----------------------
+    # Matrix
+    # ----------------------
+    def units(self) -> List[WorkUnit]:
+        """
+        Every work unit, page-major so all series advance together.
+        """
+        return [
+            WorkUnit(region, deal_type, category_code, page)
+            for page in range(1, self.pages + 1)
+            for region in self.regions
+            for deal_type in self.deal_types
+            for category_code in self.categories
+        ]
+
+    def series(self) -> List[Tuple[str, str, str]]:
+        return list(dict.fromkeys(unit.series for unit in self.units()))
+
+    def exhausted(self, unit: WorkUnit) -> bool:
+        """
+        A page after the first empty page of its series.
+        """
+        last = self.empty.get(unit.series)
+        return last is not None and unit.page > last
+
+    def pending(self) -> List[WorkUnit]:
+        return [
+            unit for unit in self.units()
+            if unit.key not in self.fetched and not self.exhausted(unit)
+        ]
+
+    # ----------------------
+    # Journal
+    # ----------------------
+    def _apply(self, event: Dict[str, Any]) -> None:
+        kind = event["event"]
+        if kind == FETCHED:
+            self.fetched[event["unit"]] = event["rows"]
+        elif kind == EMPTY:
+            series = tuple(event["series"])
+            self.empty[series] = min(self.empty.get(series, event["page"]), event["page"])
+        elif kind == INGESTING:
+            self.ingesting.add(event["series_key"])
+        elif kind == INGESTED:
+            self.ingesting.discard(event["series_key"])
+            self.ingested[event["series_key"]] = event["summary"]
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    # Torn write of the last event before a crash
+                    continue
+
+    def _journal(self, **event: Any) -> None:
+        event["at"] = datetime.now(UTC).isoformat(timespec="seconds")
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(event)
+
+    # ----------------------
+    # Fetch
+    # ----------------------
+    def page_path(self, unit: WorkUnit) -> str:
+        return os.path.join(self.pages_dir, f"{unit.key}.json")
+
+    def _fetch(self, unit: WorkUnit, client) -> int:
+        path = self.page_path(unit)
+        if os.path.exists(path):
+            # Page saved but the crash came before its journal event
+            with open(path, encoding="utf-8") as f:
+                ads = json.load(f)["ads"]
+        else:
+            ads = fetch_page(series_config(*unit.series), unit.page, client)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {"fetched_at": datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S"), "ads": ads},
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, path)
+
+        self._journal(event=FETCHED, unit=unit.key, rows=len(ads))
+        if not ads:
+            self._journal(event=EMPTY, series=list(unit.series), page=unit.page)
+        return len(ads)
+
+    def fetch(
+        self,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> Dict[str, int]:
+        """
+        Download every pending page (sliding window of workers). A page
+        that fails after the client's retries stays pending for the
+        next run. progress, if given, gets (units done, units).
+        """
+        workers = workers or config.PLAN_WORKERS
+        client = get_client()
+        pending = iter(self.pending())
+        total = len(self.units())
+        stats = {"fetched": 0, "skipped": 0, "failed": 0}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque(
+                (unit, pool.submit(self._fetch, unit, client))
+                for unit in islice(pending, workers)
+            )
+            while in_flight:
+                unit, future = in_flight.popleft()
+                try:
+                    future.result()
+                    stats["fetched"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    print(f"⚠️ {unit.key}: {e}")
+
+                for next_unit in pending:
+                    if self.exhausted(next_unit):
+                        stats["skipped"] += 1
+                        continue
+                    in_flight.append((next_unit, pool.submit(self._fetch, next_unit, client)))
+                    break
+
+                if progress is not None:
+                    progress(len(self.fetched), total)
+
+        return stats
+
+    # ----------------------
+    # Ingest
+    # ----------------------
+    def complete(self, series: Tuple[str, str, str]) -> bool:
+        """
+        Every page of a series is downloaded (up to its first empty page).
+        """
+        return all(
+            unit.key in self.fetched or self.exhausted(unit)
+            for unit in self.units()
+            if unit.series == series
+        )
+
+    def iter_rows(self, series: Tuple[str, str, str]) -> Iterator[Dict[str, Any]]:
+        """
+        Normalized rows of a series, read back from its saved pages.
+        """
+        city_config = series_config(*series)
+        for page in range(1, self.pages + 1):
+            unit = WorkUnit(*series, page)
+            if unit.key not in self.fetched:
+                break
+            with open(self.page_path(unit), encoding="utf-8") as f:
+                saved = json.load(f)
+            yield from normalize_ads(saved["ads"], city_config, saved["fetched_at"])
+
+    def ingest(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Store every fully downloaded series that is not stored yet
+        through crawl_city (index, cube, reposts, history, snapshots).
+        """
+        for series in self.series():
+            key = series_key(*series)
+            if key in self.ingested or not self.complete(series):
+                continue
+            # Interrupted during an earlier run: part of it may be stored
+            resume = key in self.ingesting
+            self._journal(event=INGESTING, series_key=key)
+            summary = crawl_city(
+                key, series_config(*series), rows=self.iter_rows(series), resume=resume
+            )
+            self._journal(event=INGESTED, series_key=key, summary=summary)
+        return self.ingested
+
+    def run(self, workers: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        stats = self.fetch(workers)
+        print(
+            f"📥 Plan {self.run_id}: {stats['fetched']} pages fetched, "
+            f"{stats['skipped']} skipped, {stats['failed']} failed"
+        )
+        return self.ingest()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or resume a checkpointed crawl plan")
+    parser.add_argument("--run", help="run id to resume (default: today)")
+    parser.add_argument("--regions", nargs="+", choices=list(config.CITIES))
+    parser.add_argument("--categories", nargs="+")
+    parser.add_argument("--deal-types", nargs="+", choices=list(config.PLAN_DEAL_TYPES))
+    parser.add_argument("--pages", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--fetch-only", action="store_true", help="download pages, do not ingest")
+    args = parser.parse_args()
+
+    plan = CrawlPlan(
+        regions=args.regions,
+        categories=args.categories,
+        deal_types=args.deal_types,
+        pages=args.pages,
+        run_id=args.run,
+    )
+    if args.fetch_only:
+        print(plan.fetch(args.workers))
+    else:
+        for key, summary in plan.run(args.workers).items():
+            print(f"✅ {key}: {summary['listings']} listings")
+    flush(config.OUTPUT_DIR)
@@ -1,6 +1,21 @@
 import os
+import shutil
+import time
 import pandas as pd
-from openpyxl.styles import Alignment
+import pyarrow as pa
+from openpyxl import Workbook
+
+import config
+from fetch_data.history import (
+    HISTORY_SCHEMA,
+    append_history,
+    compact_city_async,
+    stored_mask,
+    to_history_table,
+)
+from fetch_data.listing_store import ListingStore, listings_db_path
+from utils.excel import append_rows, close_sheet, open_sheet, save_workbook
+from utils.instrument import file_size, record, stage
 
 # =====================================================
 # FIXED COLUMN ORDER (RAW + NORMALIZED)
@@ -61,69 +76,220 @@ COLUMN_WIDTHS = {
     "link": 200,
 }
 
+def keep_previous(path, previous_path):
+    """
+    Keep the current file as previous_path without ever removing path
+    (hard link, or a copy where links are not supported).
+    """
+    tmp_path = f"{previous_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(path, tmp_path)
+    except OSError:
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, previous_path)
+
+
 # =====================================================
 # SAVE FUNCTION
 # =====================================================
-def save_city_data(data, city_key, output_dir):
+def save_city_data(
+    data,
+    city_key,
+    output_dir,
+    append=False,
+    batch_size=None,
+    on_batch=None,
+    excel=True,
+    resume=False,
+):
     """
-    Save crawled city data to CSV and formatted Excel.
+    Stream crawled city data to the Parquet history and the SQLite
+    listing store (upsert by list_id, price history), plus the latest
+    snapshot as CSV, formatted Excel and an uncompressed Arrow IPC file
+    (<city>.arrow) that readers can memory-map. The snapshot it
+    replaces is kept as <city>.prev.arrow for snapshot diffs.
+
+    data is any iterable of row dicts. Rows are deduplicated on link
+    against a running key set and flushed in batches of batch_size,
+    so memory stays flat however many rows the crawl yields.
+
+    append=True adds the rows to the existing CSV instead of
+    overwriting it, and skips the Excel and Arrow exports (incremental
+    crawls).
+
+    excel=False skips the Excel export only (snapshots with more rows
+    than a sheet holds).
+
+    resume=True replays rows an interrupted call may have stored
+    already: rows whose (list_id, crawl_time) are in the history are
+    not appended to it again (the listing store upsert is idempotent).
+
+    on_batch, if given, is called with each flushed batch (DataFrame)
+    for ingest-time processing.
 
     Returns:
-        df, path_xlsx, path_csv
+        row_count, path_xlsx, path_csv
     """
     os.makedirs(output_dir, exist_ok=True)
-    df = pd.DataFrame(data)
+    batch_size = batch_size or config.STORAGE_BATCH_SIZE
+
+    path_xlsx = os.path.join(output_dir, f"{city_key}.xlsx")
+    path_csv = path_xlsx.replace(".xlsx", ".csv")
+    path_arrow = path_xlsx.replace(".xlsx", ".arrow")
+    path_prev_arrow = path_xlsx.replace(".xlsx", ".prev.arrow")
+    append = append and os.path.exists(path_csv)
+    excel = excel and not append
+
+    # Overwrites go through a temp file (per process) so the previous
+    # snapshot stays readable until the crawl has finished
+    csv_target = path_csv if append else f"{path_csv}.{os.getpid()}.tmp"
+    arrow_target = f"{path_arrow}.{os.getpid()}.tmp"
+
+    store = ListingStore(listings_db_path(output_dir))
+    seen = set()
+    encoders = {}
+    buffer = []
+    columns = None
+    row_count = 0
+    csv_file = None
+    arrow_writer = None
+    workbook = ws = None
 
-    path_xlsx = None
-    path_csv = None
+    def flush():
+        nonlocal columns, csv_file, arrow_writer, workbook, ws, row_count
+
+        df = pd.DataFrame(buffer)
+        buffer.clear()
 
-    if not df.empty:
         # ======================
-        # CLEAN
+        # APPLY FIXED ORDER (SAFE)
         # ======================
-        if "link" in df.columns:
-            df = df.dropna(subset=["link"])
-            df = df.drop_duplicates(subset=["link"])
+        if columns is None:
+            ordered_cols = [c for c in COLUMN_ORDER if c in df.columns]
+            remaining_cols = [c for c in df.columns if c not in ordered_cols]
+            columns = ordered_cols + remaining_cols
+        df = df.reindex(columns=columns)
 
         # ======================
-        # APPLY FIXED ORDER (SAFE)
+        # APPEND HISTORY
         # ======================
-        ordered_cols = [c for c in COLUMN_ORDER if c in df.columns]
-        remaining_cols = [c for c in df.columns if c not in ordered_cols]
-        df = df[ordered_cols + remaining_cols]
+        with stage("history_write", city=city_key) as s:
+            table = to_history_table(df, encoders)
+            history_df, history_table = df, table
+            if resume:
+                fresh = ~stored_mask(table, city_key, output_dir)
+                history_df, history_table = df[fresh], table.filter(pa.array(fresh))
+            paths = append_history(history_df, city_key, output_dir, table=history_table)
+            s.rows += len(history_df)
+            s.bytes += sum(file_size(path) for path in paths)
 
         # ======================
-        # PATHS
+        # UPSERT LISTING STORE
         # ======================
-        path_xlsx = os.path.join(output_dir, f"{city_key}.xlsx")
-        path_csv = path_xlsx.replace(".xlsx", ".csv")
+        with stage("db_write", city=city_key) as s:
+            store.upsert(df, city_key)
+            s.rows += len(df)
 
         # ======================
         # SAVE CSV
         # ======================
-        df.to_csv(path_csv, index=False)
+        with stage("csv_write", city=city_key) as s:
+            header = csv_file is None and not append
+            if csv_file is None:
+                csv_file = open(csv_target, "a" if append else "w", encoding="utf-8", newline="")
+            offset = csv_file.tell()
+            df.to_csv(csv_file, header=header, index=False)
+            s.rows += len(df)
+            s.bytes += csv_file.tell() - offset
 
         # ======================
         # SAVE EXCEL (FORMATTED)
         # ======================
-        with pd.ExcelWriter(path_xlsx, engine="openpyxl") as writer:
-            df.to_excel(writer, index=False, sheet_name=city_key)
-            ws = writer.sheets[city_key]
+        if excel:
+            with stage("excel_write", city=city_key) as s:
+                if workbook is None:
+                    workbook = Workbook(write_only=True)
+                    ws = open_sheet(
+                        workbook,
+                        city_key,
+                        columns,
+                        [COLUMN_WIDTHS.get(col, 18) for col in columns],
+                    )
+                append_rows(ws, df)
+                s.rows += len(df)
+
+        # ======================
+        # SAVE ARROW SNAPSHOT
+        # ======================
+        if not append:
+            with stage("arrow_write", city=city_key) as s:
+                if arrow_writer is None:
+                    # Categorical dictionaries only grow, written as deltas
+                    arrow_writer = pa.ipc.new_file(
+                        arrow_target,
+                        HISTORY_SCHEMA,
+                        options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+                    )
+                arrow_writer.write_table(table)
+                s.rows += len(df)
+                s.bytes += table.nbytes
+
+        if on_batch is not None:
+            with stage("ingest", city=city_key) as s:
+                on_batch(df)
+                s.rows += len(df)
+
+        row_count += len(df)
+
+    # Dedup runs interleaved with the upstream generator: time it per row
+    dedup_seconds = 0.0
+    dedup_rows = 0
+
+    try:
+        for row in data:
+            # ======================
+            # CLEAN
+            # ======================
+            start = time.perf_counter()
+            dedup_rows += 1
+            link = row.get("link")
+            duplicate = link is None or link in seen
+            if not duplicate:
+                seen.add(link)
+            dedup_seconds += time.perf_counter() - start
+            if duplicate:
+                continue
+
+            buffer.append(row)
+            if len(buffer) >= batch_size:
+                flush()
+
+        if buffer:
+            flush()
+    finally:
+        record("dedup", dedup_seconds, rows=dedup_rows, city=city_key)
+        if csv_file is not None:
+            csv_file.close()
+        if arrow_writer is not None:
+            arrow_writer.close()
 
-            # Freeze header
-            ws.freeze_panes = "A2"
+    if row_count == 0:
+        return 0, None, None
 
-            # Enable filter
-            ws.auto_filter.ref = ws.dimensions
+    if not append:
+        os.replace(csv_target, path_csv)
+        if os.path.exists(path_arrow):
+            keep_previous(path_arrow, path_prev_arrow)
+        os.replace(arrow_target, path_arrow)
 
-            # Center header
-            for cell in ws[1]:
-                cell.alignment = Alignment(horizontal="center")
+    if excel:
+        with stage("excel_write", city=city_key) as s:
+            close_sheet(ws, len(columns), row_count)
+            save_workbook(workbook, path_xlsx)
+            s.bytes += file_size(path_xlsx)
 
-            # Fixed widths
-            for idx, col in enumerate(df.columns, start=1):
-                ws.column_dimensions[
-                    ws.cell(row=1, column=idx).column_letter
-                ].width = COLUMN_WIDTHS.get(col, 18)
+    compact_city_async(city_key, output_dir)
 
-    return df, path_xlsx, path_csv
+    return row_count, (path_xlsx if excel else None), path_csv
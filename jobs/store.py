@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+
+import config
+
+# =====================================================
+# LOCAL JOB STORE (SQLite, shared by dashboard and workers)
+#
+# A job is (kind, params); identical jobs share a key, and a partial
+# unique index on that key over queued/running jobs makes enqueueing
+# an identical in-flight job return the existing one.
+# =====================================================
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    progress    REAL,
+    message     TEXT,
+    result      TEXT,
+    error       TEXT,
+    created_at  REAL NOT NULL,
+    started_at  REAL,
+    finished_at REAL,
+    heartbeat   REAL,
+    worker_pid  INTEGER
+);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_in_flight
+    ON jobs (key) WHERE status IN ('{QUEUED}', '{RUNNING}');
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+"""
+
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str
+    progress: Optional[float] = None
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = 0.0
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+def job_key(kind: str, params: Dict[str, Any]) -> str:
+    encoded = json.dumps([kind, params], sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+def jobs_path(output_dir: str) -> str:
+    return os.path.join(output_dir, "jobs.db")
+
+
+class JobStore:
+    """
+    Job queue with status and progress, safe across processes.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or jobs_path(config.OUTPUT_DIR)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _job(row: sqlite3.Row) -> Job:
+        return Job(
+            id=row["id"],
+            kind=row["kind"],
+            params=json.loads(row["params"]),
+            status=row["status"],
+            progress=row["progress"],
+            message=row["message"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+        )
+
+    # ----------------------
+    # Producers
+    # ----------------------
+    def enqueue(self, kind: str, **params: Any) -> Job:
+        """
+        Queue a job, or return the identical job already in flight.
+        """
+        key = job_key(kind, params)
+        with self._connect() as db:
+            try:
+                db.execute(
+                    "INSERT INTO jobs (id, kind, params, key, status, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (uuid.uuid4().hex, kind, json.dumps(params, sort_keys=True),
+                     key, QUEUED, time.time()),
+                )
+            except sqlite3.IntegrityError:
+                pass
+
+            row = db.execute(
+                "SELECT * FROM jobs WHERE key = ? AND status IN (?, ?)",
+                (key, QUEUED, RUNNING),
+            ).fetchone()
+
+        if row is None:
+            # Finished between insert attempt and lookup: queue it again
+            return self.enqueue(kind, **params)
+        return self._job(row)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._job(row) if row else None
+
+    def recent(self, limit: int = 20) -> List[Job]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    # ----------------------
+    # Workers
+    # ----------------------
+    def claim(self, worker_pid: int) -> Optional[Job]:
+        """
+        Atomically take the oldest queued job (stale running jobs are
+        requeued first).
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                db.execute(
+                    "UPDATE jobs SET status = ?, worker_pid = NULL "
+                    "WHERE status = ? AND heartbeat < ?",
+                    (QUEUED, RUNNING, now - config.JOB_STALE_SECONDS),
+                )
+                row = db.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                    (QUEUED,),
+                ).fetchone()
+                if row is not None:
+                    db.execute(
+                        "UPDATE jobs SET status = ?, started_at = ?, heartbeat = ?, "
+                        "worker_pid = ?, progress = 0 WHERE id = ?",
+                        (RUNNING, now, now, worker_pid, row["id"]),
+                    )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+        if row is None:
+            return None
+        job = self._job(row)
+        job.status = RUNNING
+        return job
+
+    def progress(self, job_id: str, progress: Optional[float] = None, message: Optional[str] = None) -> None:
+        """
+        Update progress (0–1, None if unknown) and heartbeat of a job.
+        """
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET progress = COALESCE(?, progress), "
+                "message = COALESCE(?, message), heartbeat = ? WHERE id = ?",
+                (progress, message, time.time(), job_id),
+            )
+
+    def heartbeat(self, job_id: str, worker_pid: int) -> bool:
+        """
+        Mark a running job as alive. False when it no longer belongs to
+        worker_pid (requeued as stale meanwhile).
+        """
+        with self._connect() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE id = ? AND status = ? AND worker_pid = ?",
+                (time.time(), job_id, RUNNING, worker_pid),
+            )
+        return cursor.rowcount > 0
+
+    def finish(
+        self,
+        job_id: str,
+        result: Any = None,
+        error: Optional[str] = None,
+        worker_pid: Optional[int] = None,
+    ) -> bool:
+        """
+        Record the outcome of a job. With worker_pid, only while the job
+        still runs on that worker; returns whether the job was updated.
+        """
+        sql = (
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, "
+            "progress = CASE WHEN ? IS NULL THEN 1 ELSE progress END WHERE id = ?"
+        )
+        params = [FAILED if error else DONE, json.dumps(result, default=str),
+                  error, time.time(), error, job_id]
+        if worker_pid is not None:
+            sql += " AND status = ? AND worker_pid = ?"
+            params += [RUNNING, worker_pid]
+        with self._connect() as db:
+            cursor = db.execute(sql, params)
+        return cursor.rowcount > 0
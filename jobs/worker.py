@@ -0,0 +1,215 @@
+import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+import argparse
+import subprocess
+import threading
+import time
+import traceback
+from multiprocessing import Process
+from typing import Any, Callable, Dict, List, Optional
+
+from jobs.store import Job, JobStore
+from utils.instrument import flush
+import config
+
+# =====================================================
+# JOB HANDLERS
+#
+# Crawl and report modules (requests, python-docx, openpyxl) are
+# imported by the handlers, so the dashboard can import ensure_workers
+# without loading them.
+# =====================================================
+def run_crawl(job: Job, store: JobStore) -> Dict[str, Any]:
+    from fetch_data.fetch_data import crawl_city
+
+    city_key = job.params["city_key"]
+
+    def progress(rows: int) -> None:
+        store.progress(job.id, message=f"{rows} tin đã lưu")
+
+    return crawl_city(
+        city_key,
+        config.CITIES[city_key],
+        full=job.params.get("full", False),
+        incremental=job.params.get("incremental", False),
+        progress=progress,
+    )
+
+
+def run_report(job: Job, store: JobStore) -> Dict[str, Any]:
+    from reports.build import city_reports, report_files
+    from reports.cache import ReportCache
+
+    city_key = job.params["city_key"]
+    store.progress(job.id, message="Đang tạo báo cáo")
+
+    cache = ReportCache(os.path.join(config.REPORTS_DIR, "cache"))
+    artifacts = city_reports(
+        cache,
+        city_key,
+        config.OUTPUT_DIR,
+        threshold=job.params.get("threshold", 0.75),
+    )
+    excel_report, docx_report = report_files(city_key, artifacts.directory)
+    return {"key": artifacts.key, "excel": excel_report, "docx": docx_report}
+
+
+def run_compare(job: Job, store: JobStore) -> Dict[str, Any]:
+    from reports.compare import compare_cities
+
+    def progress(done: int, total: int) -> None:
+        store.progress(job.id, done / total, f"{done}/{total} thành phố")
+
+    path, summary = compare_cities(
+        job.params.get("city_keys"),
+        full=job.params.get("full", False),
+        incremental=job.params.get("incremental", False),
+        threshold=job.params.get("threshold", 0.75),
+        progress=progress,
+    )
+    return {"excel": path, "summary": summary.to_dict("records")}
+
+
+HANDLERS: Dict[str, Callable[[Job, JobStore], Any]] = {
+    "crawl": run_crawl,
+    "report": run_report,
+    "compare": run_compare,
+}
+
+
+# =====================================================
+# WORKER LOOP
+# =====================================================
+def _beat(store: JobStore, job_id: str, pid: int, done: threading.Event, lost: threading.Event) -> None:
+    # Handlers report progress irregularly (a report build not at all):
+    # keeps a long job from looking stale and being claimed again
+    while not done.wait(config.JOB_HEARTBEAT_SECONDS):
+        if not store.heartbeat(job_id, pid):
+            # Requeued as stale (e.g. a missed heartbeat) and claimed again
+            lost.set()
+            return
+
+
+def run_worker(store: Optional[JobStore] = None, once: bool = False) -> None:
+    """
+    Claim and run jobs until interrupted (once=True: until the queue
+    is empty).
+    """
+    store = store or JobStore()
+    pid = os.getpid()
+
+    while True:
+        job = store.claim(pid)
+        if job is None:
+            if once:
+                return
+            time.sleep(config.JOB_POLL_SECONDS)
+            continue
+
+        print(f"⚙️ Job {job.kind} {job.params} ({job.id})")
+        done, lost = threading.Event(), threading.Event()
+        heartbeat = threading.Thread(
+            target=_beat, args=(store, job.id, pid, done, lost), daemon=True
+        )
+        heartbeat.start()
+        try:
+            try:
+                result, error = HANDLERS[job.kind](job, store), None
+            except Exception:
+                result, error = None, traceback.format_exc()
+
+            # The job's new owner records the outcome
+            if lost.is_set() or not store.finish(job.id, result, error, worker_pid=pid):
+                print(f"⚠️ Job {job.id} was taken over by another worker, outcome dropped")
+            elif error:
+                print(f"❌ Job {job.id} failed")
+            else:
+                print(f"✅ Job {job.id} done")
+        finally:
+            done.set()
+            heartbeat.join()
+            flush(config.OUTPUT_DIR)
+
+
+# =====================================================
+# WORKER PROCESSES
+# =====================================================
+def pid_path(slot: int) -> str:
+    return os.path.join(config.OUTPUT_DIR, "workers", f"worker-{slot}.pid")
+
+
+def _alive(pid: int) -> bool:
+    # A dead worker started by this process stays a zombie, which still
+    # answers signals, until it is reaped
+    try:
+        if os.waitpid(pid, os.WNOHANG)[0] == pid:
+            return False
+    except ChildProcessError:
+        pass  # not a child of this process
+    try:
+        os.kill(pid, 0)
+    except (OSError, ValueError):
+        return False
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (OSError, IndexError):
+        return True
+
+
+def ensure_workers(count: Optional[int] = None) -> List[int]:
+    """
+    Make sure `count` detached worker processes are running (restarting
+    dead ones) and return their pids. Safe to call on every dashboard
+    rerun.
+    """
+    count = count or config.JOB_WORKERS
+    pids = []
+
+    for slot in range(count):
+        path = pid_path(slot)
+        try:
+            with open(path) as f:
+                pid = int(f.read().strip())
+        except (OSError, ValueError):
+            pid = None
+
+        if pid is None or not _alive(pid):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__)],
+                cwd=PROJECT_ROOT,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            pid = process.pid
+            with open(path, "w") as f:
+                f.write(str(pid))
+        pids.append(pid)
+
+    return pids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run background crawl/report jobs")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(once=args.once)
+    else:
+        processes = [
+            Process(target=run_worker, kwargs={"once": args.once})
+            for _ in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,202 @@
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from analytics.deals import detect_deals
+from analytics.diff import diff_snapshots
+from analytics.metrics import (
+    price_by_district,
+    price_m2_by_district_category,
+    supply_by_district,
+)
+from analytics.reposts import RepostIndex, drop_reposts, load_repost_index, reposts_path
+from analytics.stats import district_stats
+from analytics.trends import trend_7_days
+from reports.cache import ReportArtifacts, ReportCache, fingerprint
+from utils.instrument import stage
+from utils.load import load_previous_snapshot, load_snapshot, previous_snapshot_path, snapshot_path
+from utils.schema import table_to_frame
+import config
+
+DEALS_REPORT = "Tin giá tốt"
+CHANGES_REPORT = "Thay đổi từ lần crawl trước"
+
+
+def report_files(city_key: str, directory: str) -> Tuple[str, str]:
+    """
+    Paths of the Excel report and DOCX deals report of a city.
+    """
+    return (
+        os.path.join(directory, f"{city_key}_report.xlsx"),
+        os.path.join(directory, f"{city_key}_deals.docx"),
+    )
+
+
+def city_name(city_key: str) -> str:
+    return config.CITIES.get(city_key, {}).get("name", city_key)
+
+
+def build_reports(
+    df: pd.DataFrame,
+    city_key: str,
+    reposts: Optional[RepostIndex] = None,
+    threshold: float = 0.75,
+    previous: Optional[pd.DataFrame] = None,
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Every analytics report of a city, and the frame they were built
+    from (known reposts dropped: they inflate supply and skew medians).
+
+    With the previous snapshot of the city, the new, removed and
+    repriced listings since that crawl are added as CHANGES_REPORT.
+    """
+    report_df = drop_reposts(df, reposts) if reposts is not None else df
+
+    # One grouped pass shared by every district report
+    with stage("district_stats", city=city_key) as s:
+        stats = district_stats(report_df)
+        s.rows += len(report_df)
+
+    builders = {
+        "Giá trung bình & median theo quận": lambda: price_by_district(report_df, stats),
+        "Giá/m² theo quận + loại": lambda: price_m2_by_district_category(report_df, stats),
+        "Nguồn cung theo quận": lambda: supply_by_district(report_df, stats),
+        "Xu hướng 7 ngày": lambda: trend_7_days(report_df),
+        DEALS_REPORT: lambda: detect_deals(report_df, threshold=threshold, stats=stats),
+    }
+    if previous is not None:
+        builders[CHANGES_REPORT] = lambda: diff_snapshots(previous, df).to_frame()
+
+    reports = {}
+    for name, build in builders.items():
+        with stage("report", city=city_key, report=name) as s:
+            reports[name] = build()
+            s.rows += len(report_df)
+
+    return reports, report_df
+
+
+def generate_reports(
+    df: pd.DataFrame,
+    city_key: str,
+    directory: str,
+    reposts: Optional[RepostIndex] = None,
+    threshold: float = 0.75,
+    previous: Optional[pd.DataFrame] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Build the reports of a city and export them (Excel + DOCX deals)
+    into directory.
+    """
+    # Exporters pull in openpyxl / python-docx: only load them to export
+    from reports.export_docx import export_docx
+    from reports.export_excel import export_excel
+
+    reports, report_df = build_reports(df, city_key, reposts, threshold, previous)
+
+    excel_report, docx_report = report_files(city_key, directory)
+    export_excel(reports, excel_report)
+    export_docx(report_df, reports[DEALS_REPORT], docx_report, city=city_name(city_key))
+
+    return reports
+
+
+def city_report_key(city_key: str, output_dir: str, threshold: float = 0.75) -> str:
+    """
+    Report cache key of a city's latest and previous snapshots and
+    repost index.
+    """
+    return fingerprint(
+        (
+            snapshot_path(city_key, output_dir),
+            reposts_path(city_key, output_dir),
+            previous_snapshot_path(city_key, output_dir),
+        ),
+        city_key=city_key,
+        threshold=threshold,
+    )
+
+
+def city_reports(
+    cache: ReportCache,
+    city_key: str,
+    output_dir: str,
+    threshold: float = 0.75,
+    df: Optional[pd.DataFrame] = None,
+    reposts: Optional[RepostIndex] = None,
+) -> ReportArtifacts:
+    """
+    Reports of a city's latest snapshot, from the cache when the
+    snapshot, repost index and parameters are unchanged.
+
+    df / reposts may be passed when the caller already holds them
+    (otherwise they are loaded only on a cache miss).
+    """
+    snapshot = snapshot_path(city_key, output_dir)
+    reposts_file = reposts_path(city_key, output_dir)
+    key = city_report_key(city_key, output_dir, threshold)
+
+    def build(directory):
+        frame = df if df is not None else table_to_frame(load_snapshot(snapshot))
+        index = reposts
+        if index is None and os.path.exists(reposts_file):
+            index = load_repost_index(city_key, output_dir)
+        previous = load_previous_snapshot(city_key, output_dir)
+        return generate_reports(frame, city_key, directory, index, threshold, previous)
+
+    return cache.get_or_build(key, build)
+
+
+def load_city_snapshot(city_key: str, output_dir: str) -> pd.DataFrame:
+    """
+    Latest snapshot of a city, known reposts dropped.
+    """
+    df = table_to_frame(load_snapshot(snapshot_path(city_key, output_dir)))
+    if os.path.exists(reposts_path(city_key, output_dir)):
+        df = drop_reposts(df, load_repost_index(city_key, output_dir))
+    return df
+
+
+def deal_docx_reports(
+    city_keys: Iterable[str],
+    output_dir: str,
+    directory: str,
+    threshold: float = 0.75,
+    top_n: Optional[int] = None,
+    by_district: bool = False,
+    workers: Optional[int] = None,
+) -> List[str]:
+    """
+    DOCX deals reports of several cities (one per district of each city
+    with by_district=True), rendered in parallel. Returns their paths.
+    """
+    from reports.export_docx import (
+        DocxReport,
+        district_docx_reports,
+        export_docx_batch,
+        market_overview,
+    )
+
+    os.makedirs(directory, exist_ok=True)
+    top_n = top_n or config.REPORT_TOP_DEALS
+    reports = []
+
+    for city_key in city_keys:
+        df = load_city_snapshot(city_key, output_dir)
+        deals = detect_deals(df, threshold=threshold)
+
+        if by_district:
+            reports.extend(district_docx_reports(
+                df, deals, city_name(city_key), directory, city_key, top_n
+            ))
+        else:
+            reports.append(DocxReport(
+                path=report_files(city_key, directory)[1],
+                city=city_name(city_key),
+                overview=market_overview(df),
+                deals=deals,
+                top_n=top_n,
+            ))
+
+    return export_docx_batch(reports, workers)
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+import config
+
+# =====================================================
+# CONTENT-ADDRESSED REPORT CACHE
+#
+# A report set (analytics frames + exported files) is stored under the
+# fingerprint of its inputs: the bytes of the data files it was built
+# from plus the report parameters. Unchanged data and parameters reuse
+# the stored set; both the in-memory and the on-disk store evict the
+# least recently used sets beyond their bounds.
+#
+#   <cache_dir>/<key>/reports.pkl   analytics frames
+#   <cache_dir>/<key>/*.xlsx|docx   exported files
+# =====================================================
+REPORTS_FILE = "reports.pkl"
+
+_DIGESTS: Dict[Tuple[str, int, int], str] = {}
+_DIGESTS_LOCK = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """
+    SHA-256 of a file's content, memoized per (path, mtime, size).
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    with _DIGESTS_LOCK:
+        if key in _DIGESTS:
+            return _DIGESTS[key]
+
+    with open(path, "rb") as f:
+        digest = hashlib.file_digest(f, "sha256").hexdigest()
+
+    with _DIGESTS_LOCK:
+        _DIGESTS[key] = digest
+    return digest
+
+
+def fingerprint(files: Tuple[Optional[str], ...], **params: Any) -> str:
+    """
+    Cache key of a report set: content of its input files (missing
+    files count as absent) and its parameters.
+    """
+    payload = {
+        "version": config.REPORT_CACHE_VERSION,
+        "files": [
+            file_digest(path) if path and os.path.exists(path) else None
+            for path in files
+        ],
+        "params": params,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:32]
+
+
+@dataclass
+class ReportArtifacts:
+    key: str
+    directory: str
+    reports: Dict[str, pd.DataFrame]
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+
+class ReportCache:
+    """
+    Size-bounded LRU cache of report sets, in memory and on disk.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: Optional[int] = None,
+        memory_entries: Optional[int] = None,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes or config.REPORT_CACHE_MAX_BYTES
+        self.memory_entries = memory_entries or config.REPORT_CACHE_MEMORY_ENTRIES
+        self._memory: "OrderedDict[str, ReportArtifacts]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    # ----------------------
+    # Lookups
+    # ----------------------
+    def get(self, key: str) -> Optional[ReportArtifacts]:
+        with self._lock:
+            artifacts = self._memory.get(key)
+            if artifacts is not None and os.path.isdir(artifacts.directory):
+                self._memory.move_to_end(key)
+                self._touch(artifacts.directory)
+                return artifacts
+
+        directory = self.entry_dir(key)
+        try:
+            reports = pd.read_pickle(os.path.join(directory, REPORTS_FILE))
+        except (OSError, ValueError, EOFError):
+            return None
+
+        artifacts = ReportArtifacts(key, directory, reports)
+        self._remember(artifacts)
+        self._touch(directory)
+        return artifacts
+
+    def get_or_build(
+        self,
+        key: str,
+        build: Callable[[str], Dict[str, pd.DataFrame]],
+    ) -> ReportArtifacts:
+        """
+        Cached report set for key, or build(directory) → reports, which
+        writes its files into directory.
+        """
+        artifacts = self.get(key)
+        if artifacts is not None:
+            return artifacts
+
+        # Build in a private directory, publish with one rename
+        tmp_dir = os.path.join(self.cache_dir, f"_{key}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(tmp_dir)
+        try:
+            reports = build(tmp_dir)
+            pd.to_pickle(reports, os.path.join(tmp_dir, REPORTS_FILE))
+            try:
+                os.rename(tmp_dir, self.entry_dir(key))
+            except OSError:
+                # Built concurrently by someone else: keep theirs
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        self.evict(keep=key)
+        artifacts = self.get(key)
+        if artifacts is None:
+            raise RuntimeError(f"Report cache entry {key} vanished after build")
+        return artifacts
+
+    # ----------------------
+    # Eviction
+    # ----------------------
+    def _remember(self, artifacts: ReportArtifacts) -> None:
+        with self._lock:
+            self._memory[artifacts.key] = artifacts
+            self._memory.move_to_end(artifacts.key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    @staticmethod
+    def _touch(directory: str) -> None:
+        try:
+            os.utime(directory)
+        except OSError:
+            pass
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """
+        Drop least recently used entries until the disk cache fits.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            directory = self.entry_dir(name)
+            if name.startswith("_") or not os.path.isdir(directory):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory)
+            )
+            entries.append((os.path.getmtime(directory), size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self.entry_dir(name), ignore_errors=True)
+            with self._lock:
+                self._memory.pop(name, None)
+            total -= size
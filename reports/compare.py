@@ -0,0 +1,159 @@
+import os
+from concurrent.futures import as_completed
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from fetch_data.fetch_data import city_pool, crawl_city
+from reports.build import DEALS_REPORT, build_reports, city_name, load_city_snapshot
+from reports.export_excel import export_excel
+from utils.instrument import flush
+from utils.load import snapshot_path
+
+# =====================================================
+# CROSS-CITY COMPARISON
+#
+# Every city is crawled and analysed in its own process (city_pool);
+# only the small report frames travel back to be merged into one
+# comparison workbook, so a run takes about as long as its slowest city.
+# =====================================================
+SUMMARY_SHEET = "So sánh thành phố"
+
+
+def comparison_path(directory: str) -> str:
+    return os.path.join(directory, "cities_comparison.xlsx")
+
+
+def city_summary(city_key: str, df: pd.DataFrame, reports: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
+    """
+    Headline figures of one city, one row of the comparison sheet.
+    """
+    price = pd.to_numeric(df["price"], errors="coerce")
+    price_m2 = pd.to_numeric(df["price_million_per_m2"], errors="coerce")
+    deals = reports[DEALS_REPORT]
+
+    return {
+        "city": city_name(city_key),
+        "listings": len(df),
+        "districts": int(df["area_name"].nunique()),
+        "avg_price": price.mean(),
+        "median_price": price.median(),
+        "avg_price_m2": price_m2.mean(),
+        "median_price_m2": price_m2.median(),
+        "deals": len(deals),
+        "deal_share": len(deals) / len(df) if len(df) else np.nan,
+    }
+
+
+def empty_summary(city_key: str) -> Dict[str, Any]:
+    """
+    Comparison row of a city without any crawled listing.
+    """
+    return {
+        "city": city_name(city_key),
+        "listings": 0,
+        "districts": 0,
+        "avg_price": np.nan,
+        "median_price": np.nan,
+        "avg_price_m2": np.nan,
+        "median_price_m2": np.nan,
+        "deals": 0,
+        "deal_share": np.nan,
+    }
+
+
+def analyse_city(
+    city_key: str,
+    crawl: bool = True,
+    full: bool = False,
+    incremental: bool = False,
+    threshold: float = 0.75,
+) -> Dict[str, Any]:
+    """
+    Crawl (unless crawl=False) and build every report of one city.
+    Runs in a city_pool process.
+
+    A city with no snapshot (its crawls returned nothing so far) gets an
+    empty summary and no reports.
+    """
+    try:
+        if crawl:
+            crawl_city(city_key, config.CITIES[city_key], full, incremental)
+
+        if not os.path.exists(snapshot_path(city_key, config.OUTPUT_DIR)):
+            print(f"⚠️ {city_key}: no listings crawled, left out of the comparison")
+            return {"city_key": city_key, "summary": empty_summary(city_key), "reports": {}}
+
+        df = load_city_snapshot(city_key, config.OUTPUT_DIR)
+        reports, report_df = build_reports(df, city_key, threshold=threshold)
+        return {
+            "city_key": city_key,
+            "summary": city_summary(city_key, report_df, reports),
+            "reports": reports,
+        }
+    finally:
+        flush(config.OUTPUT_DIR)
+
+
+def comparison_sheets(results: List[Dict[str, Any]]) -> Dict[str, pd.DataFrame]:
+    """
+    Summary sheet plus every per-city report stacked with a city column.
+    """
+    sheets = {SUMMARY_SHEET: pd.DataFrame([r["summary"] for r in results])}
+
+    names = dict.fromkeys(name for r in results for name in r["reports"])
+    for name in names:
+        frames = [
+            r["reports"][name].assign(city=r["summary"]["city"])
+            for r in results
+            if r["reports"].get(name) is not None and not r["reports"][name].empty
+        ]
+        if not frames:
+            continue
+        stacked = pd.concat(frames, ignore_index=True)
+        stacked = stacked[["city", *[c for c in stacked.columns if c != "city"]]]
+        if name == DEALS_REPORT:
+            stacked = stacked.sort_values("deal_score", ignore_index=True)
+        sheets[name] = stacked
+
+    return sheets
+
+
+def compare_cities(
+    city_keys: Optional[Iterable[str]] = None,
+    crawl: bool = True,
+    full: bool = False,
+    incremental: bool = False,
+    threshold: float = 0.75,
+    path: Optional[str] = None,
+    progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[str, pd.DataFrame]:
+    """
+    Crawl and analyse several cities (all configured ones by default)
+    in parallel and write the cross-city comparison workbook.
+
+    progress, if given, is called with (cities done, cities) as each
+    city finishes. Returns the workbook path and the summary table.
+    """
+    city_keys = list(city_keys or config.CITIES)
+    results: Dict[str, Dict[str, Any]] = {}
+
+    with city_pool(len(city_keys)) as pool:
+        futures = {
+            pool.submit(analyse_city, city_key, crawl, full, incremental, threshold): city_key
+            for city_key in city_keys
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress(done, len(city_keys))
+
+    sheets = comparison_sheets([results[city_key] for city_key in city_keys])
+
+    path = path or comparison_path(config.REPORTS_DIR)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    export_excel(sheets, path)
+
+    return path, sheets[SUMMARY_SHEET]
@@ -1,66 +1,265 @@
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
 from docx import Document
+import numpy as np
 import pandas as pd
 
+import config
+from utils.instrument import file_size, stage
+
+METHODOLOGY = """
+- So sánh giá trên mỗi mét vuông (giá/m²) của từng tin với giá/m² trung vị của quận/huyện tương ứng.
+- Chỉ giữ lại các tin có giá thấp hơn 25% so với mặt bằng chung của khu vực.
+        """
+
+
+# =====================================================
+# TEMPLATE
+# =====================================================
+class DocxTemplate:
+    """
+    Report skeleton (headings, methodology, styles) parsed once and
+    reused for every document: each render resets the body to a copy of
+    the pristine skeleton instead of rebuilding the document.
+
+    path may point to a .docx (letterhead, custom styles) the report
+    sections are appended to. A template renders one document at a
+    time; use one per thread or process.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        doc = Document(path)
+
+        title = doc.add_heading("", level=1)
+        doc.add_heading("Tổng quan thị trường", level=2)
+        overview = doc.add_paragraph()
+        doc.add_heading("Tin giá tốt", level=2)
+        doc.add_heading("Phương pháp xác định", level=3)
+        doc.add_paragraph(METHODOLOGY)
+        doc.add_heading("Danh sách bất động sản giá tốt", level=3)
+
+        elements = [p._p for p in doc.paragraphs]
+        self._title = elements.index(title._p)
+        self._overview = elements.index(overview._p)
+        self._skeleton = [copy.deepcopy(child) for child in doc.element.body]
+        self._document = doc
+
+    def render(self, title: str, overview: str, lines: Iterable[str]):
+        """
+        The template document with its slots filled (valid until the
+        next render).
+        """
+        doc = self._document
+        body = doc.element.body
+        for child in list(body):
+            body.remove(child)
+        body.extend(copy.deepcopy(child) for child in self._skeleton)
+
+        paragraphs = doc.paragraphs
+        paragraphs[self._title].text = title
+        paragraphs[self._overview].text = overview
+        for line in lines:
+            doc.add_paragraph(line)
+        return doc
+
+
+# =====================================================
+# FORMATTING (whole columns at once)
+# =====================================================
+def market_overview(df: pd.DataFrame) -> Dict[str, float]:
+    """
+    Listing count and average price / price per m2 of a market.
+    """
+    return {
+        "listings": len(df),
+        "avg_price_billion": pd.to_numeric(df["price"], errors="coerce").mean() / 1_000_000_000,
+        "avg_price_m2": pd.to_numeric(df["price_million_per_m2"], errors="coerce").mean(),
+    }
+
+
+def district_overviews(df: pd.DataFrame) -> Dict[str, Dict[str, float]]:
+    """
+    market_overview of every district (area_name), in one grouped pass.
+    """
+    grouped = pd.DataFrame({
+        "area_name": df["area_name"].astype(str),
+        "price": pd.to_numeric(df["price"], errors="coerce"),
+        "price_million_per_m2": pd.to_numeric(df["price_million_per_m2"], errors="coerce"),
+    }).groupby("area_name", observed=True).agg(
+        listings=("price", "size"),
+        avg_price_billion=("price", "mean"),
+        avg_price_m2=("price_million_per_m2", "mean"),
+    )
+    grouped["avg_price_billion"] /= 1_000_000_000
+    return grouped.to_dict("index")
+
+
+def format_overview(overview: Dict[str, float]) -> str:
+    return (
+        f"Tổng số tin: {overview['listings']}\n"
+        f"Giá trung bình: {overview['avg_price_billion']:.2f} tỷ\n"
+        f"Giá trung bình / m²: {overview['avg_price_m2']:.1f} triệu/m²"
+    )
+
+
+def format_deal_lines(deals: pd.DataFrame) -> List[str]:
+    """
+    One bullet line per deal, formatted column-wise.
+    """
+    if deals.empty:
+        return []
+
+    price = pd.to_numeric(deals["price"], errors="coerce").to_numpy(dtype=float)
+    price_m2 = pd.to_numeric(deals["price_million_per_m2"], errors="coerce").to_numpy(dtype=float)
+
+    lines = (
+        "- " + deals["title"].astype(str)
+        + " | " + deals["area_name"].astype(str)
+        + " | " + np.char.mod("%.2f", price / 1_000_000_000).astype(object)
+        + " tỷ | " + np.char.mod("%.1f", price_m2).astype(object)
+        + " triệu/m²"
+    )
+    return lines.tolist()
+
+
+def report_title(city: str, district: Optional[str] = None) -> str:
+    place = f"{district}, {city}" if district else city
+    return f"{place} – Báo cáo thị trường bất động sản"
+
+
+# =====================================================
+# SINGLE REPORT
+# =====================================================
+@dataclass
+class DocxReport:
+    """
+    Everything one DOCX deals report needs; cheap to send to a worker
+    process (deals are cut to the top_n rows shown).
+    """
+    path: str
+    city: str
+    overview: Dict[str, float]
+    deals: pd.DataFrame
+    top_n: int = config.REPORT_TOP_DEALS
+    district: Optional[str] = None
+
+
+def _write_docx(report: DocxReport, template: DocxTemplate) -> str:
+    doc = template.render(
+        report_title(report.city, report.district),
+        format_overview(report.overview),
+        format_deal_lines(report.deals.head(report.top_n)),
+    )
+    doc.save(report.path)
+    return report.path
+
 
 def export_docx(
     df: pd.DataFrame,
     deals: pd.DataFrame,
     path: str = "market_report.docx",
+    city: str = "Hà Nội",
+    top_n: Optional[int] = None,
+    template: Optional[DocxTemplate] = None,
 ) -> None:
     """
     Export real estate market report to DOCX.
     """
-    doc = Document()
+    report = DocxReport(
+        path=path,
+        city=city,
+        overview=market_overview(df),
+        deals=deals,
+        top_n=top_n or config.REPORT_TOP_DEALS,
+    )
 
-    # =====================================================
-    # TITLE
-    # =====================================================
-    doc.add_heading("Hà Nội – Báo cáo thị trường bất động sản", level=1)
+    with stage("export_docx") as s:
+        _write_docx(report, template or DocxTemplate())
+        s.rows += len(df)
+        s.bytes += file_size(path)
 
-    # =====================================================
-    # MARKET OVERVIEW
-    # =====================================================
-    avg_price_billion = df["price"].mean() / 1_000_000_000
-    avg_price_m2 = df["price_million_per_m2"].mean()
+    print(f"📄 Report saved to {path}")
 
-    doc.add_heading("Tổng quan thị trường", level=2)
-    doc.add_paragraph(
-        f"Tổng số tin: {len(df)}\n"
-        f"Giá trung bình: {avg_price_billion:.2f} tỷ\n"
-        f"Giá trung bình / m²: {avg_price_m2:.1f} triệu/m²"
-    )
 
-    # =====================================================
-    # GOOD DEALS
-    # =====================================================
+# =====================================================
+# BATCH
+# =====================================================
+_TEMPLATE: Optional[DocxTemplate] = None
 
-    number_of_hot_deals = 5 
-    doc.add_heading("Tin giá tốt", level=2)
 
-    doc.add_heading("Phương pháp xác định", level=3)
-    doc.add_paragraph(
-        """
-- So sánh giá trên mỗi mét vuông (giá/m²) của từng tin với giá/m² trung vị của quận/huyện tương ứng.
-- Chỉ giữ lại các tin có giá thấp hơn 25% so với mặt bằng chung của khu vực.
-        """
-    )
+def _init_worker(template_path: Optional[str]) -> None:
+    global _TEMPLATE
+    _TEMPLATE = DocxTemplate(template_path)
 
-    doc.add_heading("Danh sách bất động sản giá tốt", level=3)
 
+def _render(report: DocxReport) -> str:
+    return _write_docx(report, _TEMPLATE)
 
-    top_deals = deals.head(number_of_hot_deals)
 
-    for _, row in top_deals.iterrows():
-        price_billion = row["price"] / 1_000_000_000
+def district_docx_reports(
+    df: pd.DataFrame,
+    deals: pd.DataFrame,
+    city: str,
+    directory: str,
+    prefix: str,
+    top_n: Optional[int] = None,
+) -> List[DocxReport]:
+    """
+    One deals report per district of a city that has deals.
+    """
+    top_n = top_n or config.REPORT_TOP_DEALS
+    overviews = district_overviews(df)
 
-        doc.add_paragraph(
-            f"- {row['title']} | {row['area_name']} | "
-            f"{price_billion:.2f} tỷ | "
-            f"{row['price_million_per_m2']:.1f} triệu/m²"
+    return [
+        DocxReport(
+            path=os.path.join(directory, f"{prefix}_{district_slug(district)}_deals.docx"),
+            city=city,
+            overview=overviews[district],
+            deals=district_deals.head(top_n),
+            top_n=top_n,
+            district=district,
         )
+        for district, district_deals in deals.groupby(deals["area_name"].astype(str), sort=True)
+        if district in overviews
+    ]
 
-    # =====================================================
-    # SAVE
-    # =====================================================
-    doc.save(path)
-    print(f"📄 Report saved to {path}")
+
+def district_slug(district: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in district).strip("_").lower()
+
+
+def export_docx_batch(
+    reports: Iterable[DocxReport],
+    workers: Optional[int] = None,
+    template_path: Optional[str] = None,
+) -> List[str]:
+    """
+    Write many DOCX reports, spread over worker processes (each parses
+    the template once). Returns the written paths, in input order.
+    """
+    reports = [
+        DocxReport(**{**vars(r), "deals": r.deals.head(r.top_n)}) for r in reports
+    ]
+    workers = min(workers or config.REPORT_DOCX_WORKERS, len(reports))
+
+    with stage("export_docx_batch") as s:
+        if workers <= 1:
+            template = DocxTemplate(template_path)
+            paths = [_write_docx(report, template) for report in reports]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(template_path,),
+            ) as pool:
+                paths = list(pool.map(_render, reports, chunksize=max(1, len(reports) // (workers * 4))))
+
+        s.rows += len(reports)
+        s.bytes += sum(file_size(path) for path in paths)
+
+    print(f"📄 {len(paths)} reports saved")
+    return paths
@@ -2,8 +2,9 @@ import re
 from typing import Dict
 
 import pandas as pd
-from openpyxl.styles import Alignment
-from openpyxl.worksheet.worksheet import Worksheet
+
+from utils.excel import write_excel
+from utils.instrument import file_size, stage
 
 
 # =====================================================
@@ -20,32 +21,6 @@ def clean_sheet_name(name: str) -> str:
     return result
 
 
-# =====================================================
-# Worksheet formatting
-# =====================================================
-def format_worksheet(ws: Worksheet) -> None:
-    """
-    Apply standard formatting to an Excel worksheet.
-    """
-    # Freeze header
-    ws.freeze_panes = "A2"
-
-    # Enable filters
-    ws.auto_filter.ref = ws.dimensions
-
-    # Center header row
-    for cell in ws[1]:
-        cell.alignment = Alignment(horizontal="center")
-
-    # Auto column width (safe cap)
-    for column in ws.columns:
-        values = (str(cell.value) for cell in column if cell.value is not None)
-        max_length = max((len(v) for v in values), default=10)
-        ws.column_dimensions[column[0].column_letter].width = min(
-            max_length + 2, 40
-        )
-
-
 # =====================================================
 # Export Excel
 # =====================================================
@@ -63,20 +38,17 @@ def export_excel(
     output_path : str
         Destination Excel file path
     """
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-        for sheet_name, df in reports.items():
-            if df is None or df.empty:
-                continue
-
-            safe_name = clean_sheet_name(sheet_name)
-
-            df.to_excel(
-                writer,
-                sheet_name=safe_name,
-                index=False,
-            )
-
-            worksheet = writer.sheets[safe_name]
-            format_worksheet(worksheet)
+    sheets = {
+        clean_sheet_name(sheet_name): df
+        for sheet_name, df in reports.items()
+        if df is not None and not df.empty
+    }
+
+    # Streams rows in write-only mode; frozen, centered header, filters
+    # and capped auto widths (computed from the frames) are kept
+    with stage("export_excel") as s:
+        write_excel(sheets, output_path)
+        s.rows += sum(len(df) for df in sheets.values())
+        s.bytes += file_size(output_path)
 
     print(f"📊 Excel report exported to: {output_path}")
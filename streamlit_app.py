@@ -1,17 +1,21 @@
 import os
-import subprocess
+import sys
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dashboard", "app.py")
+
 
 def main():
     """
-    Runs the Streamlit application.
+    Runs the Streamlit application in this process (same as
+    `streamlit run dashboard/app.py`, without a child process).
     """
-    app_path = os.path.join("dashboard", "app.py")
-    command = ["streamlit", "run", app_path]
-    
+    from streamlit.web import cli as stcli
+
     print("Starting the Streamlit application...")
     print(f"You can view your app in your browser.")
-    
-    subprocess.run(command)
+
+    sys.argv = ["streamlit", "run", APP_PATH, *sys.argv[1:]]
+    sys.exit(stcli.main())
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,17 @@
+import os
+
+from fetch_data.client import ResponseCache
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=300, max_bytes=3000)
+    body = ["x" * 900]
+    for page in range(3):
+        cache.put("https://gateway/ads", {"page": page}, body)
+        os.utime(cache.path("https://gateway/ads", {"page": page}), (page, page))
+    assert cache.get("https://gateway/ads", {"page": 0}) is not None  # used again
+
+    cache.put("https://gateway/ads", {"page": 3}, body)
+    kept = [page for page in range(4) if cache.get("https://gateway/ads", {"page": page})]
+    assert kept == [0, 3]
+    assert sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path)) <= 2250
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from analytics.cube import ALL, RollupCube, load_cube, save_cube
+from analytics.sketches import TDigest
+
+
+def _listings(ids, prices, district="Quận 1", ward="Phường 1"):
+    return pd.DataFrame({
+        "list_id": pd.array(ids, dtype="Int64"),
+        "area_name": district,
+        "ward_name": ward,
+        "category": "Bán nhà",
+        "price_million_per_m2": prices,
+    })
+
+
+def test_recrawled_listing_is_not_counted_twice():
+    cube = RollupCube()
+    cube.update(_listings([1, 2, 3], [100.0, 110.0, 120.0]))
+    cube.update(_listings([1, 2, 3], [100.0, 110.0, 120.0]))
+
+    assert cube.lookup()["listings"] == 3
+    assert cube.lookup("Quận 1", "Phường 1")["listings"] == 3
+
+
+def test_repriced_listing_replaces_its_old_value():
+    cube = RollupCube()
+    cube.update(_listings([1, 2, 3], [100.0, 110.0, 120.0]))
+    for _ in range(5):
+        cube.update(_listings([1], [1000.0]))
+
+    cell = cube.lookup("Quận 1", ALL, ALL)
+    assert cell["listings"] == 3
+    assert cell["median"] == 120.0
+
+
+def test_moved_listing_leaves_its_old_cells():
+    cube = RollupCube()
+    cube.update(_listings([1, 2], [100.0, 110.0]))
+    cube.update(_listings([2], [110.0], district="Quận 3", ward="Phường 9"))
+
+    assert cube.lookup("Quận 1")["listings"] == 1
+    assert cube.lookup("Quận 3", "Phường 9")["listings"] == 1
+    assert cube.lookup()["listings"] == 2
+
+
+def test_removed_listings_are_retracted_and_empty_cells_dropped():
+    cube = RollupCube()
+    cube.update(_listings([1, 2], [100.0, 110.0]))
+    cube.update(_listings([3], [500.0], district="Quận 3"))
+
+    assert cube.remove([3, 99]) == 1
+    assert cube.lookup("Quận 3") is None
+    assert cube.lookup()["listings"] == 2
+    assert "Quận 3" not in cube.districts()
+
+
+def test_contributions_survive_a_round_trip(tmp_path):
+    cube = load_cube("hanoi", str(tmp_path))
+    cube.update(_listings([1, 2, 3], [100.0, 110.0, 120.0]))
+    save_cube(cube, "hanoi", str(tmp_path))
+    loaded = load_cube("hanoi", str(tmp_path))
+
+    loaded.update(_listings([1], [130.0]))
+    assert loaded.lookup()["listings"] == 3
+    assert loaded.remove([2]) == 1
+    assert loaded.lookup()["listings"] == 2
+
+
+def test_unsaved_changes_are_not_stored(tmp_path):
+    cube = load_cube("hanoi", str(tmp_path))
+    cube.update(_listings([1, 2], [100.0, 110.0]))
+    save_cube(cube, "hanoi", str(tmp_path))
+
+    # A crawl that dies before saving leaves the stored cube as it was
+    cube.update(_listings([3], [120.0], district="Quận 3"))
+    cube.remove([1])
+    cube.close()
+
+    loaded = load_cube("hanoi", str(tmp_path))
+    assert loaded.lookup()["listings"] == 2
+    assert loaded.lookup("Quận 3") is None
+    assert loaded.remove([1]) == 1
+
+
+def test_rebuilt_rollups_match_a_fresh_cube():
+    cube = RollupCube()
+    cube.update(_listings([1, 2, 3], [100.0, 110.0, 120.0]))
+    cube.update(_listings([4, 5], [200.0, 210.0], district="Quận 3", ward=None))
+    cube.update(_listings([2], [150.0], district="Quận 3", ward="Phường 9"))
+    cube.remove([4])
+
+    fresh = RollupCube()
+    fresh.update(_listings([1, 3], [100.0, 120.0]))
+    fresh.update(_listings([5], [210.0], district="Quận 3", ward=None))
+    fresh.update(_listings([2], [150.0], district="Quận 3", ward="Phường 9"))
+
+    pd.testing.assert_frame_equal(cube.to_frame(), fresh.to_frame())
+
+
+def test_digest_quantiles_stay_close_on_large_streams():
+    values = np.random.default_rng(0).lognormal(4, 0.5, 100_000)
+    digest = TDigest()
+    for chunk in np.array_split(values, 20):
+        digest.update(chunk)
+
+    assert digest.count == len(values)
+    assert digest.quantile(0) == values.min()
+    assert digest.quantile(1) == values.max()
+    for q in (0.25, 0.5, 0.75):
+        assert abs(digest.quantile(q) - np.quantile(values, q)) / np.quantile(values, q) < 0.01
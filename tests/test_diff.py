@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+from analytics.diff import NEW, REMOVED, REPRICED, diff_snapshots, snapshot_diff
+from benchmarks.synthetic import iter_rows, make_listings
+from fetch_data.storage import save_city_data
+from utils.schema import compact_frame
+
+
+def _next_crawl(previous):
+    """
+    previous with 10 listings removed, 5 repriced (+10%), 3 retitled and
+    4 new ones.
+    """
+    current = previous.iloc[10:].reset_index(drop=True)
+    current["price"] = current["price"].astype(float)
+    current.loc[:4, "price"] *= 1.1
+    current.loc[5:7, "title"] += " (mới)"
+    new = make_listings(4, seed=99)
+    new["link"] = new["link"] + "7"
+    return pd.concat([current, new], ignore_index=True)
+
+
+def test_diff_classifies_every_listing():
+    previous = make_listings(100, seed=5)
+    diff = diff_snapshots(previous, _next_crawl(previous))
+
+    assert diff.counts() == {NEW: 4, REMOVED: 10, REPRICED: 5, "edited": 3, "unchanged": 82}
+    assert np.allclose(diff.repriced["price_change_pct"], 10.0)
+    assert set(diff.to_frame()["change"]) == {NEW, REMOVED, REPRICED}
+
+
+def test_diff_compares_export_and_compact_schemas():
+    previous = make_listings(50, seed=6)
+    diff = diff_snapshots(compact_frame(previous), previous)
+    assert diff.counts()["unchanged"] == 50
+
+
+def test_snapshot_diff_between_two_saved_crawls(tmp_path):
+    output_dir = str(tmp_path)
+    previous = make_listings(100, seed=5)
+    save_city_data(iter_rows(previous), "hanoi", output_dir, excel=False)
+    assert snapshot_diff("hanoi", output_dir) is None
+
+    save_city_data(iter_rows(_next_crawl(previous)), "hanoi", output_dir, excel=False)
+    assert snapshot_diff("hanoi", output_dir).counts()[REPRICED] == 5
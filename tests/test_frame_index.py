@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_listings
+from utils.frame_index import Filters, FrameIndex
+
+
+@pytest.fixture(scope="module")
+def df():
+    df = make_listings(2000, seed=7)
+    # Missing prices must sort last either way
+    df.loc[df.index[::50], "price"] = np.nan
+    return df
+
+
+def _pages(index, page_size, **query):
+    frames, page = [], 0
+    while True:
+        frame, total = index.query(page=page, page_size=page_size, **query)
+        if frame.empty:
+            return pd.concat(frames), total
+        frames.append(frame)
+        page += 1
+
+
+@pytest.mark.parametrize("ascending", [True, False])
+def test_pages_concatenate_to_the_sorted_frame(df, ascending):
+    rows, total = _pages(FrameIndex(df), 137, sort_by="price", ascending=ascending)
+    expected = df.sort_values("price", ascending=ascending, na_position="last")
+
+    assert total == len(df)
+    assert sorted(rows["link"]) == sorted(df["link"])
+    assert rows["price"].tolist() == pytest.approx(expected["price"].tolist(), nan_ok=True)
+
+
+def test_filters_match_pandas(df):
+    district = df["area_name"].iloc[0]
+    filters = Filters(
+        equals={"area_name": district},
+        ranges={"area": (40.0, 80.0), "price": (None, 8e9)},
+    )
+    rows, total = _pages(FrameIndex(df), 25, filters=filters, sort_by="area", ascending=False)
+
+    expected = df[
+        (df["area_name"] == district)
+        & df["area"].between(40.0, 80.0)
+        & (df["price"] <= 8e9)
+    ]
+    assert total == len(expected) > 0
+    assert sorted(rows["link"]) == sorted(expected["link"])
+    assert rows["area"].is_monotonic_decreasing
+
+
+def test_unknown_value_and_page_past_the_end(df):
+    index = FrameIndex(df)
+    page, total = index.query(Filters(equals={"area_name": "Không có"}))
+    assert total == 0 and page.empty
+
+    page, total = index.query(page=10_000, page_size=50)
+    assert total == len(df) and page.empty
+    assert index.values_where("ward_name", "area_name", df["area_name"].iloc[0])
@@ -0,0 +1,136 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_listings
+from fetch_data import history
+from fetch_data.history import (
+    MANIFEST,
+    append_history,
+    city_lock,
+    compact_city,
+    crawl_lock,
+    partition_dir,
+    read_history,
+)
+
+
+def _append_parts(output_dir, parts=3, rows=50):
+    df = make_listings(parts * rows, seed=1, days=1)
+    df["crawl_time"] = "2026-01-02 10:00:00"
+    for i in range(parts):
+        append_history(df.iloc[i * rows:(i + 1) * rows], "hanoi", output_dir)
+    return partition_dir(output_dir, "hanoi", "2026-01-02"), len(df)
+
+
+def _parquet_files(path):
+    return sorted(n for n in os.listdir(path) if n.endswith(".parquet") and not n.startswith("_"))
+
+
+def test_compaction_merges_parts_without_changing_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(history.config, "HISTORY_COMPACT_MIN_FILES", 2)
+    path, rows = _append_parts(str(tmp_path))
+
+    assert len(compact_city("hanoi", str(tmp_path))) == 1
+    assert len(_parquet_files(path)) == 1
+    assert not os.path.exists(os.path.join(path, MANIFEST))
+    assert len(read_history(str(tmp_path), city_key="hanoi")) == rows
+
+
+def _crash_after_publish(path):
+    # Merged file published, parts not deleted yet
+    parts = _parquet_files(path)
+    merged = pd.concat(
+        [pd.read_parquet(os.path.join(path, p)) for p in parts], ignore_index=True
+    )
+    merged.to_parquet(os.path.join(path, "compacted-crash.parquet"))
+    with open(os.path.join(path, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"target": "compacted-crash.parquet", "parts": parts}, f)
+    return parts
+
+
+def test_crash_between_publish_and_delete_never_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(history.config, "HISTORY_COMPACT_MIN_FILES", 2)
+    path, rows = _append_parts(str(tmp_path))
+    parts = _crash_after_publish(path)
+
+    # Readers skip the replaced parts
+    assert len(read_history(str(tmp_path), city_key="hanoi")) == rows
+    assert len(read_history(str(tmp_path))) == rows
+
+    # The next compaction finishes the crashed one
+    compact_city("hanoi", str(tmp_path))
+    assert not any(os.path.exists(os.path.join(path, p)) for p in parts)
+    assert not os.path.exists(os.path.join(path, MANIFEST))
+    assert len(read_history(str(tmp_path), city_key="hanoi")) == rows
+
+
+def test_crash_before_publish_rolls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(history.config, "HISTORY_COMPACT_MIN_FILES", 2)
+    path, rows = _append_parts(str(tmp_path))
+    with open(os.path.join(path, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"target": "compacted-never.parquet", "parts": _parquet_files(path)}, f)
+
+    assert len(read_history(str(tmp_path), city_key="hanoi")) == rows
+    compact_city("hanoi", str(tmp_path))
+    assert len(read_history(str(tmp_path), city_key="hanoi")) == rows
+
+
+def _hold_lock(output_dir, exclusive, ready, release):
+    with city_lock(output_dir, "hanoi", exclusive=exclusive):
+        ready.set()
+        release.wait(10)
+
+
+@pytest.mark.parametrize("exclusive", [False, True])
+def test_compaction_skips_while_another_process_holds_the_lock(tmp_path, monkeypatch, exclusive):
+    monkeypatch.setattr(history.config, "HISTORY_COMPACT_MIN_FILES", 2)
+    path, _ = _append_parts(str(tmp_path))
+
+    context = multiprocessing.get_context("spawn")
+    ready, release = context.Event(), context.Event()
+    holder = context.Process(target=_hold_lock, args=(str(tmp_path), exclusive, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(30)
+        assert compact_city("hanoi", str(tmp_path)) == []
+        assert len(_parquet_files(path)) == 3
+    finally:
+        release.set()
+        holder.join(10)
+
+    assert len(compact_city("hanoi", str(tmp_path))) == 1
+
+
+def test_lock_excludes_threads_of_the_same_process(tmp_path):
+    with city_lock(str(tmp_path), "hanoi"):
+        with city_lock(str(tmp_path), "hanoi", exclusive=True, blocking=False) as acquired:
+            assert not acquired
+    with city_lock(str(tmp_path), "hanoi", exclusive=True, blocking=False) as acquired:
+        assert acquired
+
+
+def test_crawls_of_a_city_wait_for_each_other(tmp_path):
+    order = []
+
+    def crawl(name):
+        with crawl_lock(str(tmp_path), "hanoi"):
+            order.append(f"{name} start")
+            time.sleep(0.2)
+            order.append(f"{name} end")
+
+    first = threading.Thread(target=crawl, args=("first",))
+    first.start()
+    time.sleep(0.05)
+    # The crawl lock does not block history reads
+    with city_lock(str(tmp_path), "hanoi", exclusive=True, blocking=False) as acquired:
+        assert acquired
+    crawl("second")
+    first.join()
+
+    assert order == ["first start", "first end", "second start", "second end"]
@@ -0,0 +1,40 @@
+import os
+
+import config
+from utils.instrument import flush, load_runs, metrics_dir, record
+
+
+def _run(output_dir, name, **labels):
+    record(name, 1.0, rows=10, **labels)
+    return flush(output_dir)[0].run_id
+
+
+def test_load_runs_reads_the_newest_runs(tmp_path):
+    output_dir = str(tmp_path)
+    run_ids = [_run(output_dir, "crawl", city="hanoi") for _ in range(30)]
+
+    runs = load_runs(output_dir, last=5)
+    assert runs["run_id"].unique().tolist() == run_ids[::-1][:5]
+
+
+def test_log_is_rotated_and_still_read(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "INSTRUMENT_LOG_MAX_BYTES", 1000)
+    output_dir = str(tmp_path)
+    run_ids = [_run(output_dir, "crawl", city="hanoi") for _ in range(20)]
+
+    directory = metrics_dir(output_dir)
+    assert os.path.getsize(os.path.join(directory, "stages.1.jsonl")) <= 2000
+    assert load_runs(output_dir, last=3)["run_id"].unique().tolist() == run_ids[::-1][:3]
+
+
+def test_flushes_merge_into_one_prometheus_file(tmp_path):
+    output_dir = str(tmp_path)
+    _run(output_dir, "crawl", city="hanoi")
+    _run(output_dir, "job", kind="docx")
+    _run(output_dir, "crawl", city="hcm")
+
+    with open(os.path.join(metrics_dir(output_dir), "pipeline.prom"), encoding="utf-8") as f:
+        text = f.read()
+    assert 'nha_dat_stage_seconds{stage="crawl",city="hanoi"} 1' in text
+    assert 'nha_dat_stage_seconds{stage="crawl",city="hcm"} 1' in text
+    assert 'nha_dat_stage_rows{stage="job",kind="docx"} 10' in text
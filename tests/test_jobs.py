@@ -0,0 +1,102 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import config
+from jobs import worker
+from jobs.store import DONE, QUEUED, RUNNING, JobStore
+
+
+def _store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def _set_heartbeat(store, job_id, heartbeat):
+    with sqlite3.connect(store.path) as db:
+        db.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (heartbeat, job_id))
+
+
+def test_identical_jobs_share_one_queued_job(tmp_path):
+    store = _store(tmp_path)
+    first = store.enqueue("report", city_key="hanoi")
+    assert store.enqueue("report", city_key="hanoi").id == first.id
+    assert store.enqueue("report", city_key="hcm").id != first.id
+
+
+def test_claim_takes_the_oldest_job_once(tmp_path):
+    store = _store(tmp_path)
+    first = store.enqueue("report", city_key="hanoi")
+    second = store.enqueue("report", city_key="hcm")
+
+    assert store.claim(1).id == first.id
+    assert store.claim(2).id == second.id
+    assert store.claim(3) is None
+    assert store.get(first.id).status == RUNNING
+
+
+def test_stale_job_is_requeued(tmp_path):
+    store = _store(tmp_path)
+    job = store.enqueue("report", city_key="hanoi")
+    store.claim(1)
+
+    _set_heartbeat(store, job.id, time.time() - config.JOB_STALE_SECONDS - 1)
+    assert store.claim(2).id == job.id
+    # The first worker lost it
+    assert not store.heartbeat(job.id, 1)
+    assert store.heartbeat(job.id, 2)
+
+
+def test_running_job_is_kept_alive_by_the_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", 0.3)
+    monkeypatch.setattr(config, "JOB_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(config, "OUTPUT_DIR", str(tmp_path))
+    store = _store(tmp_path)
+    claims = []
+
+    def slow(job, store):
+        # Longer than JOB_STALE_SECONDS without reporting progress
+        time.sleep(0.6)
+        claims.append(store.claim(-1))
+        return "ok"
+
+    monkeypatch.setitem(worker.HANDLERS, "slow", slow)
+    job = store.enqueue("slow")
+    worker.run_worker(store, once=True)
+
+    assert claims == [None]
+    finished = store.get(job.id)
+    assert finished.status == DONE
+    assert finished.result == "ok"
+    assert store.claim(1) is None
+    assert QUEUED not in [j.status for j in store.recent()]
+
+
+def test_worker_drops_the_outcome_of_a_job_taken_over(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "JOB_STALE_SECONDS", 0.1)
+    monkeypatch.setattr(config, "JOB_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(config, "OUTPUT_DIR", str(tmp_path))
+    store = _store(tmp_path)
+
+    def taken_over(job, store):
+        # Another worker requeues it as stale and finishes it meanwhile
+        _set_heartbeat(store, job.id, time.time() - 1)
+        assert store.claim(-1).id == job.id
+        store.finish(job.id, result="other", worker_pid=-1)
+        time.sleep(0.2)
+        return "first"
+
+    monkeypatch.setitem(worker.HANDLERS, "taken_over", taken_over)
+    job = store.enqueue("taken_over")
+    worker.run_worker(store, once=True)
+
+    assert store.get(job.id).result == "other"
+
+
+def test_dead_child_worker_is_not_alive():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    # Exited but not reaped yet: a zombie
+    time.sleep(0.5)
+    assert not worker._alive(process.pid)
+    assert worker._alive(os.getpid())
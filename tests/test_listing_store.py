@@ -0,0 +1,39 @@
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import make_listings
+from fetch_data.listing_store import ListingStore
+from utils.schema import to_list_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ListingStore(str(tmp_path / "listings.db"))
+    store.upsert(make_listings(200, seed=4), "hanoi")
+    return store
+
+
+def test_query_by_more_list_ids_than_sqlite_binds(store):
+    list_ids = to_list_id(make_listings(200, seed=4)["link"]).tolist()
+    # Unknown ids past SQLite's bound-parameter limit
+    wanted = list_ids[:50] + list(range(1, 40_000))
+
+    df = store.query(list_ids=wanted, columns=["list_id", "price"])
+    assert sorted(df["list_id"].tolist()) == sorted(list_ids[:50])
+    assert list(df.columns) == ["list_id", "price"]
+
+
+def test_query_rejects_unknown_columns(store):
+    with pytest.raises(ValueError, match="Unknown listing columns"):
+        store.query(columns=["price", "price FROM listings; DROP TABLE listings --"])
+    assert len(store.query(columns=["price", "link"])) == 200
+
+
+def test_listings_without_a_crawl_time_are_skipped(tmp_path):
+    store = ListingStore(str(tmp_path / "listings.db"))
+    df = make_listings(3, seed=5)
+    df["crawl_time"] = [pd.Timestamp("2026-01-02 10:00:00"), pd.NaT, None]
+
+    assert store.upsert(df, "hanoi") == 1
+    stored = store.query(columns=["list_id", "crawl_time"])
+    assert stored["crawl_time"].tolist() == ["2026-01-02 10:00:00"]
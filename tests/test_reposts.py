@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+from analytics.reposts import (
+    RepostIndex,
+    load_repost_index,
+    save_repost_index,
+    shards_dir,
+)
+
+
+def _listings(ids, titles, price=5000.0, area=50.0, district="Quận 1"):
+    return pd.DataFrame({
+        "list_id": pd.array(ids, dtype="Int64"),
+        "title": titles,
+        "area_name": district,
+        "price": price,
+        "area": area,
+    })
+
+
+TITLE = "Bán nhà mặt phố Hoàng Cầu 50m2 4 tầng sổ đỏ chính chủ"
+
+
+def test_repost_found_after_reload(tmp_path):
+    output_dir = str(tmp_path)
+    index = RepostIndex()
+    index.add(_listings([1, 2], [TITLE, "Căn hộ chung cư 2 phòng ngủ view hồ"]))
+    save_repost_index(index, "hanoi", output_dir)
+
+    index = load_repost_index("hanoi", output_dir)
+    # Same title in another district is not a repost
+    originals = index.add(_listings([3, 4], [TITLE + "!", TITLE], district=["Quận 1", "Quận 2"]))
+
+    assert originals.isna().tolist() == [False, True]
+    assert originals[0] == 1
+    assert index.reposts == {3: 1}
+
+
+def test_save_appends_a_shard_per_crawl(tmp_path):
+    output_dir = str(tmp_path)
+    index = RepostIndex()
+    index.add(_listings([1], [TITLE]))
+    save_repost_index(index, "hanoi", output_dir)
+
+    index = load_repost_index("hanoi", output_dir)
+    index.add(_listings([2], [TITLE + "."]))
+    save_repost_index(index, "hanoi", output_dir)
+
+    shards = os.listdir(shards_dir("hanoi", output_dir))
+    assert len(shards) == 2
+    sizes = sorted(len(np.load(os.path.join(shards_dir("hanoi", output_dir), s))["list_ids"]) for s in shards)
+    assert sizes == [1, 1]
+
+    index = load_repost_index("hanoi", output_dir)
+    assert index.list_ids == [1, 2]
+    assert index.reposts == {2: 1}
+
+
+def test_shards_merged_past_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REPOST_MAX_SHARDS", 2)
+    output_dir = str(tmp_path)
+    for list_id in range(1, 5):
+        index = load_repost_index("hanoi", output_dir)
+        index.add(_listings([list_id], [f"{TITLE} lô {list_id * 7919}"], price=1000.0 * list_id))
+        save_repost_index(index, "hanoi", output_dir)
+
+    assert len(os.listdir(shards_dir("hanoi", output_dir))) <= 2
+    assert load_repost_index("hanoi", output_dir).list_ids == [1, 2, 3, 4]
+
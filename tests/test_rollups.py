@@ -0,0 +1,52 @@
+import pandas as pd
+
+from analytics.cube import ALL
+from analytics.rollups import count_new_listings, load_rollups, update_daily_rollups
+from analytics.trends import rollup_trend
+from benchmarks.synthetic import make_listings
+from fetch_data.history import append_history
+
+
+def _crawl(output_dir, df, crawl_time, full):
+    df = df.assign(crawl_time=crawl_time)
+    append_history(df, "hanoi", output_dir)
+    return update_daily_rollups(
+        "hanoi", output_dir, [count_new_listings(df)], [crawl_time], full=full
+    )
+
+
+def _city(rollups, date):
+    return rollups[(rollups["district"] == ALL) & (rollups["date"] == pd.Timestamp(date))].iloc[0]
+
+
+def test_incremental_day_does_not_collapse_active_listings(tmp_path):
+    output_dir = str(tmp_path)
+    market = make_listings(500, seed=1)
+
+    _crawl(output_dir, market, "2026-01-01 08:00:00", full=True)
+    # Next day: an incremental crawl stores only 20 repriced listings
+    rollups = _crawl(output_dir, market.head(20), "2026-01-02 08:00:00", full=False)
+
+    assert _city(rollups, "2026-01-01")["active_listings"] == 500
+    assert bool(_city(rollups, "2026-01-01")["full_crawl"])
+    incremental = _city(rollups, "2026-01-02")
+    assert pd.isna(incremental["active_listings"])
+    assert not incremental["full_crawl"]
+
+    trend = rollup_trend(load_rollups("hanoi", output_dir), days=2)
+    assert trend["active_listings"].tolist() == [500, 500]
+
+
+def test_later_crawls_on_a_full_crawl_day_add_to_it(tmp_path):
+    output_dir = str(tmp_path)
+    market = make_listings(300, seed=2)
+    extra = make_listings(30, seed=3)
+    extra["link"] = extra["link"] + "0"
+
+    _crawl(output_dir, market, "2026-01-01 08:00:00", full=True)
+    rollups = _crawl(output_dir, extra, "2026-01-01 20:00:00", full=False)
+
+    day = _city(rollups, "2026-01-01")
+    assert day["active_listings"] == 330
+    assert day["new_listings"] == 330
+    assert bool(day["full_crawl"])
@@ -0,0 +1,115 @@
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+# Rows converted to Python objects at a time while streaming a frame
+CHUNK_ROWS = 50_000
+
+
+# =====================================================
+# Column widths (vectorized)
+# =====================================================
+def auto_column_widths(df: pd.DataFrame, max_width: int = 40) -> List[float]:
+    """
+    Width per column from the longest rendered value or header, capped.
+    """
+    widths = []
+    for col in df.columns:
+        values = df[col].dropna()
+        longest = values.astype(str).str.len().max() if len(values) else 0
+        widths.append(min(max(longest, len(str(col))) + 2, max_width))
+    return widths
+
+
+# =====================================================
+# Write-only sheets
+# =====================================================
+def open_sheet(
+    workbook: Workbook,
+    sheet_name: str,
+    columns: List[str],
+    widths: List[float],
+) -> WriteOnlyWorksheet:
+    """
+    Create a write-only sheet with frozen, centered header and widths.
+
+    Widths and freeze panes are written with the first row, so they
+    must be known before any data is appended.
+    """
+    ws = workbook.create_sheet(sheet_name)
+
+    # Freeze header
+    ws.freeze_panes = "A2"
+
+    for idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(idx)].width = width
+
+    # Center header row
+    header = []
+    for col in columns:
+        cell = WriteOnlyCell(ws, value=str(col))
+        cell.alignment = Alignment(horizontal="center")
+        header.append(cell)
+    ws.append(header)
+
+    return ws
+
+
+def append_rows(ws: WriteOnlyWorksheet, df: pd.DataFrame) -> None:
+    """
+    Stream a frame into a write-only sheet, chunk by chunk (NaN -> empty).
+    """
+    for start in range(0, len(df), CHUNK_ROWS):
+        chunk = df.iloc[start:start + CHUNK_ROWS].astype(object)
+        chunk = chunk.where(chunk.notna(), None)
+        for row in chunk.itertuples(index=False, name=None):
+            ws.append(row)
+
+
+def close_sheet(ws: WriteOnlyWorksheet, n_columns: int, n_rows: int) -> None:
+    """
+    Enable filters over the header and n_rows data rows.
+    """
+    ws.auto_filter.ref = f"A1:{get_column_letter(max(n_columns, 1))}{n_rows + 1}"
+
+
+def save_workbook(workbook: Workbook, path: str) -> None:
+    """
+    Save through a temp file so readers never see a partial workbook.
+    """
+    tmp_path = os.path.join(os.path.dirname(path), f"~{os.path.basename(path)}")
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def write_excel(
+    sheets: Dict[str, pd.DataFrame],
+    path: str,
+    widths: Optional[Dict[str, float]] = None,
+    max_width: int = 40,
+) -> None:
+    """
+    Write several frames to one workbook in write-only (streaming) mode.
+
+    Column widths come from `widths` (by column name) when given,
+    otherwise from the data.
+    """
+    workbook = Workbook(write_only=True)
+
+    for sheet_name, df in sheets.items():
+        if widths is None:
+            sheet_widths = auto_column_widths(df, max_width)
+        else:
+            sheet_widths = [widths.get(col, 18) for col in df.columns]
+
+        ws = open_sheet(workbook, sheet_name, list(df.columns), sheet_widths)
+        append_rows(ws, df)
+        close_sheet(ws, len(df.columns), len(df))
+
+    save_workbook(workbook, path)
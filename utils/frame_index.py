@@ -0,0 +1,217 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# =====================================================
+# FRAME INDEX (server-side paging / sorting / filtering)
+#
+# Built once per snapshot and shared by every rerun:
+#   sort orders   argsort per column (NaN last), plus rank arrays, so a
+#                 page of the full table is a slice and a filtered set
+#                 is ordered by its ranks alone
+#   value index   per categorical column, row positions grouped by
+#                 value (CSR: one argsort of the codes + offsets)
+#   range index   a numeric column's sort order + searchsorted bounds
+#
+# A query starts from the smallest candidate set any filter yields and
+# checks the other filters on those rows only; just the requested page
+# is gathered into a DataFrame.
+# =====================================================
+
+
+@dataclass
+class Filters:
+    """
+    Equality filters on categorical columns and inclusive (low, high)
+    ranges on numeric columns; None leaves a column unfiltered.
+    """
+    equals: Dict[str, Optional[str]] = field(default_factory=dict)
+    ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = field(default_factory=dict)
+
+
+class FrameIndex:
+    """
+    Precomputed sort orders and per-column indexes of a frame.
+
+    Orders and indexes are built lazily on first use of a column and
+    then kept for the life of the index.
+    """
+
+    def __init__(self, df: pd.DataFrame) -> None:
+        self.df = df
+        self._orders: Dict[str, np.ndarray] = {}
+        self._ranks: Dict[str, np.ndarray] = {}
+        self._valid: Dict[str, int] = {}
+        self._sorted: Dict[str, np.ndarray] = {}
+        self._groups: Dict[str, Tuple[np.ndarray, np.ndarray, Dict[str, int], np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    # ----------------------
+    # Sort orders
+    # ----------------------
+    def _values(self, column: str) -> np.ndarray:
+        series = self.df[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            values = series.to_numpy(dtype="datetime64[ns]").astype("int64").astype(float)
+            values[series.isna().to_numpy()] = np.nan
+            return values
+        if isinstance(series.dtype, pd.CategoricalDtype) or not pd.api.types.is_numeric_dtype(series):
+            # Lexical order of the labels, missing last
+            codes, _ = pd.factorize(series.astype("string"), sort=True)
+            return np.where(codes >= 0, codes, np.nan).astype(float)
+        return pd.to_numeric(series, errors="coerce").to_numpy(dtype=float)
+
+    def order(self, column: str) -> np.ndarray:
+        """
+        Row positions sorted ascending by column, NaN last.
+        """
+        if column not in self._orders:
+            values = self._values(column)
+            order = np.argsort(values, kind="stable")
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+
+            self._orders[column] = order
+            self._ranks[column] = rank
+            self._valid[column] = int((~np.isnan(values)).sum())
+            self._sorted[column] = values[order[:self._valid[column]]]
+        return self._orders[column]
+
+    def bounds(self, column: str) -> Tuple[float, float]:
+        """
+        Smallest and largest value of a numeric column (NaN if empty).
+        """
+        self.order(column)
+        values = self._sorted[column]
+        if not len(values):
+            return np.nan, np.nan
+        return float(values[0]), float(values[-1])
+
+    # ----------------------
+    # Value index
+    # ----------------------
+    def _group_index(self, column: str):
+        if column not in self._groups:
+            codes, labels = pd.factorize(self.df[column].astype("string"), sort=True)
+            order = np.argsort(codes, kind="stable")
+            counts = np.bincount(codes[codes >= 0], minlength=len(labels))
+            start = int((codes < 0).sum())  # missing values sort first
+            offsets = start + np.concatenate(([0], np.cumsum(counts)))
+            lookup = {str(label): i for i, label in enumerate(labels)}
+            self._groups[column] = (order, offsets, lookup, codes)
+        return self._groups[column]
+
+    def values(self, column: str) -> List[str]:
+        """
+        Distinct non-missing values of a categorical column, sorted.
+        """
+        return list(self._group_index(column)[2])
+
+    def values_where(self, column: str, by: str, value: str) -> List[str]:
+        """
+        Distinct values of column among the rows where by == value
+        (e.g. the wards of one district), sorted.
+        """
+        _, _, lookup, codes = self._group_index(column)
+        labels = np.array(list(lookup), dtype=object)
+        present = np.unique(codes[self.rows_equal(by, value)])
+        return labels[present[present >= 0]].tolist()
+
+    def rows_equal(self, column: str, value: str) -> np.ndarray:
+        order, offsets, lookup, _ = self._group_index(column)
+        code = lookup.get(value)
+        if code is None:
+            return np.empty(0, dtype=np.int64)
+        return order[offsets[code]:offsets[code + 1]]
+
+    def _rank_bounds(self, column: str, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """
+        Ranks [lo, hi) of the values within inclusive [low, high].
+        """
+        self.order(column)
+        values = self._sorted[column]
+        lo = 0 if low is None else int(np.searchsorted(values, low, side="left"))
+        hi = len(values) if high is None else int(np.searchsorted(values, high, side="right"))
+        return lo, hi
+
+    def rows_between(self, column: str, low: Optional[float], high: Optional[float]) -> np.ndarray:
+        lo, hi = self._rank_bounds(column, low, high)
+        return self.order(column)[lo:hi]
+
+    # ----------------------
+    # Query
+    # ----------------------
+    def _candidates(self, filters: Filters) -> Optional[np.ndarray]:
+        """
+        Row positions passing every filter (None: no filter, all rows).
+        """
+        equals = {c: v for c, v in filters.equals.items() if v is not None}
+        ranges = {
+            c: (low, high) for c, (low, high) in filters.ranges.items()
+            if low is not None or high is not None
+        }
+        if not equals and not ranges:
+            return None
+
+        # Drive from the smallest candidate set
+        sets = [("eq", c, self.rows_equal(c, v)) for c, v in equals.items()]
+        sets += [("range", c, self.rows_between(c, *r)) for c, r in ranges.items()]
+        kind, driver_column, rows = min(sets, key=lambda s: len(s[2]))
+
+        keep = np.ones(len(rows), dtype=bool)
+        for column, value in equals.items():
+            if kind == "eq" and column == driver_column:
+                continue
+            _, _, lookup, codes = self._group_index(column)
+            keep &= codes[rows] == lookup.get(value, -2)
+        for column, (low, high) in ranges.items():
+            if kind == "range" and column == driver_column:
+                continue
+            # Range test through ranks: rank bounds of [low, high]
+            lo, hi = self._rank_bounds(column, low, high)
+            rank = self._ranks[column][rows]
+            keep &= (rank >= lo) & (rank < hi)
+
+        return rows[keep]
+
+    def query(
+        self,
+        filters: Optional[Filters] = None,
+        sort_by: Optional[str] = None,
+        ascending: bool = True,
+        page: int = 0,
+        page_size: int = 50,
+    ) -> Tuple[pd.DataFrame, int]:
+        """
+        One page of the filtered, sorted frame and the number of
+        matching rows.
+        """
+        rows = self._candidates(filters or Filters())
+        total = len(self.df) if rows is None else len(rows)
+        valid = total
+
+        if sort_by is not None:
+            order = self.order(sort_by)
+            if rows is None:
+                rows = order
+                valid = self._valid[sort_by]
+            else:
+                ranks = self._ranks[sort_by][rows]
+                rows = rows[np.argsort(ranks, kind="stable")]
+                valid = int((ranks < self._valid[sort_by]).sum())
+        elif rows is None:
+            rows = np.arange(len(self.df))
+        else:
+            rows = np.sort(rows)
+
+        # Positions of the page in the ordered rows; descending reads the
+        # sorted part backwards and keeps missing values last
+        positions = np.arange(max(page, 0) * page_size, min((max(page, 0) + 1) * page_size, total))
+        if sort_by is not None and not ascending:
+            positions = np.where(positions < valid, valid - 1 - positions, positions)
+
+        return self.df.iloc[rows[positions]], total
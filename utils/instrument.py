@@ -0,0 +1,353 @@
+import fcntl
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, UTC
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+
+# =====================================================
+# PER-STAGE INSTRUMENTATION
+#
+#   with stage("csv_write", city="hanoi") as s:
+#       ...
+#       s.rows += len(df)
+#       s.bytes += written
+#
+# Records accumulate for the current run and are written by flush() as
+# JSON lines (output/metrics/stages.jsonl, one line per stage call,
+# rotated to stages.1.jsonl past config.INSTRUMENT_LOG_MAX_BYTES) and
+# as a Prometheus text-format file of per-stage totals
+# (output/metrics/pipeline.prom, for a node_exporter textfile
+# collector). Crawl processes, job workers and the CLI all flush there:
+# the totals of each (stage, labels) series are merged into
+# pipeline.json under a file lock, so a flush only replaces the series
+# its run recorded.
+#
+# Peak memory is the process high-water RSS unless
+# config.INSTRUMENT_TRACE_MEMORY enables tracemalloc, which gives true
+# per-stage peaks at a sizeable allocation overhead (and mixes stages
+# that run at the same time in other threads).
+# =====================================================
+METRIC_PREFIX = "nha_dat_stage"
+
+_READ_BLOCK = 1 << 16  # bytes read at a time from the end of stages.jsonl
+
+
+@dataclass
+class StageRecord:
+    stage: str
+    labels: Dict[str, str] = field(default_factory=dict)
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    peak_memory: int = 0
+    started_at: str = ""
+    run_id: str = ""
+
+
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+_RECORDS: List[StageRecord] = []
+_RUN_ID = uuid.uuid4().hex[:12]
+
+
+def _active() -> List[StageRecord]:
+    if not hasattr(_LOCAL, "stack"):
+        _LOCAL.stack = []
+    return _LOCAL.stack
+
+
+def _max_rss() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _tracing() -> bool:
+    if config.INSTRUMENT_TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc.is_tracing()
+
+
+@contextmanager
+def stage(name: str, **labels: Any) -> Iterator[StageRecord]:
+    """
+    Time a block as one call of a stage; the yielded record takes rows
+    and bytes.
+    """
+    record = StageRecord(
+        stage=name,
+        labels={k: str(v) for k, v in labels.items()},
+        started_at=datetime.now(UTC).isoformat(timespec="milliseconds"),
+    )
+    stack = _active()
+    tracing = _tracing()
+    if tracing:
+        # Keep the enclosing stage's peak before resetting it for ours
+        if stack:
+            stack[-1].peak_memory = max(stack[-1].peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    stack.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - start
+        stack.pop()
+
+        if tracing:
+            record.peak_memory = max(record.peak_memory, tracemalloc.get_traced_memory()[1])
+            if stack:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, record.peak_memory)
+        else:
+            record.peak_memory = _max_rss()
+
+        with _LOCK:
+            _RECORDS.append(record)
+
+
+def record(name: str, seconds: float, rows: int = 0, nbytes: int = 0, **labels: Any) -> None:
+    """
+    Record a stage call timed elsewhere (e.g. accumulated over a loop).
+    """
+    with _LOCK:
+        _RECORDS.append(StageRecord(
+            stage=name,
+            labels={k: str(v) for k, v in labels.items()},
+            seconds=seconds,
+            rows=rows,
+            bytes=nbytes,
+            peak_memory=_max_rss(),
+            started_at=datetime.now(UTC).isoformat(timespec="milliseconds"),
+        ))
+
+
+def add_bytes(nbytes: int) -> None:
+    """
+    Add bytes to the innermost active stage of this thread, if any.
+    """
+    stack = _active()
+    if stack:
+        stack[-1].bytes += nbytes
+
+
+def file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+# =====================================================
+# SINKS
+# =====================================================
+def metrics_dir(output_dir: str) -> str:
+    return os.path.join(output_dir, "metrics")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _series(stage_name: str, labels: Dict[str, str]) -> str:
+    return json.dumps([stage_name, sorted(labels.items())], ensure_ascii=False)
+
+
+def _totals(records: List[StageRecord]) -> Dict[str, Dict[str, float]]:
+    """
+    Totals of records per (stage, labels) series, keyed by _series.
+    """
+    totals: Dict[str, Dict[str, float]] = {}
+    now = time.time()
+    for r in records:
+        total = totals.setdefault(
+            _series(r.stage, r.labels),
+            {"seconds": 0.0, "rows": 0, "bytes": 0, "peak_memory": 0, "calls": 0, "updated": now},
+        )
+        total["seconds"] += r.seconds
+        total["rows"] += r.rows
+        total["bytes"] += r.bytes
+        total["peak_memory"] = max(total["peak_memory"], r.peak_memory)
+        total["calls"] += 1
+    return totals
+
+
+def to_prometheus(totals: Dict[str, Dict[str, float]]) -> str:
+    """
+    Per-series stage totals (see _totals) in Prometheus text exposition
+    format.
+    """
+    metrics = [
+        ("seconds", "Wall time spent in the stage during its last run"),
+        ("rows", "Rows processed by the stage during its last run"),
+        ("bytes", "Bytes read or written by the stage during its last run"),
+        ("peak_memory", "Peak memory (bytes) observed during the stage"),
+        ("calls", "Calls of the stage during its last run"),
+        ("updated", "End of the last run that recorded the stage"),
+    ]
+    series = sorted((json.loads(key), total) for key, total in totals.items())
+
+    lines = []
+    for metric, help_text in metrics:
+        name = f"{METRIC_PREFIX}_{metric}" + {
+            "peak_memory": "_bytes", "updated": "_timestamp_seconds"
+        }.get(metric, "")
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for (stage_name, labels), total in series:
+            label_text = ",".join(
+                f'{k}="{_escape(v)}"' for k, v in (("stage", stage_name), *labels)
+            )
+            lines.append(f"{name}{{{label_text}}} {total[metric]:g}")
+
+    lines.append(f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds End of the last run")
+    lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+    lines.append(f"{METRIC_PREFIX}_last_run_timestamp_seconds {time.time():.0f}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def _append_log(directory: str, records: List[StageRecord]) -> None:
+    path = os.path.join(directory, "stages.jsonl")
+    # One write per run, so runs of concurrent processes do not interleave
+    text = "".join(json.dumps(asdict(r), ensure_ascii=False) + "\n" for r in records)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+        size = f.tell()
+    if size > config.INSTRUMENT_LOG_MAX_BYTES:
+        os.replace(path, os.path.join(directory, "stages.1.jsonl"))
+
+
+def _merge_totals(directory: str, records: List[StageRecord]) -> None:
+    state_path = os.path.join(directory, "pipeline.json")
+    totals = {}
+    if os.path.exists(state_path):
+        with open(state_path, encoding="utf-8") as f:
+            totals = json.load(f)
+    totals.update(_totals(records))
+
+    _write_atomic(state_path, json.dumps(totals, ensure_ascii=False))
+    _write_atomic(os.path.join(directory, "pipeline.prom"), to_prometheus(totals))
+
+
+def flush(output_dir: Optional[str] = None) -> List[StageRecord]:
+    """
+    Write the records of the current run (JSON lines + Prometheus file)
+    and start a new run. Returns the flushed records.
+    """
+    global _RUN_ID
+    output_dir = output_dir or config.OUTPUT_DIR
+
+    with _LOCK:
+        records = list(_RECORDS)
+        _RECORDS.clear()
+        run_id, _RUN_ID = _RUN_ID, uuid.uuid4().hex[:12]
+
+    if not records:
+        return records
+
+    for r in records:
+        r.run_id = run_id
+
+    directory = metrics_dir(output_dir)
+    os.makedirs(directory, exist_ok=True)
+
+    # Serializes flushes of every process sharing the output directory
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        _append_log(directory, records)
+        _merge_totals(directory, records)
+
+    return records
+
+
+def _tail_lines(path: str) -> Iterator[str]:
+    """
+    Lines of a file, last first, read backwards in blocks.
+    """
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        rest = b""
+        while position > 0:
+            size = min(_READ_BLOCK, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + rest).split(b"\n")
+            # The first piece may be cut: kept for the next block
+            rest = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+        if rest.strip():
+            yield rest.decode("utf-8")
+
+
+def load_runs(output_dir: Optional[str] = None, last: int = 10) -> pd.DataFrame:
+    """
+    Stage records of the `last` flushed runs (newest run first). Only
+    the end of the log is read.
+    """
+    directory = metrics_dir(output_dir or config.OUTPUT_DIR)
+    paths = [
+        path for path in (
+            os.path.join(directory, "stages.jsonl"),
+            os.path.join(directory, "stages.1.jsonl"),
+        )
+        if os.path.exists(path)
+    ]
+
+    # Every run is one contiguous block of lines
+    runs: Dict[str, List[Dict[str, Any]]] = {}
+    for line in (line for path in paths for line in _tail_lines(path)):
+        entry = json.loads(line)
+        if entry["run_id"] not in runs and len(runs) == last:
+            break
+        runs.setdefault(entry["run_id"], []).append(entry)
+
+    if not runs:
+        return pd.DataFrame(columns=[*StageRecord.__dataclass_fields__])
+    return pd.DataFrame([
+        entry for entries in runs.values() for entry in reversed(entries)
+    ])
+
+
+def stage_breakdown(records: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-stage totals (summed over calls) of stage records, slowest first.
+    """
+    df = records.assign(
+        labels=records["labels"].map(
+            lambda labels: ", ".join(f"{k}={v}" for k, v in sorted(labels.items()))
+        )
+    )
+    return (
+        df.groupby(["stage", "labels"], sort=False)
+        .agg(
+            seconds=("seconds", "sum"),
+            rows=("rows", "sum"),
+            bytes=("bytes", "sum"),
+            peak_memory=("peak_memory", "max"),
+            calls=("stage", "size"),
+        )
+        .reset_index()
+        .sort_values("seconds", ascending=False)
+        .reset_index(drop=True)
+    )
@@ -1,9 +1,74 @@
+import os
+from typing import Iterable, List, Optional
+
 import pandas as pd
+import pyarrow as pa
+
+import config
+from fetch_data.history import read_history
+from fetch_data.listing_store import ListingStore, listings_db_path
+from utils.schema import compact_frame, table_to_frame
+
+
+def load_data(
+    path: Optional[str] = None,
+    city_key: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    output_dir: str = config.OUTPUT_DIR,
+    area_name: Optional[str] = None,
+    ward_name: Optional[str] = None,
+    list_ids: Optional[Iterable[int]] = None,
+) -> pd.DataFrame:
+    """
+    Load listings from a snapshot CSV (path) or from the Parquet
+    history (city_key, inclusive start/end dates, projected columns).
+
+    With an area_name, ward_name or list_ids filter, the latest state
+    of the matching listings is read from the SQLite listing store
+    instead (indexed lookups; start/end then bound the last crawl time).
 
-def load_data(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    Always returns the compact schema (utils.schema): categorical
+    location columns, float32 area / price per m2 and an integer
+    list_id in place of link.
+    """
+    if path is not None:
+        csv_columns = None
+        if columns is not None:
+            csv_columns = ["link" if c == "list_id" else c for c in columns]
+        df = pd.read_csv(path, usecols=csv_columns)
 
-    df["crawl_time"] = pd.to_datetime(df["crawl_time"], errors="coerce")
+        # Incremental crawls append repriced rows: keep latest per listing
+        if "link" in df.columns:
+            df = df.drop_duplicates(subset=["link"], keep="last")
+
+        df = compact_frame(df)
+    elif area_name is not None or ward_name is not None or list_ids is not None:
+        if columns is not None:
+            columns = ["list_id" if c == "link" else c for c in columns]
+        df = ListingStore(listings_db_path(output_dir)).query(
+            city_key=city_key,
+            area_name=area_name,
+            ward_name=ward_name,
+            list_ids=list_ids,
+            start=start,
+            end=end,
+            columns=columns,
+        )
+    else:
+        if columns is not None:
+            columns = ["list_id" if c == "link" else c for c in columns]
+        df = read_history(
+            output_dir,
+            city_key=city_key,
+            start=start,
+            end=end,
+            columns=columns,
+        )
+
+    if "crawl_time" in df.columns:
+        df["crawl_time"] = pd.to_datetime(df["crawl_time"], errors="coerce")
 
     numeric_cols = [
         "price",
@@ -12,8 +77,48 @@ def load_data(path: str) -> pd.DataFrame:
     ]
 
     for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    df = df.dropna(subset=["price", "area"])
+    df = df.dropna(subset=[c for c in ["price", "area"] if c in df.columns])
 
     return df
+
+
+def snapshot_version(path: str) -> Optional[str]:
+    """
+    Cheap data version of a snapshot file (None if it does not exist).
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+def load_snapshot(path: str) -> pa.Table:
+    """
+    Memory-map an Arrow IPC snapshot written by save_city_data (zero-copy).
+
+    Convert with utils.schema.table_to_frame.
+    """
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def snapshot_path(city_key: str, output_dir: str) -> str:
+    return os.path.join(output_dir, f"{city_key}.arrow")
+
+
+def previous_snapshot_path(city_key: str, output_dir: str) -> str:
+    """
+    Snapshot of the crawl before the latest one (kept by save_city_data).
+    """
+    return os.path.join(output_dir, f"{city_key}.prev.arrow")
+
+
+def load_previous_snapshot(city_key: str, output_dir: str) -> Optional[pd.DataFrame]:
+    path = previous_snapshot_path(city_key, output_dir)
+    if not os.path.exists(path):
+        return None
+    return table_to_frame(load_snapshot(path))
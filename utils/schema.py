@@ -0,0 +1,185 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# =====================================================
+# CANONICAL COMPACT LISTING SCHEMA
+#
+# - low-cardinality location / identity strings -> categorical
+#   (Arrow dictionary)
+# - link -> integer list_id (the link is a fixed prefix + list_id and
+#   is rebuilt on demand with to_link / with_links)
+# - area, price_million_per_m2 -> float32 (price stays float64: VND
+#   amounts exceed float32 precision)
+# =====================================================
+LINK_PREFIX = "https://www.nhatot.com/"
+
+CATEGORY_COLUMNS = ["city", "category", "category_code", "ward_name", "area_name"]
+FLOAT32_COLUMNS = ["price_million_per_m2", "area"]
+
+_DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+
+COMPACT_SCHEMA = pa.schema([
+    ("city", _DICTIONARY),
+    ("category", _DICTIONARY),
+    ("category_code", _DICTIONARY),
+    ("title", pa.string()),
+    ("price_string", pa.string()),
+    ("price", pa.float64()),
+    ("price_million_per_m2", pa.float32()),
+    ("area", pa.float32()),
+    ("ward_name", _DICTIONARY),
+    ("area_name", _DICTIONARY),
+    ("crawl_time", pa.timestamp("s")),
+    ("list_id", pa.int64()),
+])
+
+
+# =====================================================
+# LINK <-> LIST_ID
+# =====================================================
+def to_list_id(links: pd.Series) -> pd.Series:
+    """
+    Integer list_id from listing links (<NA> when not a listing link).
+    """
+    ids = links.astype("string").str.removeprefix(LINK_PREFIX)
+    return pd.to_numeric(ids, errors="coerce").astype("Int64")
+
+
+def to_link(list_ids: pd.Series) -> pd.Series:
+    """
+    Rebuild listing links from list_ids.
+    """
+    return LINK_PREFIX + list_ids.astype("Int64").astype("string")
+
+
+def with_links(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Frame with a `link` column, rebuilt from list_id if needed.
+    """
+    if "link" in df.columns or "list_id" not in df.columns:
+        return df
+    return df.assign(link=to_link(df["list_id"]))
+
+
+def key_column(df: pd.DataFrame) -> str:
+    """
+    Listing key of a frame: `link` (export schema) or `list_id` (compact).
+    """
+    return "link" if "link" in df.columns else "list_id"
+
+
+# =====================================================
+# PANDAS
+# =====================================================
+def category_values(series: pd.Series) -> pd.Series:
+    """
+    Strings of a categorical column; empty strings count as missing,
+    as they do once a CSV / Excel export is read back.
+    """
+    values = series.astype("string")
+    return values.mask(values == "")
+
+
+def compact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert a listing frame (export schema) to the compact schema.
+    """
+    df = df.copy()
+
+    if "link" in df.columns:
+        df["list_id"] = to_list_id(df.pop("link"))
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = category_values(df[col]).astype("category")
+
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float32")
+
+    return df
+
+
+def table_to_frame(table: pa.Table) -> pd.DataFrame:
+    """
+    Arrow table in the compact schema → pandas, keeping nullable list_id.
+    """
+    return table.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+# =====================================================
+# ARROW
+# =====================================================
+class DictionaryEncoder:
+    """
+    Dictionary that only grows, so successive batches can be written as
+    dictionary deltas to a single Arrow IPC file.
+    """
+
+    def __init__(self) -> None:
+        self.values: List[str] = []
+        self.positions: Dict[str, int] = {}
+
+    def encode(self, series: pd.Series) -> pa.DictionaryArray:
+        codes, uniques = pd.factorize(category_values(series))
+
+        ids = np.empty(len(uniques), dtype=np.int32)
+        for i, value in enumerate(uniques):
+            if value not in self.positions:
+                self.positions[value] = len(self.values)
+                self.values.append(value)
+            ids[i] = self.positions[value]
+
+        present = codes >= 0
+        indices = np.zeros(len(codes), dtype=np.int32)
+        indices[present] = ids[codes[present]]
+
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, type=pa.int32(), mask=~present),
+            pa.array(self.values, type=pa.string()),
+        )
+
+
+def to_compact_table(
+    df: pd.DataFrame,
+    encoders: Optional[Dict[str, DictionaryEncoder]] = None,
+) -> pa.Table:
+    """
+    Convert a listing frame (export or compact schema) to COMPACT_SCHEMA.
+
+    Pass the same `encoders` for every batch of one output file.
+    """
+    encoders = encoders if encoders is not None else {}
+
+    if "list_id" in df.columns:
+        list_id = df["list_id"].astype("Int64")
+    elif "link" in df.columns:
+        list_id = to_list_id(df["link"])
+    else:
+        list_id = pd.Series(pd.NA, index=df.index, dtype="Int64")
+
+    columns = []
+    for field in COMPACT_SCHEMA:
+        name = field.name
+        if name == "list_id":
+            values = list_id
+        elif name in df.columns:
+            values = df[name]
+        else:
+            values = pd.Series(None, index=df.index, dtype=object)
+
+        if name in CATEGORY_COLUMNS:
+            encoder = encoders.setdefault(name, DictionaryEncoder())
+            columns.append(encoder.encode(values))
+        elif name == "crawl_time":
+            columns.append(pa.array(pd.to_datetime(values, errors="coerce"), type=field.type))
+        elif pa.types.is_floating(field.type):
+            numeric = pd.to_numeric(values, errors="coerce").astype(float)
+            columns.append(pa.array(numeric, type=field.type, from_pandas=True))
+        else:
+            columns.append(pa.array(values, type=field.type, from_pandas=True))
+
+    return pa.Table.from_arrays(columns, schema=COMPACT_SCHEMA)